@@ -0,0 +1,45 @@
+"""
+Compares the batch conversion functions of :mod:`urban_journey.common.conversions` with calling the single-sample
+functions in a loop, for 1 up to 1e6 samples.
+
+Run it from the repository root with ``python3 -m benchmarks.conversions``.
+"""
+from time import perf_counter
+
+import numpy as np
+
+from urban_journey.common.conversions import wgs84_to_ecef, wgs84_to_ecef_batch, ecef_to_wgs84, ecef_to_wgs84_batch, \
+    q_to_dcm, q_to_dcm_batch, dcm_to_q, dcm_to_q_batch, dcm_to_euler, dcm_to_euler_batch
+
+
+def main():
+    rng = np.random.RandomState(0)
+    lla = np.column_stack((rng.uniform(-1.5, 1.5, 100), rng.uniform(-3, 3, 100), rng.uniform(-100, 1e4, 100)))
+    q = rng.randn(100, 4)
+    q /= np.linalg.norm(q, axis=1)[:, np.newaxis]
+
+    lla = np.tile(lla, (10000, 1))
+    dcm = np.tile(q_to_dcm_batch(q), (10000, 1, 1))
+    functions = [("wgs84_to_ecef", wgs84_to_ecef, wgs84_to_ecef_batch, lla, (3, 1)),
+                 ("ecef_to_wgs84", ecef_to_wgs84, ecef_to_wgs84_batch, wgs84_to_ecef_batch(lla), (3, 1)),
+                 ("q_to_dcm", q_to_dcm, q_to_dcm_batch, np.tile(q, (10000, 1)), (4, 1)),
+                 ("dcm_to_q", dcm_to_q, dcm_to_q_batch, dcm, (3, 3)),
+                 ("dcm_to_euler", dcm_to_euler, dcm_to_euler_batch, dcm, (3, 3))]
+    for name, single, batch, samples, shape in functions:
+        # The loop is timed up to 1e4 samples, it scales linearly.
+        t0 = perf_counter()
+        for sample in samples[:10000]:
+            single(sample.reshape(shape))
+        t_loop = (perf_counter() - t0) / 10000
+
+        timings = []
+        for n in [1, 100, 10000, 1000000]:
+            t0 = perf_counter()
+            batch(samples[:n])
+            t_batch = perf_counter() - t0
+            timings.append("N={} {:.2e} [s] ({:.0f}x)".format(n, t_batch, t_loop * n / t_batch))
+        print("{}: loop {:.2e} [s/sample], batch {}".format(name, t_loop, ", ".join(timings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Compares building and applying the transformation matrices of :mod:`urban_journey.common.transformations` for 1e6
+samples at once with a loop over the single-sample functions.
+
+Run it from the repository root with ``python3 -m benchmarks.transformations``.
+"""
+from time import perf_counter
+
+import numpy as np
+
+from urban_journey.common.transformations import TbE, TbE_batch, TbE_apply, transform
+
+
+def main():
+    n = 1000000
+    rng = np.random.RandomState(0)
+    angles = np.tile(rng.uniform(-np.pi, np.pi, (3, 50)), 20000)[:, :n]
+    v = np.tile(rng.randn(50, 3), (20000, 1))[:n]
+    out = np.empty((n, 3, 3))
+
+    # The loop is timed up to 1e4 samples, it scales linearly.
+    t0 = perf_counter()
+    for i in range(10000):
+        TbE(*angles[:, i]).dot(v[i])
+    t_loop = (perf_counter() - t0) / 10000 * n
+    t0 = perf_counter()
+    TbE_batch(*angles, out=out)
+    t_batch = perf_counter() - t0
+    t0 = perf_counter()
+    transform(out, v)
+    t_transform = perf_counter() - t0
+    t0 = perf_counter()
+    TbE_apply(*angles, v)
+    t_apply = perf_counter() - t0
+    print("TbE N={}: loop (extrapolated) {:.2f} [s], batch {:.3f} [s] ({:.0f}x) + einsum {:.3f} [s], "
+          "apply {:.3f} [s] ({:.0f}x)".format(n, t_loop, t_batch, t_loop / t_batch, t_transform, t_apply,
+                                              t_loop / t_apply))
+
+
+if __name__ == "__main__":
+    main()
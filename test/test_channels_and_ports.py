@@ -1,9 +1,18 @@
 import unittest
+import os
 from threading import Semaphore
 import asyncio
+from time import perf_counter
+from multiprocessing import Process
+import threading
+
+import numpy as np
 
 from urban_journey.pubsub.ports.output import OutputPortDescriptorInstance
 from urban_journey.pubsub.ports.input import InputPortStatic
+from urban_journey.pubsub.ports.queue import QueuePolicy
+from urban_journey.pubsub.channels.envelope import Envelope, LatencyHistogram
+from urban_journey.pubsub.channels.shared_memory import SharedMemoryRing, shared_memory, shared_memory_name
 from urban_journey.pubsub.descriptor.static import DescriptorStatic
 from urban_journey.pubsub.module_base import ModuleBase
 from urban_journey.pubsub.activity import activity
@@ -48,3 +57,447 @@ class TestChannelAndPorts(unittest.TestCase):
         loop.set_debug(True)
         asyncio.run_coroutine_threadsafe(a.transmit(), loop=loop)
         assert semaphore.acquire(timeout=0.1)
+
+
+class TestBatchedChannel(unittest.TestCase):
+    def test_batched_delivery(self):
+        """Messages flushed in one loop iteration are delivered as a single batch."""
+        received = []
+        semaphore = Semaphore(0)
+
+        class A(ModuleBase):
+            op = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.op.subscribe()
+
+            async def transmit(self):
+                for i in range(10):
+                    await self.op.flush(i)
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="op")
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.ip.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                received.append(ip)
+                semaphore.release()
+
+        channel_register = ChannelRegister()
+        channel_register.create_channel("op", batch_size=0)
+
+        a = A(channel_register)
+        b = B(channel_register)
+
+        asyncio.run_coroutine_threadsafe(a.transmit(), loop=event_loop.get())
+        self.assertTrue(semaphore.acquire(timeout=0.1))
+        self.assertEqual(received, [list(range(10))])
+
+    def test_batch_size_and_stack(self):
+        """Batches are limited to batch_size messages and can be stacked into numpy arrays."""
+        received = []
+        semaphore = Semaphore(0)
+
+        class A(ModuleBase):
+            op = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.op.subscribe()
+
+            async def transmit(self):
+                for i in range(10):
+                    await self.op.flush(np.array([i, i]))
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="op")
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.ip.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                received.append(ip)
+                semaphore.release()
+
+        channel_register = ChannelRegister()
+        channel_register.get_channel("op").enable_batching(4, stack=True)
+
+        a = A(channel_register)
+        b = B(channel_register)
+
+        asyncio.run_coroutine_threadsafe(a.transmit(), loop=event_loop.get())
+        for _ in range(3):
+            self.assertTrue(semaphore.acquire(timeout=0.1))
+        self.assertEqual([r.shape for r in received], [(4, 2), (4, 2), (2, 2)])
+        np.testing.assert_array_equal(np.concatenate(received)[:, 0], np.arange(10))
+
+    def test_batching_benchmark(self):
+        """Compares the number of messages per second of per message fan-out and batched delivery."""
+        n_messages = 5000
+        n_inputs = 4
+
+        def run(batch_size):
+            semaphore = Semaphore(0)
+            counter = [0]
+
+            class A(ModuleBase):
+                op = DescriptorStatic(OutputPortDescriptorInstance)
+
+                def __init__(self, channel_register):
+                    super().__init__(channel_register)
+                    self.op.subscribe()
+
+                async def transmit(self):
+                    for i in range(n_messages):
+                        await self.op.flush(i)
+
+            class B(ModuleBase):
+                ip = InputPortStatic(channel_name="op")
+
+                def __init__(self, channel_register):
+                    super().__init__(channel_register)
+                    self.ip.subscribe()
+
+                @activity(ip)
+                async def foo(self, ip):
+                    counter[0] += len(ip) if isinstance(ip, list) else 1
+                    if counter[0] == n_messages * n_inputs:
+                        semaphore.release()
+
+            channel_register = ChannelRegister()
+            channel_register.create_channel("op", batch_size=batch_size)
+            a = A(channel_register)
+            bs = [B(channel_register) for _ in range(n_inputs)]
+
+            t0 = perf_counter()
+            asyncio.run_coroutine_threadsafe(a.transmit(), loop=event_loop.get())
+            self.assertTrue(semaphore.acquire(timeout=60))
+            return n_messages / (perf_counter() - t0)
+
+        per_message = run(None)
+        batched = run(256)
+        self.assertGreater(batched, per_message, "fan-out to {} inputs: per message {:.0f} msg/s, batched {:.0f} msg/s"
+                           .format(n_inputs, per_message, batched))
+
+
+class TestPortQueue(unittest.TestCase):
+    def run_policy(self, queue_policy, n_messages=10, queue_size=2, hold=True):
+        """
+        Publishes n_messages to an input port with a bounded queue and returns the received data. If hold is True the
+        port doesn't process anything until everything has been published.
+        """
+        received = []
+        semaphore = Semaphore(0)
+        gate = asyncio.Event(loop=event_loop.get())
+
+        class A(ModuleBase):
+            op = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.op.subscribe()
+
+            async def transmit(self):
+                for i in range(n_messages):
+                    await self.op.flush(i)
+                gate.set()
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="op", queue_size=queue_size, queue_policy=queue_policy)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.ip.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                if hold:
+                    await gate.wait()
+                else:
+                    await asyncio.sleep(0.001)
+                received.append(ip)
+                semaphore.release()
+
+        channel_register = ChannelRegister()
+        a = A(channel_register)
+        b = B(channel_register)
+
+        asyncio.run_coroutine_threadsafe(a.transmit(), loop=event_loop.get())
+        while semaphore.acquire(timeout=0.1):
+            pass
+        return received, b.ip.queue
+
+    def test_block(self):
+        received, queue = self.run_policy(QueuePolicy.block, hold=False)
+        self.assertEqual(received, list(range(10)))
+        self.assertEqual(queue.max_depth, 2)
+        self.assertGreater(queue.blocked, 0)
+
+    def test_drop_oldest(self):
+        received, queue = self.run_policy(QueuePolicy.drop_oldest)
+        self.assertEqual(received, [8, 9])
+        self.assertEqual(queue.dropped, 8)
+
+    def test_drop_newest(self):
+        received, queue = self.run_policy(QueuePolicy.drop_newest)
+        self.assertEqual(received, [0, 1])
+        self.assertEqual(queue.dropped, 8)
+
+    def test_coalesce_latest(self):
+        received, queue = self.run_policy(QueuePolicy.coalesce_latest)
+        self.assertEqual(received, [0, 9])
+        self.assertEqual(queue.coalesced, 8)
+        self.assertEqual(queue.counters()["delivered"], 2)
+
+
+def shared_memory_publisher(channel_name, n_arrays):
+    """Target of the process publishing arrays on a shared memory channel."""
+    ring = SharedMemoryRing(shared_memory_name(channel_name), create=False)
+    for i in range(n_arrays):
+        ring.write(np.full((100, 3), i, dtype=np.float64))
+    ring.close()
+
+
+def shared_memory_writer(ring_name, offset, n_arrays):
+    """Target of the processes writing concurrently into a shared memory ring."""
+    ring = SharedMemoryRing(ring_name, create=False)
+    for i in range(n_arrays):
+        ring.write(np.full(64, offset + i, dtype=np.int64))
+    ring.close()
+
+
+class TestEnvelopes(unittest.TestCase):
+    def run_envelopes(self, n_messages=10, queue_size=None, queue_policy=QueuePolicy.block, batch_size=None,
+                      disable_at=None):
+        """
+        Publishes n_messages through a channel with envelopes enabled and returns the modules and channel. If
+        disable_at is given, envelopes are disabled before that message is published.
+        """
+        semaphore = Semaphore(0)
+        gate = asyncio.Event(loop=event_loop.get())
+
+        class A(ModuleBase):
+            op = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.op.subscribe()
+
+            async def transmit(self):
+                for i in range(n_messages):
+                    if i == disable_at:
+                        channel.disable_envelopes()
+                    await self.op.flush(i)
+                gate.set()
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="op", queue_size=queue_size, queue_policy=queue_policy)
+            env = InputPortStatic(channel_name="op", keep_envelope=True)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.received = []
+                self.envelopes = []
+                self.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                await gate.wait()
+                self.received.append(ip)
+                semaphore.release()
+
+            @activity(env)
+            async def bar(self, env):
+                self.envelopes.append(env)
+
+        channel_register = ChannelRegister()
+        channel = channel_register.create_channel("op", envelopes=True, batch_size=batch_size)
+        a = A(channel_register)
+        b = B(channel_register)
+
+        asyncio.run_coroutine_threadsafe(a.transmit(), loop=event_loop.get())
+        while semaphore.acquire(timeout=0.1):
+            pass
+        return a, b, channel
+
+    def test_envelopes(self):
+        a, b, channel = self.run_envelopes()
+        self.assertEqual(b.received, list(range(10)))
+        self.assertTrue(all(isinstance(envelope, Envelope) for envelope in b.envelopes))
+        self.assertEqual([envelope.data for envelope in b.envelopes], list(range(10)))
+        self.assertEqual([envelope.sequence for envelope in b.envelopes], list(range(1, 11)))
+        self.assertIs(b.envelopes[0].source, a.op)
+        self.assertEqual(b.ip.missed, 0)
+        self.assertEqual(channel.latency.count, 20)
+        self.assertLessEqual(channel.latency.percentile(50), channel.latency.percentile(99))
+
+    def test_missed(self):
+        a, b, channel = self.run_envelopes(queue_size=2, queue_policy=QueuePolicy.coalesce_latest)
+        self.assertEqual(b.received, [0, 9])
+        self.assertEqual(b.ip.missed, 8)
+        self.assertEqual(b.env.missed, 0)
+
+    def test_batched_envelopes(self):
+        a, b, channel = self.run_envelopes(batch_size=0)
+        self.assertEqual(b.received, [list(range(10))])
+        self.assertEqual(len(b.envelopes), 1)
+        self.assertEqual(b.envelopes[0].sequence, 10)
+        self.assertEqual(b.envelopes[0].count, 10)
+
+    def test_batched_envelopes_disabled(self):
+        """Messages with and without envelopes gathered in the same batch are delivered as separate batches."""
+        a, b, channel = self.run_envelopes(batch_size=0, disable_at=4)
+        self.assertEqual(b.received, [list(range(4)), list(range(4, 10))])
+        self.assertEqual(len(b.envelopes), 2)
+        self.assertEqual((b.envelopes[0].sequence, b.envelopes[0].count), (4, 4))
+        self.assertEqual(b.envelopes[1], list(range(4, 10)))
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram()
+        for latency in [1e-5] * 90 + [1e-3] * 10:
+            histogram.record(latency)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.mean, 1.09e-4)
+        self.assertAlmostEqual(histogram.percentile(50), 1e-5, delta=3e-6)
+        self.assertAlmostEqual(histogram.percentile(99), 1e-3, delta=3e-4)
+        self.assertEqual(histogram.summary()["max"], 1e-3)
+
+
+class TestShards(unittest.TestCase):
+    def test_cross_shard_delivery(self):
+        received = []
+        threads = set()
+        semaphore = Semaphore(0)
+
+        class A(ModuleBase):
+            op = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.op.subscribe()
+
+            async def transmit(self):
+                for i in range(20):
+                    await self.op.flush(i)
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="op", queue_size=2)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register, shard=1)
+                self.ip.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                threads.add(threading.current_thread())
+                received.append(ip)
+                semaphore.release()
+
+        channel_register = ChannelRegister()
+        a = A(channel_register)
+        b = B(channel_register)
+        self.assertIs(b.loop, event_loop.get_shard(1))
+        self.assertIsNot(b.loop, a.loop)
+        self.assertIs(b.ip.queue.loop, b.loop)
+
+        asyncio.run_coroutine_threadsafe(a.transmit(), loop=a.loop)
+        for _ in range(20):
+            self.assertTrue(semaphore.acquire(timeout=1))
+
+        # The blocking queue policy still applies across shards, so nothing is lost or reordered.
+        self.assertEqual(received, list(range(20)))
+        self.assertEqual(threads, {event_loop.get_shard_thread(1)})
+
+    def test_auto_shard(self):
+        event_loop.set_shard_count(3)
+        try:
+            self.assertEqual([event_loop.auto_shard() for _ in range(5)], [0, 1, 2, 0, 1])
+        finally:
+            event_loop.set_shard_count(1)
+
+
+@unittest.skipIf(shared_memory is None, "Shared memory requires python 3.8 or higher.")
+class TestSharedMemoryChannel(unittest.TestCase):
+    def test_cross_process(self):
+        """Arrays written by an other process are delivered as read-only copies of the shared memory slots."""
+        received = []
+        semaphore = Semaphore(0)
+
+        class B(ModuleBase):
+            ip = InputPortStatic(channel_name="shm_test")
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.ip.subscribe()
+
+            @activity(ip)
+            async def foo(self, ip):
+                received.append((ip[0, 0], ip.shape, ip.flags.writeable))
+                semaphore.release()
+
+        channel_register = ChannelRegister()
+        channel_register.create_shared_memory_channel("shm_test", n_slots=8, slot_size=4096)
+        b = B(channel_register)
+
+        process = Process(target=shared_memory_publisher, args=("shm_test", 5))
+        process.start()
+        process.join()
+
+        for _ in range(5):
+            self.assertTrue(semaphore.acquire(timeout=1))
+        self.assertEqual(received, [(float(i), (100, 3), False) for i in range(5)])
+        channel_register.channels["shm_test"].close()
+
+    def test_read_copies(self):
+        """Read arrays are copies, so overwriting their slot or closing the ring doesn't affect them."""
+        ring = SharedMemoryRing("uj_test_read_copies", n_slots=2, slot_size=1024, create=True)
+        ring.write(np.arange(10))
+        array, pid = ring.read(1)
+        self.assertEqual(pid, os.getpid())
+        self.assertFalse(array.flags.writeable)
+
+        ring.write(np.zeros(10))
+        ring.write(np.ones(10))
+        np.testing.assert_array_equal(array, np.arange(10))
+        self.assertIsNone(ring.read(1))
+        ring.close()
+        np.testing.assert_array_equal(array, np.arange(10))
+
+    def test_concurrent_writers(self):
+        """Writers in different processes never claim the same slot."""
+        ring = SharedMemoryRing("uj_test_writers", n_slots=256, slot_size=1024, create=True)
+        processes = [Process(target=shared_memory_writer, args=("uj_test_writers", offset, 100))
+                     for offset in (0, 1000)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual(ring.write_count, 200)
+        values = []
+        for sequence in range(1, 201):
+            array, _ = ring.read(sequence)
+            self.assertTrue((array == array[0]).all())
+            values.append(int(array[0]))
+        self.assertEqual(sorted(values), list(range(100)) + list(range(1000, 1100)))
+        ring.close()
+
+    def test_close(self):
+        """The lock file is removed along with the block, by the instance that created them."""
+        ring = SharedMemoryRing("uj_test_close", n_slots=2, slot_size=1024, create=True)
+        other = SharedMemoryRing("uj_test_close")
+        other.close()
+        self.assertFalse(other.created)
+        if ring.lock_file is not None:
+            self.assertTrue(os.path.exists(ring.lock_path))
+        ring.close()
+        self.assertFalse(os.path.exists(ring.lock_path))
+        with self.assertRaises(FileNotFoundError):
+            SharedMemoryRing("uj_test_close", create=False)
@@ -1,4 +1,5 @@
 import unittest
+import selectors
 from time import time
 from threading import Semaphore
 
@@ -6,6 +7,36 @@ from urban_journey.clock import Clock
 from urban_journey.pubsub.activity import activity
 from urban_journey.pubsub.trigger import DescriptorClassTrigger
 from urban_journey.pubsub.module_base import ModuleBase
+from urban_journey.new_clock import ClockStatic, OverrunPolicy
+from urban_journey.timer_wheel import TimerWheel, get_timer_wheel
+from urban_journey import event_loop
+
+import asyncio
+
+
+class VirtualTimeSelector(selectors.DefaultSelector):
+    """Selector advancing the virtual time of a :class:`VirtualTimeLoop` instead of blocking."""
+    def __init__(self):
+        super().__init__()
+        self.now = 0.  #: Virtual time in seconds.
+
+    def select(self, timeout=None):
+        # A timeout of None means nothing is scheduled, so there is nothing to jump to.
+        if timeout is not None:
+            self.now += timeout
+        return super().select(0)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop running on a virtual clock. Instead of sleeping until the next timer it jumps straight to it, so timing
+    tests are exact and don't depend on the load of the machine.
+    """
+    def __init__(self):
+        super().__init__(VirtualTimeSelector())
+
+    def time(self):
+        return self._selector.now
 
 
 # This is the old clock. I don't care about this clock.
@@ -29,3 +60,171 @@ class TestClock(unittest.TestCase):
         self.assertTrue(s.acquire(timeout=0.1))
         self.assertGreaterEqual(time() - t0, 0.05)
         self.assertEqual(bas[0], 5)
+
+    def test_timer_wheel(self):
+        """The clock only keeps absolute deadlines in the timer wheel if asked to."""
+        def tick_times(use_timer_wheel):
+            loop = VirtualTimeLoop()
+            clk = Clock(100)
+            clk.loop = loop
+            clk.use_timer_wheel = use_timer_wheel
+            times = []
+
+            @activity(clk)
+            async def foo():
+                times.append(round(loop.time(), 6))
+                # The activity takes 3 ms.
+                await asyncio.sleep(0.003)
+                if len(times) >= 3:
+                    clk.stop()
+
+            try:
+                loop.run_until_complete(asyncio.wrap_future(clk.start(), loop=loop))
+            finally:
+                loop.close()
+            return times
+
+        # By default the clock sleeps a period after each tick, so the runtime of the activity adds up.
+        self.assertEqual(tick_times(False), [0.01, 0.023, 0.036])
+        self.assertEqual(tick_times(True), [0.01, 0.02, 0.03])
+
+
+class TestNewClock(unittest.TestCase):
+    def run_clock(self, n_ticks, period, durations, overrun_policy=OverrunPolicy.skip, use_timer_wheel=False):
+        """
+        Runs a clock on a virtual time loop for n_ticks ticks. The activity of tick i takes durations[i] seconds, or
+        nothing if i is out of range. Returns the clock instance and the virtual time it took to fire all ticks.
+        """
+        loop = VirtualTimeLoop()
+        done = loop.create_future()
+
+        class Foo(ModuleBase):
+            clk = ClockStatic(overrun_policy)
+
+            def __init__(self):
+                super().__init__()
+                self.count = 0
+
+            @activity(clk)
+            async def tick(self):
+                if self.count < len(durations):
+                    await asyncio.sleep(durations[self.count])
+                self.count += 1
+                if self.count >= n_ticks:
+                    self.clk.stop()
+                    done.set_result(None)
+
+        foo = Foo()
+        foo.clk.loop = loop
+        foo.clk.period = period
+        foo.clk.use_timer_wheel = use_timer_wheel
+        try:
+            foo.clk.start()
+            loop.run_until_complete(asyncio.wait_for(done, 60, loop=loop))
+            return foo.clk, loop.time()
+        finally:
+            loop.close()
+
+    def test_no_drift(self):
+        # Each tick takes half the period. The last tick starts at 0.2s and ends at 0.205s. A clock sleeping a full
+        # period after each tick would take 0.305s.
+        clk, duration = self.run_clock(20, 0.01, [0.005] * 20)
+        self.assertEqual(clk.ticks, 20)
+        self.assertAlmostEqual(duration, 0.205)
+        self.assertLess(clk.jitter_max, 1e-9)
+        self.assertEqual(clk.overruns, 0)
+
+    def test_skip(self):
+        # The first tick runs until 0.045s, so the ticks at 0.02s, 0.03s and 0.04s are dropped.
+        clk, duration = self.run_clock(5, 0.01, [0.035])
+        self.assertEqual(clk.overruns, 1)
+        self.assertEqual(clk.skipped, 3)
+        self.assertEqual(clk.stats()["skipped"], clk.skipped)
+        self.assertAlmostEqual(duration, 0.08)
+
+    def test_burst(self):
+        # The missed ticks are fired right away, so the clock still ends on schedule.
+        clk, duration = self.run_clock(10, 0.01, [0.035], OverrunPolicy.burst)
+        self.assertEqual(clk.overruns, 3)
+        self.assertEqual(clk.skipped, 0)
+        self.assertAlmostEqual(duration, 0.1)
+
+    def test_stretch(self):
+        # The schedule is shifted by the overrun.
+        clk, duration = self.run_clock(10, 0.01, [0.035], OverrunPolicy.stretch)
+        self.assertEqual(clk.overruns, 1)
+        self.assertEqual(clk.skipped, 0)
+        self.assertAlmostEqual(duration, 0.125)
+
+    def test_timer_wheel(self):
+        # The deadlines are rounded up to the 1ms ticks of the wheel.
+        clk, duration = self.run_clock(10, 0.0105, [], use_timer_wheel=True)
+        self.assertEqual(clk.ticks, 10)
+        self.assertGreaterEqual(duration, 0.105 - 1e-9)
+        self.assertLessEqual(duration, 0.106 + 1e-9)
+        self.assertLessEqual(clk.jitter_max, 0.001 + 1e-9)
+
+
+class TestTimerWheel(unittest.TestCase):
+    def setUp(self):
+        self.loop = VirtualTimeLoop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_order_and_cascade(self):
+        loop = self.loop
+        delays = [0.1, 0.002, 0.03, 0.007, 0.0]
+        fired = []
+
+        async def run():
+            # A tiny wheel, so the timers have to cascade through all levels.
+            wheel = TimerWheel(loop, resolution=0.001, slot_bits=2, levels=3)
+            t0 = loop.time()
+            done = loop.create_future()
+            for delay in delays:
+                wheel.call_at(t0 + delay, lambda d: fired.append((d, loop.time() - t0)), delay)
+            cancelled = wheel.call_at(t0 + 0.05, fired.append, "cancelled")
+            cancelled.cancel()
+            wheel.call_at(t0 + 0.11, done.set_result, None)
+            await done
+            return wheel
+
+        wheel = loop.run_until_complete(run())
+        self.assertEqual([d for d, _ in fired], sorted(delays))
+        for delay, t in fired:
+            # Timers are never early and at most one tick late.
+            self.assertGreaterEqual(t, delay - 1e-9)
+            self.assertLessEqual(t, delay + 0.001 + 1e-9)
+        self.assertEqual(wheel.count, 0)
+
+    def test_harmonic_clocks_share_wakeups(self):
+        loop = self.loop
+
+        class Foo(ModuleBase):
+            clk = ClockStatic()
+
+            def __init__(self, period):
+                super().__init__()
+                self.clk.loop = loop
+                self.clk.period = period
+                self.clk.use_timer_wheel = True
+                self.clk.align_to_period = True
+                self.count = 0
+
+            @activity(clk)
+            async def tick(self):
+                self.count += 1
+
+        modules = [Foo(0.01) for _ in range(20)] + [Foo(0.02) for _ in range(20)]
+        wheel = get_timer_wheel(loop)
+        for module in modules:
+            module.clk.start()
+        loop.run_until_complete(asyncio.sleep(0.2, loop=loop))
+        for module in modules:
+            module.clk.stop()
+
+        ticks = sum(module.count for module in modules)
+        self.assertGreaterEqual(ticks, 20 * 18 + 20 * 9)
+        # All clocks due at the same time are fired by a single wakeup.
+        self.assertLess(wheel.wakeups * 10, ticks)
@@ -1,11 +1,20 @@
+import io
 import unittest
 import pickle
 import os
+import glob
+import shutil
 import inspect
+import tempfile
+from time import perf_counter
+from datetime import datetime, timedelta
 
 import numpy as np
 
 from urban_journey.ujml.loaders import from_string
+from urban_journey.ujml.nodes.data.csv import parse_csv
+from urban_journey.ujml.data_cache import DataCache, data_cache
+from urban_journey.ujml.exceptions import DataLoadError
 from urban_journey import __version__ as uj_version
 
 
@@ -20,6 +29,11 @@ def file_name():
 
 
 class TestData(unittest.TestCase):
+    def tearDown(self):
+        # Remove the sidecar files of the csv nodes.
+        for path in glob.glob(abs_path("csv_test.csv.*.npy")):
+            os.remove(path)
+
     def test_csv(self):
         """Test to see if the csv element can load in the csv data correctly."""
         ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
@@ -79,3 +93,258 @@ class TestData(unittest.TestCase):
         assert (correct2 == ujml_elem[1].data).all()
         assert isinstance(ujml_elem[0].data, np.ndarray)
         assert isinstance(ujml_elem[1].data, list)
+
+
+class TestArrayFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def load(self, element):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + element + '</ujml>'
+        return from_string(ujml_code, self.path("model.ujml"))[0].data
+
+    def test_parse_csv(self):
+        text = "a,b,c\r\n1,2,3\r\n4,5,6\r\n"
+        np.testing.assert_array_equal(parse_csv(text, skiprows=1), [[1, 2, 3], [4, 5, 6]])
+        np.testing.assert_array_equal(parse_csv(text, skiprows=1, usecols=[0, 2]), [[1, 3], [4, 6]])
+        np.testing.assert_array_equal(parse_csv(text, skiprows=1, usecols=[1]), [2, 5])
+        self.assertEqual(parse_csv(text, dtype=np.int32, skiprows=1).dtype, np.int32)
+        np.testing.assert_array_equal(parse_csv("1 2  3\n4 5 6", delimiter=" "), [[1, 2, 3], [4, 5, 6]])
+
+    def test_parse_csv_fallback(self):
+        """Tables the fast path can't parse must give the same result as genfromtxt."""
+        for text in ["1,,3\n4,5,6", "# comment\n1,2\n3,4"]:
+            with self.subTest(text=text):
+                np.testing.assert_array_equal(parse_csv(text), np.genfromtxt(text.splitlines(), delimiter=","))
+        with self.assertRaises(ValueError):
+            parse_csv("1,2,3\n4,5")
+        # Ragged rows whose values add up to a full table.
+        for text, delimiter in [("1,2,3\n4\n5,6,7,8,9", ","), ("1 2 3\n4\n5 6 7 8 9", " ")]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    parse_csv(text, delimiter)
+
+    def test_csv_speedup(self):
+        table = np.random.rand(50000, 6)
+        with open(self.path("table.csv"), "w") as f:
+            np.savetxt(f, table, delimiter=",")
+        with open(self.path("table.csv")) as f:
+            text = f.read()
+
+        t0 = perf_counter()
+        np.genfromtxt(io.StringIO(text), delimiter=",")
+        t1 = perf_counter()
+        parsed = parse_csv(text)
+        t2 = perf_counter()
+        self.load('<csv file="table.csv" shared="false"/>')
+        t3 = perf_counter()
+        mapped = self.load('<csv file="table.csv" shared="false"/>')
+        t4 = perf_counter()
+        np.testing.assert_array_equal(parsed, mapped)
+        self.assertLess(t2 - t1, t1 - t0, "genfromtxt {:.3f} [s], vectorized {:.3f} [s]".format(t1 - t0, t2 - t1))
+        self.assertLess(t4 - t3, t3 - t2, "first load {:.3f} [s], sidecar load {:.4f} [s]".format(t3 - t2, t4 - t3))
+
+    def test_csv_sidecar(self):
+        with open(self.path("table.csv"), "w") as f:
+            f.write("x,y\n1,2\n3,4\n")
+        element = '<csv file="table.csv" skiprows="1" dtype="float32"/>'
+
+        parsed = self.load(element)
+        self.assertEqual(len(glob.glob(self.path("table.csv.*.npy"))), 1)
+        mapped = self.load(element)
+        self.assertIsInstance(mapped, np.memmap)
+        self.assertEqual(mapped.dtype, np.float32)
+        np.testing.assert_array_equal(mapped, parsed)
+
+        # Different settings get their own sidecar file.
+        np.testing.assert_array_equal(self.load('<csv file="table.csv" skiprows="1" usecols="1"/>'), [2, 4])
+        self.assertEqual(len(glob.glob(self.path("table.csv.*.npy"))), 2)
+
+        # The sidecar file is rebuilt when the csv file changes.
+        with open(self.path("table.csv"), "w") as f:
+            f.write("x,y\n5,6\n")
+        os.utime(self.path("table.csv"), (0, os.stat(mapped.filename).st_mtime + 10))
+        np.testing.assert_array_equal(self.load(element), [5, 6])
+
+        self.assertNotIsInstance(self.load('<csv file="table.csv" skiprows="1" cache="false"/>'), np.memmap)
+
+    def test_npy(self):
+        table = np.arange(12.).reshape(3, 4)
+        np.save(self.path("table.npy"), table)
+        data = self.load('<npy file="table.npy"/>')
+        self.assertIsInstance(data, np.memmap)
+        np.testing.assert_array_equal(data, table)
+        self.assertNotIsInstance(self.load('<npy file="table.npy" mmap="false"/>'), np.memmap)
+
+    def test_npz(self):
+        a = np.arange(12.).reshape(3, 4)
+        b = np.asfortranarray(np.arange(6, dtype=np.int16).reshape(2, 3))
+        np.savez(self.path("tables.npz"), a=a, b=b)
+        np.savez_compressed(self.path("compressed.npz"), a=a)
+
+        data = self.load('<npz file="tables.npz"/>')
+        self.assertEqual(set(data), {"a", "b"})
+        self.assertIsInstance(data["a"], np.memmap)
+        np.testing.assert_array_equal(data["a"], a)
+        np.testing.assert_array_equal(data["b"], b)
+        np.testing.assert_array_equal(self.load('<npz file="tables.npz" key="b"/>'), b)
+
+        compressed = self.load('<npz file="compressed.npz" key="a"/>')
+        self.assertNotIsInstance(compressed, np.memmap)
+        np.testing.assert_array_equal(compressed, a)
+
+
+class TestDataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "table.p")
+        with open(self.file_path, "wb") as f:
+            pickle.dump(np.arange(10), f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_shared_nodes(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+                        <pickle file="{0}" shared="true"/>
+                        <pickle file="{0}" shared="true"/>
+                        <pickle file="{0}"/>
+                    </ujml>'''.format(self.file_path)
+        misses = data_cache.misses
+        ujml = from_string(ujml_code, file_name())
+        self.assertIs(ujml[0].data, ujml[1].data)
+        self.assertIs(from_string(ujml_code, file_name())[0].data, ujml[0].data)
+        self.assertEqual(data_cache.misses, misses + 1)
+        self.assertFalse(ujml[0].data.flags.writeable)
+
+        self.assertIsNot(ujml[2].data, ujml[0].data)
+        self.assertTrue(ujml[2].data.flags.writeable)
+
+    def test_reset(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + \
+                    '<pickle file="{0}" shared="true"/></ujml>'.format(self.file_path)
+        node = from_string(ujml_code, file_name())[0]
+        data = node.data
+        node.reset()
+        self.assertNotIn(data_cache.key("pickle", self.file_path), data_cache.entries)
+        self.assertIsNot(node.data, data)
+        np.testing.assert_array_equal(node.data, data)
+
+    def test_nested_arrays(self):
+        """Arrays nested in shared data are read-only as well."""
+        cache = DataCache()
+        value = cache.get(0, lambda: {"gain": [np.arange(3)], "table": np.arange(3)})
+        self.assertFalse(value["gain"][0].flags.writeable)
+        self.assertFalse(value["table"].flags.writeable)
+        cache.discard(0)
+        self.assertEqual((list(cache.entries), cache.size), ([], 0))
+
+    def test_invalidation(self):
+        cache = DataCache()
+        key = cache.key("pickle", self.file_path)
+        self.assertEqual(cache.key("pickle", self.file_path), key)
+        self.assertNotEqual(cache.key("pickle", self.file_path, mmap=True), key)
+        os.utime(self.file_path, (0, 0))
+        self.assertNotEqual(cache.key("pickle", self.file_path), key)
+
+        cache.hash_contents = True
+        self.assertEqual(cache.key("pickle", self.file_path), cache.key("pickle", self.file_path))
+
+    def test_eviction(self):
+        cache = DataCache(max_size=2500)
+        for i in range(3):
+            cache.get(i, lambda: np.zeros(1000, np.uint8))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(list(cache.entries), [1, 2])
+
+        # Using an entry makes it the most recent one.
+        cache.get(1, None)
+        cache.get(3, lambda: np.zeros(1000, np.uint8))
+        self.assertEqual(list(cache.entries), [1, 3])
+        self.assertEqual(cache.size, 2000)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+        # Entries larger than the cache are not kept.
+        cache.get(4, lambda: np.zeros(3000, np.uint8))
+        self.assertEqual(list(cache.entries), [1, 3])
+
+    def test_disk(self):
+        directory = os.path.join(self.tmp_dir.name, "cache")
+        cache = DataCache(directory=directory)
+        key = cache.key("pickle", self.file_path)
+        cache.get(key, lambda: {"a": np.arange(3)})
+
+        # A new process finds the entry on disk.
+        cache = DataCache(directory=directory)
+        value = cache.get(key, None)
+        np.testing.assert_array_equal(value["a"], np.arange(3))
+        self.assertEqual(cache.disk_hits, 1)
+
+
+class TestWindgram(unittest.TestCase):
+    def test_windgram(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+            <windgram file="windgram_test.txt" hour="12/01/2017 09:00" shared="true"/>
+            <windgram file="windgram_test.txt" hour="12/01/2017 18:00" shared="true"/>
+        </ujml>
+        '''
+        ujml_elem = from_string(ujml_code, file_name())
+        data = ujml_elem[0].data
+        self.assertEqual(data.shape, (3, 3))
+        np.testing.assert_allclose(data[:, 0], [100000, 85000, 50000])
+        np.testing.assert_allclose(data[:, 1], np.array([11, 21, 42.5]) * 0.514444)
+        np.testing.assert_allclose(data[:, 2], [275, 265, 252.5])
+
+        # Both nodes share the parsed file.
+        self.assertIs(ujml_elem[0].table, ujml_elem[1].table)
+        np.testing.assert_allclose(ujml_elem[1].data[:, 2], [290, 280, 260])
+
+    def test_reset(self):
+        """Resetting a node only evaluates the hour again. The file is only parsed again once it changes."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "windgram.txt")
+            shutil.copy(abs_path("windgram_test.txt"), path)
+            for shared in ("true", "false"):
+                with self.subTest(shared=shared):
+                    ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + \
+                                '<windgram file="{}" hour="12/01/2017 09:00" shared="{}"/></ujml>'.format(path, shared)
+                    node = from_string(ujml_code, file_name())[0]
+                    tables = []
+                    for _ in range(5):
+                        node.data
+                        tables.append(node.table)
+                        node.reset()
+                    self.assertEqual(len(set(map(id, tables))), 1)
+
+                    node.data
+                    os.utime(path, (0, os.stat(path).st_mtime + 10))
+                    node.reset()
+                    self.assertIsNot(node.table, tables[0])
+                    np.testing.assert_allclose(node.data[:, 2], [275, 265, 252.5])
+
+    def test_profiles(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+            <windgram file="windgram_test.txt" hour="12/01/2017 09:00"/>
+        </ujml>
+        '''
+        node = from_string(ujml_code, file_name())[0]
+        hours = [datetime(2017, 1, 12, 6) + timedelta(hours=h) for h in range(13)]
+        profiles = node.profiles(hours)
+        self.assertEqual(profiles.shape, (13, 3, 3))
+        np.testing.assert_allclose(profiles[3], node.data)
+        np.testing.assert_allclose(profiles[:, 0, 2], np.linspace(270, 290, 13))
+
+    def test_out_of_range(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+            <windgram file="windgram_test.txt" hour="12/01/2017 19:00"/>
+        </ujml>
+        '''
+        node = from_string(ujml_code, file_name())[0]
+        with self.assertRaises(DataLoadError):
+            node.data
@@ -1,7 +1,12 @@
 import unittest
 import sys
+import os
+import tempfile
 
+from urban_journey import __version__ as uj_version
 from urban_journey.ujml.interpreter import UJMLPythonInterpreter, UJMLPythonSource
+from urban_journey.ujml.compile_cache import CompileCache
+from urban_journey.ujml.loaders import from_file
 
 
 class TestInterpreter(unittest.TestCase):
@@ -86,4 +91,76 @@ class TestInterpreter(unittest.TestCase):
         except:
             _, _, tb = sys.exc_info()
             self.assertEqual(tb.tb_next.tb_next.tb_lineno, 56)
-            self.assertEqual(tb.tb_next.tb_next.tb_frame.f_code.co_filename, "asdf")
\ No newline at end of file
+            self.assertEqual(tb.tb_next.tb_next.tb_frame.f_code.co_filename, "asdf")
+
+
+class TestCompileCache(unittest.TestCase):
+    ujml_code = """<?xml version="1.0"?>
+<ujml version="{}">
+    <script>b = a + 1</script>
+    <data>b * 2</data>
+</ujml>
+"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        self.file_path = os.path.join(self.tmp_dir.name, "model.ujml")
+        self.write(self.ujml_code.format(uj_version))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, code):
+        with open(self.file_path, "w") as f:
+            f.write(code)
+
+    def load(self):
+        ujml = from_file(self.file_path, globals={'a': 1}, cache=True, cache_dir=self.cache_dir)
+        self.assertEqual(ujml[1].data, 4)
+        ujml.interpreter.compile_cache.save()
+        return ujml.interpreter.compile_cache
+
+    def test_warm_start(self):
+        cold = self.load()
+        self.assertEqual((cold.hits, cold.misses), (0, 2))
+        self.assertTrue(os.path.isfile(cold.path))
+
+        warm = self.load()
+        self.assertEqual((warm.hits, warm.misses), (2, 0))
+        self.assertFalse(warm.dirty)
+
+    def test_disabled_by_default(self):
+        ujml = from_file(self.file_path, globals={'a': 1}, cache_dir=self.cache_dir)
+        self.assertEqual(ujml[1].data, 4)
+        self.assertIsNone(ujml.interpreter.compile_cache)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_invalidation(self):
+        cold = self.load()
+        self.write(self.ujml_code.format(uj_version) + "<!-- edited -->")
+        edited = self.load()
+        self.assertNotEqual(cold.fingerprint, edited.fingerprint)
+        self.assertEqual(edited.misses, 2)
+
+    def test_corrupt_cache_file(self):
+        cold = self.load()
+        with open(cold.path, "wb") as f:
+            f.write(b"garbage")
+        self.assertEqual(self.load().misses, 2)
+
+    def test_cached_line_numbers(self):
+        """Cached code must report the same line numbers in tracebacks as freshly compiled code."""
+        cache = CompileCache("<ujml/>", "asdfg", self.cache_dir)
+        i = UJMLPythonInterpreter(compile_cache=cache)
+        i.exec('b = 1', "asdfg", 5)
+        cache.save()
+        i.compile_cache = CompileCache("<ujml/>", "asdfg", self.cache_dir)
+        try:
+            i.exec('b = 1', "asdfg", 5)
+            i.eval('"234"+1234', "asdfg", 5678)
+            assert False
+        except TypeError:
+            _, _, tb = sys.exc_info()
+            self.assertEqual(tb.tb_next.tb_next.tb_lineno, 5678)
+        self.assertEqual(i.compile_cache.hits, 1)
@@ -3,15 +3,40 @@ import unittest
 import struct
 import asyncio
 import sys
+import pickle
 from queue import Queue
+from time import perf_counter, sleep
 
 import umsgpack
+import numpy as np
 
 from urban_journey.pubsub.networking.listener import Listener
 from urban_journey.pubsub.networking.connection import Connection
 from urban_journey.pubsub.networking.decoder import Decoder
+from urban_journey.pubsub.networking import codecs, compression
+from urban_journey.pubsub.networking.connection_manager import ConnectionManager
+from urban_journey.pubsub.networking.datagram import DatagramConnection, SequenceStats, datagram_header_struct
 
-from urban_journey import get_event_loop
+from urban_journey.pubsub.channels.channel_register import ChannelRegister
+from urban_journey.pubsub.module_base import ModuleBase
+from urban_journey.pubsub.descriptor.static import DescriptorStatic
+from urban_journey.pubsub.ports.output import OutputPortDescriptorInstance
+from urban_journey.pubsub.ports.input import InputPortStatic
+from urban_journey.pubsub.activity import activity
+from urban_journey import get_event_loop, from_string, __version__ as uj_version
+
+
+unpickled = []  #: Holds a None for every :class:`Unpickled` object that was unpickled.
+
+
+def register_unpickled():
+    unpickled.append(None)
+
+
+class Unpickled:
+    """Registers itself in :data:`unpickled` when unpickled."""
+    def __reduce__(self):
+        return register_unpickled, ()
 
 
 class TestNetworking(unittest.TestCase):
@@ -111,3 +136,629 @@ class TestNetworking(unittest.TestCase):
         exc_info = q.get(timeout=1)
         if exc_info is not None:
             raise exc_info[1].with_traceback(exc_info[2])
+
+    def test_transmit_after_close(self):
+        """Transmitting on a connection closed by either side fails instead of waiting forever."""
+        async def run():
+            connections = {}
+            await Listener("127.0.0.1", 8896, connections).wait_until_started()
+
+            closed_here = await Connection.from_host("127.0.0.1", 8896)
+            await closed_here.wait_for_ready()
+            closed_here.close()
+            with self.assertRaises(ConnectionError):
+                await closed_here.ping()
+
+            # The remote closes the connection.
+            closed_there = await Connection.from_host("127.0.0.1", 8896, high_water=1)
+            await closed_there.wait_for_ready()
+            for connection in list(connections.values()):
+                connection.close()
+            await asyncio.wait_for(closed_there.wait_for_closed(), 1)
+            with self.assertRaises(ConnectionError):
+                await closed_there.channel_data("x", b"\0" * 1024)
+
+        asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(2)
+
+    def test_read_frame(self):
+        """
+        Checks whether the decoder reads packages straight from a stream reader, and that it calls the error callback
+        when the stream holds invalid data.
+        """
+
+        async def run():
+            errors = []
+            decoder = Decoder(lambda: errors.append(None))
+            reader = asyncio.StreamReader()
+            for inp_data in ([0, [1, 2, 3]], [1, [b"abc"]]):
+                data = umsgpack.packb(inp_data)
+                reader.feed_data(struct.pack(">I", len(data)) + data)
+                self.assertTrue(await decoder.read_frame(reader))
+                self.assertEqual(await decoder.get(), inp_data)
+
+            # Packages larger than the handshake packages are not allowed in restricted mode.
+            reader.feed_data(struct.pack(">I", 2048))
+            self.assertFalse(await decoder.read_frame(reader))
+            self.assertEqual(len(errors), 1)
+
+            reader.feed_eof()
+            with self.assertRaises(asyncio.IncompleteReadError):
+                await decoder.read_frame(reader)
+            return decoder.packages_received
+
+        self.assertEqual(asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1), 2)
+
+    def test_digest_chunks(self):
+        """
+        Checks whether packages pushed in small chunks and packages larger than the initial buffer are decoded.
+        """
+
+        async def run():
+            decoder = Decoder(buffer_size=16)
+            decoder.restricted = False
+            inp_data = [[0, [1, 2, 3]], [1, [os.urandom(1000)]], [2, []]]
+            stream = b"".join(struct.pack(">I", len(data)) + data for data in map(umsgpack.packb, inp_data))
+            for i in range(0, len(stream), 7):
+                await decoder.digest(stream[i:i + 7])
+            return [decoder.get_nowait() for _ in inp_data], inp_data
+
+        out_data, inp_data = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1)
+        self.assertEqual(out_data, inp_data)
+
+
+class TestCodecs(unittest.TestCase):
+    def test_header(self):
+        header = codecs.pack_header(1234, 3, compressed=True)
+        self.assertEqual(codecs.unpack_header(header), (1234, 3, True))
+        # Codec 0 frames are the same as the frames of the plain length prefix.
+        self.assertEqual(codecs.pack_header(1234), struct.pack(">I", 1234))
+        with self.assertRaises(ValueError):
+            codecs.pack_header(codecs.max_frame_length + 1)
+
+    def round_trip(self, codec, package):
+        decoder = Decoder(loop=get_event_loop())
+        decoder.restricted = False
+        return decoder.decode(b"".join(codec.encode(*package)), codec.codec_id)
+
+    def test_round_trip(self):
+        package = [4, [1, "two", b"three", [4.0]]]
+        for name in codecs.local_codecs():
+            with self.subTest(codec=name):
+                self.assertEqual(self.round_trip(codecs.codecs_by_name[name], package), package)
+
+    def test_arrays(self):
+        a = np.arange(12, dtype=np.float64).reshape(3, 4)
+        b = np.arange(5, dtype=np.int16)[::2]
+        array_codecs = [codecs.codecs_by_name["ndarray"]]
+        if codecs.codecs_by_name["pickle"].available:
+            array_codecs.append(codecs.codecs_by_name["pickle"])
+        for codec in array_codecs:
+            with self.subTest(codec=codec.name):
+                enabled = codec.enabled
+                codec.enabled = True
+                try:
+                    command_id, args = self.round_trip(codec, [8, ["a", a, b, np.array(True)]])
+                finally:
+                    codec.enabled = enabled
+                self.assertEqual((command_id, args[0]), (8, "a"))
+                np.testing.assert_array_equal(args[1], a)
+                np.testing.assert_array_equal(args[2], b)
+                self.assertEqual(args[1].dtype, a.dtype)
+                self.assertEqual(args[3].shape, ())
+
+    def test_disabled_codec(self):
+        """Packages encoded with a disabled codec must be refused."""
+        errors = []
+        decoder = Decoder(lambda: errors.append(None), loop=get_event_loop())
+        decoder.restricted = False
+        self.assertFalse(decoder.check_header(10, codecs.codecs_by_name["pickle"].codec_id, False))
+        self.assertEqual(len(errors), 1)
+
+    def test_negotiation(self):
+        async def run():
+            listener = Listener("127.0.0.1", 8889, {})
+            await listener.wait_until_started()
+            client_connection = await Connection.from_host("127.0.0.1", 8889)
+            await client_connection.wait_for_ready()
+            await client_connection.ping()
+            return client_connection
+
+        connection = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1)
+        self.assertEqual(connection.remote_codecs, codecs.local_codecs())
+        self.assertIs(connection.codec, codecs.negotiate(codecs.local_codecs()))
+        self.assertIs(connection.select_codec([np.zeros(3)]), codecs.codecs_by_name["ndarray"])
+        get_event_loop().call_soon_threadsafe(connection.close)
+
+
+class TestCompression(unittest.TestCase):
+    port = 8894
+
+    def test_round_trip(self):
+        payload = b"".join(codecs.codecs_by_name["ndarray"].encode(8, ["wind", np.zeros((100, 100))]))
+        decoder = Decoder(loop=get_event_loop())
+        decoder.restricted = False
+        for name in compression.local_compressors():
+            with self.subTest(compressor=name):
+                compressor = compression.compressors_by_name[name]
+                compressed = compressor.prefix + compressor.compress(payload)
+                self.assertLess(len(compressed), len(payload))
+                command_id, args = decoder.decode(compressed, 3, compressed=True)
+                np.testing.assert_array_equal(args[1], np.zeros((100, 100)))
+        self.assertEqual(decoder.compression_stats.frames, len(compression.local_compressors()))
+        self.assertEqual(decoder.compression_stats.raw_bytes, len(payload) * decoder.compression_stats.frames)
+
+    def test_negotiation(self):
+        self.assertIs(compression.negotiate(["zlib", "lzma"], ["lzma", "zlib"]).name, "lzma")
+        self.assertIs(compression.negotiate(["zlib"]).name, "zlib")
+        self.assertIsNone(compression.negotiate([]))
+        self.assertIsNone(compression.negotiate(["zlib"], ["lzma"]))
+
+    def test_decompression_limit(self):
+        """Payloads decompressing to more than the maximum package length must be refused."""
+        compressor = compression.compressors_by_name["zlib"]
+        bomb = compressor.prefix + compressor.compress(bytes(codecs.max_frame_length + 1))
+        errors = []
+        decoder = Decoder(lambda: errors.append(None), loop=get_event_loop())
+        decoder.restricted = False
+        self.assertIsNone(decoder.decode(bomb, 0, compressed=True))
+        self.assertEqual(len(errors), 1)
+
+    @unittest.skipUnless(compression.lz4, "lz4 is not installed")
+    def test_lz4_decompression_limit(self):
+        compressor = compression.compressors_by_name["lz4"]
+        with self.assertRaises(ValueError):
+            compressor.decompress(compressor.compress(bytes(codecs.max_frame_length + 1)))
+
+    def test_truncated(self):
+        """Truncated payloads must be refused instead of returning the part that could be decompressed."""
+        payload = np.random.RandomState(0).bytes(10000)
+        for name in compression.local_compressors():
+            with self.subTest(compressor=name):
+                compressor = compression.compressors_by_name[name]
+                compressed = compressor.compress(payload)
+                self.assertEqual(compressor.decompress(compressed), payload)
+                with self.assertRaises(ValueError):
+                    compressor.decompress(compressed[:len(compressed) // 2])
+
+    def test_connection(self):
+        connections = {}
+        table = np.tile(np.arange(64, dtype=np.float64), 2048)
+
+        async def run():
+            await Listener("127.0.0.1", self.port, connections).wait_until_started()
+            connection = await Connection.from_host("127.0.0.1", self.port, compression=["zlib"])
+            await connection.wait_for_ready()
+            await connection.channel_data("nobody", table)
+            await connection.channel_data("nobody", np.arange(10))
+            await connection.ping()
+            connection.close()
+            return connection
+
+        connection = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(5)
+        self.assertEqual(connection.compressor.name, "zlib")
+        self.assertEqual(connection.remote_compressors, compression.local_compressors())
+
+        # Only the large package is compressed.
+        sent = connection.compression_stats
+        self.assertEqual(sent.frames, 1)
+        self.assertGreater(sent.ratio, 10)
+        self.assertGreater(sent.cpu_time, 0)
+        received = list(connections.values())[0].decoder.compression_stats
+        self.assertEqual(received.frames, 1)
+        self.assertEqual(received.raw_bytes, sent.raw_bytes)
+
+
+class TestChannelBridge(unittest.TestCase):
+    def test_remote_subscription(self):
+        """
+        Connects two channel registers through a loopback listener and checks whether the data of subscribed channels,
+        and only those, is forwarded.
+        """
+
+        class Publisher(ModuleBase):
+            x = DescriptorStatic(OutputPortDescriptorInstance)
+            y = DescriptorStatic(OutputPortDescriptorInstance)
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.x.subscribe()
+                self.y.subscribe()
+
+        class Subscriber(ModuleBase):
+            x = InputPortStatic()
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.x.subscribe()
+                self.received = asyncio.Queue(loop=get_event_loop())
+
+            @activity(x)
+            async def receive(self, x):
+                await self.received.put(x)
+
+        async def run():
+            register_a = ChannelRegister()
+            publisher = Publisher(register_a)
+            await register_a.new_listener("127.0.0.1", 8890).wait_until_started()
+
+            register_b = ChannelRegister()
+            subscriber = Subscriber(register_b)
+            connection = await register_b.connect("127.0.0.1", 8890)
+            await connection.wait_for_ready()
+
+            # The channels with input ports are subscribed to automatically once the connection is ready.
+            while not register_a.channels["x"].remote_subscribers:
+                await asyncio.sleep(0.001)
+            self.assertEqual(connection.remote_subscriptions, {"x"})
+            self.assertFalse(register_a.channels["y"].remote_subscribers)
+
+            await publisher.x.flush("text")
+            await publisher.x.flush(np.arange(10.))
+            self.assertEqual(await subscriber.received.get(), "text")
+            np.testing.assert_array_equal(await subscriber.received.get(), np.arange(10.))
+
+            # Data on channels without remote subscribers is not transmitted. The only package received is the pong.
+            received = connection.decoder.packages_received
+            await publisher.y.flush("not forwarded")
+            await connection.ping()
+            self.assertEqual(connection.decoder.packages_received, received + 1)
+
+            # After unsubscribing nothing is forwarded anymore.
+            await connection.unsubscribe_channel("x")
+            await connection.ping()
+            self.assertFalse(register_a.channels["x"].remote_subscribers)
+
+            register_b.connection_manager.close_all()
+            return True
+
+        self.assertTrue(asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(2))
+
+
+    def test_modified_after_transmit(self):
+        """Arrays modified after they have been transmitted are sent as they were at the time of the transmit."""
+
+        class Subscriber(ModuleBase):
+            x = InputPortStatic()
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.x.subscribe()
+                self.received = asyncio.Queue(loop=get_event_loop())
+
+            @activity(x)
+            async def receive(self, x):
+                await self.received.put(x)
+
+        async def run():
+            register = ChannelRegister()
+            subscriber = Subscriber(register)
+            await register.new_listener("127.0.0.1", 8895).wait_until_started()
+
+            # The flush delay keeps small packages in the send queue while the array is modified. Large ones fill the
+            # queue, so they are written right away.
+            connection = await Connection.from_host("127.0.0.1", 8895, flush_delay=0.05)
+            await connection.wait_for_ready()
+            received = []
+            for size in (100, 10000):
+                array = np.zeros(size)
+                await connection.channel_data("x", array)
+                array[:] = 42
+                received.append(await subscriber.received.get())
+            connection.close()
+            return received
+
+        received = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(2)
+        np.testing.assert_array_equal(received[0], np.zeros(100))
+        np.testing.assert_array_equal(received[1], np.zeros(10000))
+
+
+class TestWriteCoalescing(unittest.TestCase):
+    port = 8891
+    n_packages = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        async def listen():
+            await Listener("127.0.0.1", cls.port, {}).wait_until_started()
+        asyncio.run_coroutine_threadsafe(listen(), get_event_loop()).result(1)
+
+    def transmit(self, n_packages, delay=0., **kwargs):
+        """
+        Transmits packages the remote ignores and returns the number of frames and flushes needed, and the rate in
+        packages per second at which they were written to the socket.
+        """
+        async def run():
+            connection = await Connection.from_host("127.0.0.1", self.port, **kwargs)
+            await connection.wait_for_ready()
+            frames, flushes = connection.frames_sent, connection.flushes
+            t0 = perf_counter()
+            for i in range(n_packages):
+                await connection.channel_data("nobody", i)
+                if delay:
+                    await asyncio.sleep(delay)
+            connection.flush_send_queue()
+            rate = n_packages / (perf_counter() - t0)
+            # The pong comes back after all packages have been sent.
+            await connection.ping()
+            connection.close()
+            return connection.frames_sent - frames, connection.flushes - flushes, rate
+
+        return asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(10)
+
+    def test_coalescing(self):
+        frames, flushes, _ = self.transmit(self.n_packages)
+        self.assertEqual(frames, self.n_packages + 1)
+        self.assertLess(flushes, frames / 10)
+
+    def test_flush_delay(self):
+        # Packages transmitted within the flush delay are coalesced, even across event loop iterations.
+        frames, flushes, _ = self.transmit(5, delay=0.001, flush_delay=0.1)
+        self.assertEqual(frames, 6)
+        self.assertLessEqual(flushes, 2)
+
+    def test_coalescing_speedup(self):
+        _, _, coalesced = self.transmit(self.n_packages)
+        _, _, uncoalesced = self.transmit(self.n_packages, flush_size=0)
+        self.assertGreater(coalesced, uncoalesced,
+                           "coalesced {:.0f} msg/s, flushed per package {:.0f} msg/s".format(coalesced, uncoalesced))
+
+
+class TestConnectionManager(unittest.TestCase):
+    def test_pool_and_reconnect(self):
+        async def run():
+            register_a = ChannelRegister()
+            listener = register_a.new_listener("127.0.0.1", 8892)
+            await listener.wait_until_started()
+
+            manager = ConnectionManager(ChannelRegister(), initial_backoff=0.01)
+            connection = await manager.get("127.0.0.1", 8892)
+            self.assertIs(await manager.get("127.0.0.1", 8892), connection)
+            await connection.subscribe_channel("x")
+            await connection.ping()
+            self.assertEqual(len(register_a.channels["x"].remote_subscribers), 1)
+
+            # Drop the connection from the remote side.
+            for remote_connection in list(register_a.connections.values()):
+                remote_connection.close()
+            await connection.wait_for_closed()
+
+            new_connection = await manager.get("127.0.0.1", 8892, timeout=1)
+            self.assertIsNot(new_connection, connection)
+            self.assertIn("x", new_connection.remote_subscriptions)
+            await new_connection.ping()
+            self.assertEqual([c.closed for c in register_a.channels["x"].remote_subscribers], [False])
+
+            metrics = manager.metrics["127.0.0.1:8892"]
+            manager.close_all()
+            return metrics
+
+        metrics = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(2)
+        self.assertEqual((metrics.connects, metrics.reconnects, metrics.disconnects), (1, 1, 1))
+        self.assertEqual(metrics.reconnect_latency.count, 1)
+        self.assertGreater(metrics.last_reconnect_latency, 0)
+
+    def test_backoff(self):
+        async def run():
+            # Nothing is listening on this port.
+            manager = ConnectionManager(initial_backoff=0.01, backoff_factor=2)
+            with self.assertRaises(asyncio.TimeoutError):
+                await manager.get("127.0.0.1", 8899, timeout=0.1)
+            metrics = manager.metrics["127.0.0.1:8899"]
+            manager.close_all()
+            return metrics
+
+        metrics = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1)
+        # With a doubling backoff starting at 10 ms, only a handful of attempts fit in 100 ms.
+        self.assertGreaterEqual(metrics.failures, 2)
+        self.assertLessEqual(metrics.failures, 5)
+        self.assertEqual(metrics.connects, 0)
+
+
+class TestDatagram(unittest.TestCase):
+    def test_channel_data(self):
+        """Sends small and fragmented packages between two datagram endpoints on localhost."""
+
+        class Subscriber(ModuleBase):
+            x = InputPortStatic()
+
+            def __init__(self, channel_register):
+                super().__init__(channel_register)
+                self.x.subscribe()
+                self.received = asyncio.Queue(loop=get_event_loop())
+
+            @activity(x)
+            async def receive(self, x):
+                await self.received.put(x)
+
+        async def run():
+            register_b = ChannelRegister()
+            subscriber = Subscriber(register_b)
+            receiver = await DatagramConnection.open(("127.0.0.1", 0), channel_register=register_b, receive=["x"])
+
+            register_a = ChannelRegister()
+            sender = await DatagramConnection.open(("127.0.0.1", 0), receiver.local_addr, channel_register=register_a)
+            sender.forward_channel("x")
+
+            await register_a.get_channel("x").flush("text")
+            self.assertEqual(await asyncio.wait_for(subscriber.received.get(), 1), "text")
+
+            array = np.arange(10000.)
+            await register_a.get_channel("x").flush(array)
+            np.testing.assert_array_equal(await asyncio.wait_for(subscriber.received.get(), 1), array)
+
+            # Channels that are not accepted are dropped.
+            sender.transmit(8, "y", "text")
+            await asyncio.sleep(0.05)
+
+            stats = sender.stats(), receiver.stats()
+            sender.close()
+            receiver.close()
+            return stats
+
+        sender_stats, receiver_stats = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(2)
+        self.assertEqual(sender_stats["packages_sent"], 3)
+        self.assertGreater(sender_stats["datagrams_sent"], 50)
+        self.assertEqual(receiver_stats["packages_received"], 3)
+        self.assertEqual(receiver_stats["datagrams_received"], sender_stats["datagrams_sent"])
+        self.assertEqual((receiver_stats["lost"], receiver_stats["rejected"]), (0, 1))
+
+    def test_no_fragmentation(self):
+        async def run():
+            sender = await DatagramConnection.open(("127.0.0.1", 0), ("127.0.0.1", 9), fragment=False)
+            sender.transmit(8, "x", np.zeros(1000))
+            sender.close()
+            return sender.oversized, sender.packages_sent
+
+        self.assertEqual(asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1), (1, 0))
+
+    def test_loss_statistics(self):
+        async def run():
+            receiver = await DatagramConnection.open(("127.0.0.1", 0))
+            addr = ("127.0.0.1", 1234)
+            # Sequence 3 and 4 are lost, 2 arrives late and 5 twice.
+            for sequence in (1, 2 ** 32 - 1, 5, 2, 5):
+                receiver.datagram_received(datagram_header_struct.pack(sequence, 0, 1), addr)
+            receiver.close()
+            return receiver.senders[addr]
+
+        stats = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1)
+        self.assertEqual((stats.received, stats.lost, stats.reordered, stats.duplicates), (2, 3, 2, 1))
+
+    def test_pickle_rejected(self):
+        """Datagrams can be spoofed, so pickle packages are dropped even if the pickle codec is enabled."""
+        data = pickle.dumps((8, ["x", Unpickled()]))
+        table = umsgpack.packb([len(data)])
+        payload = codecs.table_length_struct.pack(len(table)) + table + data
+        datagram = (datagram_header_struct.pack(1, 0, 1) +
+                    codecs.pack_header(len(payload), codecs.codecs_by_name["pickle"].codec_id) + payload)
+
+        async def run():
+            receiver = await DatagramConnection.open(("127.0.0.1", 0), channel_register=ChannelRegister())
+            receiver.datagram_received(datagram, ("127.0.0.1", 1234))
+            await asyncio.sleep(0.01)
+            receiver.close()
+            return receiver.invalid
+
+        codecs.enable_codec("pickle")
+        try:
+            self.assertEqual(asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1), 1)
+        finally:
+            codecs.enable_codec("pickle", False)
+        self.assertEqual(unpickled, [])
+
+        with self.assertRaises(ValueError):
+            DatagramConnection(codec="pickle")
+
+    def test_sequence_wrap_around(self):
+        stats = SequenceStats()
+        for sequence in (2 ** 32 - 2, 2 ** 32 - 1, 0, 2):
+            self.assertTrue(stats.update(sequence))
+        self.assertEqual((stats.received, stats.lost), (4, 1))
+
+    def test_datagram_node(self):
+        header = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version)
+        receiver = from_string(header + '<datagram host="127.0.0.1" receive="x"/></ujml>')
+        receiver[0].opened.result(1)
+        port = receiver[0].connection.local_addr[1]
+        sender = from_string(header + '<datagram host="127.0.0.1" remote_host="127.0.0.1" remote_port="{}" '
+                                      'send="x, y"/></ujml>'.format(port))
+        sender[0].opened.result(1)
+        self.assertEqual(sender[0].connection.forwarded_channels, {"x", "y"})
+        self.assertEqual(receiver[0].connection.receive, {"x"})
+
+        asyncio.run_coroutine_threadsafe(sender.channel_register.get_channel("x").flush(1), get_event_loop()).result(1)
+        for _ in range(100):
+            if receiver[0].connection.stats()["packages_received"]:
+                break
+            sleep(0.01)
+        self.assertEqual(receiver[0].connection.stats()["packages_received"], 1)
+        get_event_loop().call_soon_threadsafe(sender[0].connection.close)
+        get_event_loop().call_soon_threadsafe(receiver[0].connection.close)
+
+    def test_datagram_node_on_loop_thread(self):
+        """Creating the node on the event loop thread must not wait on the loop."""
+        header = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version)
+
+        async def run():
+            node = from_string(header + '<datagram host="127.0.0.1" send="x"/></ujml>')[0]
+            await asyncio.wrap_future(node.opened)
+            node.connection.close()
+            return node.connection.forwarded_channels
+
+        self.assertEqual(asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1), set())
+
+    def test_reassembly_limits(self):
+        async def run():
+            receiver = await DatagramConnection.open(("127.0.0.1", 0), max_reassemblies=4, reassembly_timeout=10.,
+                                                     max_datagram_size=8192)
+            addr = ("127.0.0.1", 1234)
+            chunk = b"\0" * (receiver.max_datagram_size - datagram_header_struct.size)
+
+            # A package too long to ever be decoded is dropped before anything is stored.
+            receiver.datagram_received(datagram_header_struct.pack(1, 0, 0xFFFF) + chunk, addr)
+            # So is a fragment longer than a datagram.
+            receiver.datagram_received(datagram_header_struct.pack(2, 0, 2) + chunk + b"\0", addr)
+            invalid = receiver.invalid, len(receiver.fragments)
+
+            # Once the maximum number of incomplete packages is reached, the oldest one is dropped.
+            for sequence in range(10, 16):
+                receiver.datagram_received(datagram_header_struct.pack(sequence, 0, 2) + chunk, addr)
+            pending = sorted(key[1] for key in receiver.fragments), receiver.incomplete
+
+            # Expired packages are dropped.
+            receiver.reassembly_timeout = 0.
+            await asyncio.sleep(0.01)
+            receiver.datagram_received(datagram_header_struct.pack(20, 0, 2) + chunk, addr)
+            expired = sorted(key[1] for key in receiver.fragments), receiver.incomplete
+
+            receiver.close()
+            return invalid, pending, expired
+
+        invalid, pending, expired = asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(1)
+        self.assertEqual(invalid, (2, 0))
+        self.assertEqual(pending, ([12, 13, 14, 15], 2))
+        self.assertEqual(expired, ([20], 6))
+
+
+class TestDecoderThroughput(unittest.TestCase):
+    chunk_size = 64 * 1024  #: Size of the chunks fed into the stream, roughly what a socket delivers at once.
+    total_bytes = 64 * 1024 * 1024  #: Number of bytes transmitted for each frame size.
+
+    def measure(self, frame_size):
+        """Returns the throughput in bytes per second reading frames of the given size from a stream."""
+        data = umsgpack.packb([0, [b"\0" * frame_size]])
+        frame = struct.pack(">I", len(data)) + data
+        n_frames = max(self.total_bytes // len(frame), 1)
+
+        async def feed(reader):
+            view = memoryview(frame)
+            for _ in range(n_frames):
+                for i in range(0, len(frame), self.chunk_size):
+                    reader.feed_data(view[i:i + self.chunk_size])
+                    await asyncio.sleep(0)
+
+        async def run():
+            decoder = Decoder()
+            decoder.restricted = False
+            reader = asyncio.StreamReader()
+            t0 = perf_counter()
+            asyncio.ensure_future(feed(reader))
+            for _ in range(n_frames):
+                await decoder.read_frame(reader)
+                package = await decoder.get()
+                assert len(package[1][0]) == frame_size
+            return n_frames * len(frame) / (perf_counter() - t0)
+
+        return asyncio.run_coroutine_threadsafe(run(), get_event_loop()).result(120)
+
+    def test_throughput(self):
+        """
+        Large frames are read with a single readexactly, so they must be decoded much faster than small frames, whose
+        throughput is dominated by the overhead per frame.
+        """
+        results = [(label, self.measure(size)) for label, size in (("1 KB", 1024),
+                                                                  ("1 MB", 1024 * 1024),
+                                                                  ("64 MB", 64 * 1024 * 1024))]
+        msg = ", ".join("{} frames {:.0f} MB/s".format(label, throughput / 1e6) for label, throughput in results)
+        self.assertGreater(results[1][1], 5 * results[0][1], msg)
+        self.assertGreater(results[2][1], 5 * results[0][1], msg)
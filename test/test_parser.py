@@ -1,6 +1,9 @@
 import unittest
 import os
+import glob
 import inspect
+import tempfile
+import tracemalloc
 
 import numpy as np
 
@@ -41,6 +44,9 @@ class TestParser(unittest.TestCase):
             update_plugins()
 
     def tearDown(self):
+        # Remove the sidecar files of the csv nodes.
+        for path in glob.glob("csv_test.csv.*.npy"):
+            os.remove(path)
         os.chdir(self.old_path)
 
     def test_from_file(self):
@@ -48,6 +54,58 @@ class TestParser(unittest.TestCase):
         from_file("x_example_5.ujml", globals=g)
         assert g['b'] == 123456789
 
+    def test_from_file_generated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "generated.ujml")
+            with open(file_path, "w") as f:
+                f.write('<?xml version="1.0"?><ujml version="{}">\n'.format(uj_version))
+                for i in range(1000):
+                    f.write('<data id="d{0}">{0}</data><!-- comment -->\n'.format(i))
+                # Scripts are executed while parsing, so they can reference everything above them.
+                f.write('<script>total = data["d10"] + data["d999"]</script>\n</ujml>\n')
+
+            for lazy in (False, True):
+                with self.subTest(lazy=lazy):
+                    ujml = from_file(file_path, cache=False, lazy=lazy)
+                    self.assertEqual(ujml.interpreter['total'], 1009)
+                    self.assertEqual(len(ujml), 1001)
+                    self.assertEqual(ujml[500].data, 500)
+                    self.assertEqual(ujml[500].source_line, 502)
+                    self.assertIs(ujml.find_node_by_id("d500"), ujml[500])
+
+    def test_from_file_forward_ref(self):
+        """Refs must find elements that are further down the file than the chunks lxml parses at once."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "forward_ref.ujml")
+            with open(file_path, "w") as f:
+                f.write('<?xml version="1.0"?><ujml version="{}">\n<ref id="late"/>\n'.format(uj_version))
+                f.write('<data>0</data><!-- {} -->\n'.format("x" * 200000))
+                f.write('<data id="late">1</data>\n</ujml>\n')
+
+            for lazy in (False, True):
+                with self.subTest(lazy=lazy):
+                    ujml = from_file(file_path, lazy=lazy)
+                    self.assertEqual([child.data for child in ujml], [1, 0])
+                    self.assertIs(ujml[0], ujml.find_node_by_id("late"))
+
+    def test_from_file_memory(self):
+        """lxml reads the file itself, so its content is never held in memory as a python string."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "large.ujml")
+            with open(file_path, "w") as f:
+                f.write('<?xml version="1.0"?><ujml version="{}">\n'.format(uj_version))
+                f.write('<data>0</data><!-- {} -->\n'.format("x" * (8 << 20)))
+                f.write('<data>1</data>\n</ujml>\n')
+
+            tracemalloc.start()
+            try:
+                ujml = from_file(file_path)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertEqual([child.data for child in ujml], [0, 1])
+            self.assertLess(peak, 1 << 20)
+
     def test_register(self):
         assert test_ext_path in plugin_paths
         assert default_ext_path in plugin_paths
@@ -207,6 +265,37 @@ class TestParser(unittest.TestCase):
         # True if the first node in ujml is the same node as the first node in data.
         assert ujml[0] is ujml[1][0]
 
+    def test_ref_forward(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+                                   <data><ref id="foo"/></data>
+                                   <csv id="foo" file="csv_test.csv"/>
+                                </ujml>'''
+        ujml = from_string(ujml_code)
+        assert ujml[0][0] is ujml[1]
+        assert len(ujml) == 2
+
+    def test_lazy_loading(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+                                   <data id="answer">42</data>
+                                   <script>total = data["answer"] + data["later"]</script>
+                                   <data id="unused">1, 2, 3</data>
+                                   <data id="later">1</data>
+                                </ujml>'''
+        ujml = from_string(ujml_code, lazy=True)
+
+        # The script is executed right away and instantiates the data nodes it references, including forward ones.
+        self.assertEqual(ujml.interpreter['total'], 43)
+        self.assertEqual(set(ujml.node_dict_by_id), {"answer", "later"})
+
+        unused = ujml.find_node_by_id("unused")
+        self.assertEqual(list(unused.data), [1, 2, 3])
+        self.assertIs(ujml.element_index["unused"].node, unused)
+
+        # Accessing the children reads the rest of them in document order, reusing the nodes that already exist.
+        self.assertEqual([child.tag for child in ujml.children], ["data", "script", "data", "data"])
+        self.assertIs(ujml[0], ujml.find_node_by_id("answer"))
+        self.assertIs(ujml[2], unused)
+
     def test_ref_id_not_found(self):
         ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
                         <csv id="foo" file="csv_test.csv"/>
@@ -1,8 +1,10 @@
 import unittest
 from threading import Semaphore
 import asyncio
+from time import sleep
 
-from urban_journey import from_string, plugin_paths, update_plugins, __version__ as uj_version, get_event_loop
+from urban_journey import from_string, plugin_paths, update_plugins, __version__ as uj_version, get_event_loop, \
+    QueuePolicy, get_shard
 from .test_plugins import __path__ as test_ext_path
 
 
@@ -37,6 +39,38 @@ class TestPubSubNodes(unittest.TestCase):
         assert ujml[0].op.channel.name == "bar"
         assert ujml[0].ip.channel.name == "bar"
 
+    def test_port_queue_attributes(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+                       <f_stoff s="s" ip_queue_size="4" ip_queue_policy="coalesce_latest"/>
+                    </ujml>'''
+        s = Semaphore(0)
+        globs = {"s": s}
+        ujml = from_string(ujml_code, globals=globs)
+        assert ujml[0].ip.queue.max_size == 4
+        assert ujml[0].ip.queue.policy is QueuePolicy.coalesce_latest
+        loop = get_event_loop()
+        asyncio.run_coroutine_threadsafe(ujml[0].transmit(), loop=loop)
+        assert s.acquire(timeout=0.1)
+        # The delivery is only counted once the activity has returned.
+        for _ in range(100):
+            if ujml[0].ip.queue.delivered:
+                break
+            sleep(0.001)
+        assert ujml[0].ip.queue.delivered == 1
+
+    def test_shard_attribute(self):
+        ujml_code = '<?xml version="1.0"?><ujml version="{}">'.format(uj_version) + '''
+                       <f_stoff s="s" shard="1"/>
+                    </ujml>'''
+        s = Semaphore(0)
+        globs = {"s": s}
+        ujml = from_string(ujml_code, globals=globs)
+        assert ujml[0].loop is get_shard(1)
+        assert ujml[0].ip.loop is get_shard(1)
+        loop = get_event_loop()
+        asyncio.run_coroutine_threadsafe(ujml[0].transmit(), loop=loop)
+        assert s.acquire(timeout=0.1)
+
     def test_widget_node(self):
         # Warning: This test may potentially lock forever if failing. To fix this timeout param has to be implemented
         #          for 'UjmlNode.pyqt_start()'
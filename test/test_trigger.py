@@ -7,7 +7,7 @@ from urban_journey.pubsub.module_base import ModuleBase
 from urban_journey.pubsub.activity import activity
 from urban_journey.pubsub.trigger import DescriptorClassTrigger
 from urban_journey.pubsub.trigger import TriggerBase
-from urban_journey import Clock
+from urban_journey import Clock, Input
 from urban_journey import event_loop
 
 
@@ -134,3 +134,70 @@ class TestTrigger(unittest.TestCase):
             assert True
 
 
+
+
+class TestConditionAnd(unittest.TestCase):
+    def setUp(self):
+        self.loop = event_loop.get()
+
+    def run_join(self, sends, **alignment):
+        """
+        Triggers the input ports a, b and c of a module with an activity on a & b & c. ``sends`` is a list of
+        ``(port_name, data)`` tuples, or a delay in seconds. Returns the list of parameters the activity received.
+        """
+        received = []
+
+        class Foo(ModuleBase):
+            a = Input()
+            b = Input()
+            c = Input()
+
+            @activity((a & b & c).aligned(**alignment))
+            async def join(self, a, b, c):
+                received.append((a, b, c))
+
+        foo = Foo()
+
+        async def send():
+            for item in sends:
+                if isinstance(item, tuple):
+                    await getattr(foo, item[0]).trigger(item[1])
+                else:
+                    await asyncio.sleep(item)
+
+        asyncio.run_coroutine_threadsafe(send(), self.loop).result(timeout=1)
+        return received, Foo.join.trigger_obj
+
+    def test_latest_of_each(self):
+        received, condition = self.run_join([("a", 1), ("a", 2), ("b", 3), ("c", 4), ("c", 5), ("b", 6), ("a", 7)])
+        self.assertEqual(received, [(2, 3, 4), (7, 6, 5)])
+        self.assertEqual(condition.joined, 2)
+
+    def test_sequence_key(self):
+        received, condition = self.run_join([("a", (1, "a1")),
+                                             ("b", (2, "b2")),
+                                             ("a", (2, "a2")),
+                                             ("c", (2, "c2")),
+                                             ("b", (3, "b3")),
+                                             ("c", (3, "c3")),
+                                             ("a", (3, "a3"))],
+                                            sequence_key=lambda params: next(iter(params.values()))[0])
+        self.assertEqual(received, [((2, "a2"), (2, "b2"), (2, "c2")),
+                                    ((3, "a3"), (3, "b3"), (3, "c3"))])
+        # Sequence 1 can't be completed anymore after sequence 2 has been joined.
+        self.assertEqual(condition.dropped, 1)
+
+    def test_docstring_example(self):
+        """The sequence key example in the ConditionAnd docstring."""
+        received, condition = self.run_join([("a", {"step": 1, "v": "a1"}),
+                                             ("b", {"step": 2, "v": "b2"}),
+                                             ("c", {"step": 2, "v": "c2"}),
+                                             ("a", {"step": 2, "v": "a2"})],
+                                            sequence_key=lambda params: next(iter(params.values()))["step"])
+        self.assertEqual([tuple(data["v"] for data in join) for join in received], [("a2", "b2", "c2")])
+        self.assertEqual(condition.dropped, 1)
+
+    def test_time_window(self):
+        received, condition = self.run_join([("a", 1), 0.05, ("b", 2), ("c", 3), ("a", 4)], time_window=0.02)
+        self.assertEqual(received, [(4, 2, 3)])
+        self.assertEqual(condition.dropped, 1)
@@ -16,6 +16,7 @@ from urban_journey.pubsub.activity import activity, ActivityBase, ActivityMode
 from urban_journey.pubsub.ports.base import PortBase
 from urban_journey.pubsub.ports.input import InputPortStatic as Input, InputPort
 from urban_journey.pubsub.ports.output import Output, OutputPort
+from urban_journey.pubsub.ports.queue import QueuePolicy
 from urban_journey.pubsub.trigger import TriggerBase
 from urban_journey.pubsub.module_base import ModuleBase
 from urban_journey.pubsub.channels.channel_register import ChannelRegister
@@ -35,13 +36,14 @@ from urban_journey.ujml.plugin_register import plugin_paths, node_register, upda
 from urban_journey.ujml.widget_node_base import QWidgetNodeBase, UjQtSignal
 from urban_journey.ujml.interpreter import UJMLPythonInterpreter
 from urban_journey.ujml.data_container import DataContainer
+from urban_journey.ujml.data_cache import DataCache
 
 
 # General stuff
-from urban_journey.event_loop import get as get_event_loop, get_thread as get_event_thread
+from urban_journey.event_loop import get as get_event_loop, get_thread as get_event_thread, get_shard, set_shard_count
 from urban_journey.uj_project import UjProject
 # from urban_journey.clock import clock_descriptor_factory as Clock
 
-from urban_journey.new_clock import ClockStatic as Clock
+from urban_journey.new_clock import ClockStatic as Clock, OverrunPolicy
 
 import urban_journey.logging
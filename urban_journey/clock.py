@@ -5,6 +5,7 @@ import sys
 from urban_journey.pubsub.trigger import TriggerBase
 from urban_journey.pubsub.trigger.descriptor_class_trigger import DescriptorClassTrigger
 from urban_journey import event_loop
+from urban_journey.timer_wheel import get_timer_wheel
 
 
 # NOTE: This is an old version of the clck trigger. do not use it. use the one defined in new_clock.py instead.
@@ -23,7 +24,8 @@ def clock_descriptor_factory():
 
 class Clock(TriggerBase):
     """
-    A trigger that triggers at a fixed period.
+    A trigger that triggers at a fixed period. Set :attr:`use_timer_wheel` to sleep on the shared timer wheel, like
+    :class:`urban_journey.new_clock.ClockInstance`.
     """
 
     def __init__(self, frequency=1):
@@ -32,6 +34,11 @@ class Clock(TriggerBase):
         self.period = 1 / frequency
         self.trigger_time = None
         self.running = False
+        self.use_timer_wheel = False
+        """
+        True to sleep until absolute deadlines in the shared timer wheel. Clocks with a period shorter than the
+        resolution of the wheel always use :func:`asyncio.sleep`.
+        """
 
     @property
     def frequency(self):
@@ -54,6 +61,13 @@ class Clock(TriggerBase):
         self.running = False
 
     async def timer_callback(self):
-        while self.running:
-            await asyncio.sleep(self.period)
-            await self.trigger()
+        wheel = get_timer_wheel(self.loop)
+        if self.use_timer_wheel and self.period >= wheel.resolution:
+            while self.running:
+                await wheel.sleep_until(self.trigger_time)
+                self.trigger_time += self.period
+                await self.trigger()
+        else:
+            while self.running:
+                await asyncio.sleep(self.period)
+                await self.trigger()
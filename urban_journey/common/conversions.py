@@ -90,6 +90,49 @@ def dcm_to_q(DCM):
     return q
 
 
+def dcm_to_q_batch(DCM):
+    """Converts a stack of Direction Cosine Matrices to Quaternions.
+
+    Parameters
+    ----------
+    DCM : array_like
+        Direction Cosine Matrices, shape (N, 3, 3).
+
+    Returns
+    -------
+    q : numpy_array
+        Quaternions, shape (N, 4).
+
+    Raises
+    ------
+    ValueError
+        If the passed matrices are not 3x3.
+    """
+
+    DCM = np.asarray(DCM, dtype=float)
+    if DCM.ndim != 3 or DCM.shape[1:] != (3, 3):
+        raise ValueError("Invalid DCM")
+
+    # Symmetric matrices holding 4*q[i]*q[j]. The row with the largest diagonal element gives the most accurate
+    # quaternion, so each sample is computed from that row.
+    M = np.empty((len(DCM), 4, 4))
+    M[:, 0, 0] = 1 + DCM[:, 0, 0] + DCM[:, 1, 1] + DCM[:, 2, 2]
+    M[:, 1, 1] = 1 + DCM[:, 0, 0] - DCM[:, 1, 1] - DCM[:, 2, 2]
+    M[:, 2, 2] = 1 - DCM[:, 0, 0] + DCM[:, 1, 1] - DCM[:, 2, 2]
+    M[:, 3, 3] = 1 - DCM[:, 0, 0] - DCM[:, 1, 1] + DCM[:, 2, 2]
+    M[:, 0, 1] = M[:, 1, 0] = DCM[:, 1, 2] - DCM[:, 2, 1]
+    M[:, 0, 2] = M[:, 2, 0] = DCM[:, 2, 0] - DCM[:, 0, 2]
+    M[:, 0, 3] = M[:, 3, 0] = DCM[:, 0, 1] - DCM[:, 1, 0]
+    M[:, 1, 2] = M[:, 2, 1] = DCM[:, 0, 1] + DCM[:, 1, 0]
+    M[:, 1, 3] = M[:, 3, 1] = DCM[:, 2, 0] + DCM[:, 0, 2]
+    M[:, 2, 3] = M[:, 3, 2] = DCM[:, 1, 2] + DCM[:, 2, 1]
+
+    i = np.arange(len(DCM))
+    case = np.argmax(np.diagonal(M, axis1=1, axis2=2), axis=1)
+    rows = M[i, case]
+    return 0.5 * rows / np.sqrt(rows[i, case])[:, np.newaxis]
+
+
 def q_to_dcm(q):
     """Converts Quaternions to Direction Cosine Matrix.
     
@@ -110,6 +153,35 @@ def q_to_dcm(q):
     return DCM
 
 
+def q_to_dcm_batch(q):
+    """Converts a stack of Quaternions to Direction Cosine Matrices.
+
+    Parameters
+    ----------
+    q : array_like
+        Quaternions, shape (N, 4).
+
+    Returns
+    -------
+    DCM : numpy_array
+        Direction Cosine Matrices, shape (N, 3, 3).
+    """
+
+    q0, q1, q2, q3 = np.asarray(q, dtype=float).T
+
+    DCM = np.empty((len(q0), 3, 3))
+    DCM[:, 0, 0] = q0**2+q1**2-q2**2-q3**2
+    DCM[:, 0, 1] = 2*q1*q2+2*q0*q3
+    DCM[:, 0, 2] = 2*q1*q3-2*q0*q2
+    DCM[:, 1, 0] = 2*q1*q2-2*q0*q3
+    DCM[:, 1, 1] = q0**2-q1**2+q2**2-q3**2
+    DCM[:, 1, 2] = 2*q2*q3+2*q0*q1
+    DCM[:, 2, 0] = 2*q1*q3+2*q0*q2
+    DCM[:, 2, 1] = 2*q2*q3-2*q0*q1
+    DCM[:, 2, 2] = q0**2-q1**2-q2**2+q3**2
+    return DCM
+
+
 def omega_to_qdot(omega, quat, k=1.0):
     """Converts Rotational Rates (omega) to Quaternion rates.
     
@@ -163,6 +235,11 @@ def dcm_to_euler(DCM, rtype='zyx', unit='rad'):
     r0 : float  
     r1 : float
     r2 : float
+
+    Raises
+    ------
+    ValueError
+        If the passed rotational order is not supported.
     """
 
     rtype = rtype.lower()
@@ -195,6 +272,8 @@ def dcm_to_euler(DCM, rtype='zyx', unit='rad'):
         r0, r1, r2 =  _threeaxisrot(DCM[1,2], DCM[1,1], -DCM[1,0], DCM[2,0], DCM[0,0])
     elif rtype == 'xzx':
         r0, r1, r2 =  _twoaxisrot(DCM[0,2], DCM[0,1], DCM[0,0], DCM[2,0], -DCM[1,0])
+    else:
+        raise ValueError('Invalid rotation order')
 
     if unit == 'rad':
         return r0, r1, r2
@@ -202,6 +281,43 @@ def dcm_to_euler(DCM, rtype='zyx', unit='rad'):
         return np.rad2deg(r0), np.rad2deg(r1), np.rad2deg(r2)
 
 
+def dcm_to_euler_batch(DCM, rtype='zyx', unit='rad'):
+    """Converts a stack of Direction Cosine Matrices to Euler angles.
+
+    Parameters
+    ----------
+    DCM : array_like
+        Direction Cosine Matrices, shape (N, 3, 3).
+    rtype : string, optional
+        Type of Euler angle to convert to (the default is zyx).
+    unit : string
+        Unit of the angles, can be 'deg' or 'rad' (default is rad).
+
+    Returns
+    -------
+    angles : numpy_array
+        Euler angles, shape (N, 3).
+
+    Raises
+    ------
+    ValueError
+        If the passed rotational order is not supported.
+    """
+
+    try:
+        axisrot, elements = _euler_elements[rtype.lower()]
+    except KeyError:
+        raise ValueError('Invalid rotation order')
+
+    DCM = np.asarray(DCM, dtype=float)
+    angles = np.stack(axisrot(*(sign*DCM[:, row, col] for row, col, sign in elements)), axis=-1)
+
+    if unit == 'rad':
+        return angles
+    else:
+        return np.rad2deg(angles)
+
+
 def _threeaxisrot(r11,r12,r21,r31,r32):
     r0 = np.arctan2( r11, r12 );
     r1 = np.arcsin( r21 );
@@ -216,6 +332,23 @@ def _twoaxisrot(r11, r12, r21, r31, r32):
     return r0, r1, r2 
 
 
+# DCM elements passed to the axis rotation function of each Euler angle type, as (row, column, sign).
+_euler_elements = {
+    'zyx': (_threeaxisrot, ((0, 1, 1), (0, 0, 1), (0, 2, -1), (1, 2, 1), (2, 2, 1))),
+    'zyz': (_twoaxisrot, ((2, 1, 1), (2, 0, 1), (2, 2, 1), (1, 2, 1), (0, 2, -1))),
+    'zxy': (_threeaxisrot, ((1, 0, -1), (1, 1, 1), (1, 2, 1), (0, 2, -1), (2, 2, 1))),
+    'zxz': (_twoaxisrot, ((2, 0, 1), (2, 1, -1), (2, 2, 1), (0, 2, 1), (1, 2, 1))),
+    'yxz': (_threeaxisrot, ((2, 0, 1), (2, 2, 1), (2, 1, -1), (0, 1, 1), (1, 1, 1))),
+    'yxy': (_twoaxisrot, ((1, 0, 1), (1, 2, 1), (1, 1, 1), (0, 1, 1), (2, 1, -1))),
+    'yzx': (_threeaxisrot, ((0, 2, -1), (0, 0, 1), (0, 1, 1), (2, 1, -1), (1, 1, 1))),
+    'yzy': (_twoaxisrot, ((1, 2, 1), (1, 0, -1), (1, 1, 1), (2, 1, 1), (0, 1, 1))),
+    'xyz': (_threeaxisrot, ((2, 1, -1), (2, 2, 1), (2, 0, 1), (1, 0, -1), (0, 0, 1))),
+    'xyx': (_twoaxisrot, ((0, 1, 1), (0, 2, -1), (0, 0, 1), (1, 0, 1), (2, 0, 1))),
+    'xzy': (_threeaxisrot, ((1, 2, 1), (1, 1, 1), (1, 0, -1), (2, 0, 1), (0, 0, 1))),
+    'xzx': (_twoaxisrot, ((0, 2, 1), (0, 1, 1), (0, 0, 1), (2, 0, 1), (1, 0, -1))),
+}
+
+
 def euler_to_dcm(phi ,theta, psi, rtype = "zyx", unit='rad'):
     """Converts Euler angles to Direction Cosine Matrix.
     
@@ -346,6 +479,47 @@ def flat_to_lla(x, lla0):
     return np.add(lla0, np.array([[dLat],[dLon],[da]]))
 
 
+def flat_to_lla_batch(x, lla0):
+    """Estimate geodetic latitude, longitude, and altitude from flat Earth
+    positions.
+
+    Parameters
+    ----------
+    x : array_like
+        Positions w.r.t. lla0, shape (N, 3).
+    lla0 : array_like
+        Reference location of latitude longitude and altitude, shape (3,) or
+        one per position (N, 3).
+
+    Returns
+    -------
+    lla : numpy_array
+        Latitude longitude and altitude, shape (N, 3).
+    """
+
+    x = np.asarray(x, dtype=float)
+    lla0 = np.asarray(lla0, dtype=float)
+
+    # Data from WGS84
+    a =  6378137.0
+    f  = 1/298.257223563
+
+    # Some speed optimization
+    F = (2*f-f*f)
+    rlat = lla0[..., 0]
+    srlat2 = np.sin(rlat)
+
+    Rn = a/np.sqrt(1-F*srlat2)
+    Rm = Rn*((1-F)/(1-F*srlat2))
+
+    # Change in lla
+    dLat = x[:, 0]*np.arctan2(1, Rm)
+    dLon = x[:, 1]*np.arctan2(1, Rn*np.cos(rlat))
+    da = -x[:, 2]
+
+    return lla0 + np.stack((dLat, dLon, da), axis=-1)
+
+
 def ecef_to_wgs84(Xc):
     """Converts coordinates (x,y,z) in the ECEF frame to coordinates 
     (lat,lon,h) in the WGS84 frame [1]_ .
@@ -414,6 +588,71 @@ def ecef_to_wgs84(Xc):
     return np.array([[lat],[lon],[h]])
 
 
+def ecef_to_wgs84_batch(Xc):
+    """Converts coordinates (x,y,z) in the ECEF frame to coordinates
+    (lat,lon,h) in the WGS84 frame, see :func:`ecef_to_wgs84`.
+
+    Parameters
+    ----------
+    Xc : array_like
+        Coordinates (x,y,z) in ECEF frame (m), shape (N, 3).
+
+    Returns
+    -------
+    lla : numpy_array
+        Lla (geodetic latitude (rad), geodetic longitude (rad), altitude
+        above WGS84 ellipsoid (m), shape (N, 3).
+    """
+
+    Xc = np.asarray(Xc, dtype=float)
+    x = Xc[:, 0] ; y = Xc[:, 1] ; z = Xc[:, 2]
+
+    # Data from WGS84
+    a = 6378137.0
+    finv = 298.257223563
+
+    # Algorithm (Python port of Fortran code)
+    f = 1/finv
+    e2 = (2-f)*f
+    ec2 = 1-e2
+    ec = math.sqrt(ec2)
+    b = a*ec
+    c = a*e2
+
+    s0 = np.abs(z)
+    p2 = x*x+y*y
+    p = np.sqrt(p2)
+    zc = ec*s0
+    c0 = ec*p
+    c02 = c0*c0
+    c03 = c02*c0
+    s02 = s0*s0
+    s03 = s02*s0
+    a02 = c02+s02
+    a0 = np.sqrt(a02)
+    a03 = a02*a0
+    s1 = zc*a03+c*s03
+    c1 = p*a03-c*c03
+    cs0c0 =c*c0*s0
+    b0 = 1.5*cs0c0*((p*s0-zc*c0)*a0-cs0c0)
+    s1 = s1*a03-b0*s0
+    cc = ec*(c1*a03-b0*c0)
+    s12 = s1*s1
+    cc2 = cc*cc
+
+    # Points on the polar axis divide by zero, their latitude and altitude are set below.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lat = np.arctan(s1/cc)
+        h = (p*cc+s0*s1-a*np.sqrt(ec2*s12+cc2))/np.sqrt(s12+cc2)
+    polar = p2 == 0
+    lat[polar] = math.pi/2
+    h[polar] = s0[polar]-b
+
+    lon = np.arctan2(y,x)
+    lat[z < 0] *= -1
+    return np.stack((lat, lon, h), axis=-1)
+
+
 def wgs84_to_ecef(lla ,unit="rad"):
     """Converts coordinates (altitude, latitude, longitude) in WGS84 to 
     coordinates (x,y,z) in the ECEF reference frame.
@@ -459,6 +698,52 @@ def wgs84_to_ecef(lla ,unit="rad"):
     return np.array([[x],[y],[z]])
 
 
+def wgs84_to_ecef_batch(lla, unit="rad"):
+    """Converts coordinates (altitude, latitude, longitude) in WGS84 to
+    coordinates (x,y,z) in the ECEF reference frame.
+
+    Parameters
+    ----------
+    lla : array_like
+        Geodetic latitude, geodetic longitude and altitude above the WGS84
+        ellipsoid (m), shape (N, 3).
+    unit : string, optional
+        Unit of the latitude and longitude, deg or rad (default is rad).
+
+    Returns
+    -------
+    x : numpy_array
+        Coordinates in ECEF frame (m), shape (N, 3).
+    """
+
+    # Data from the WGS84 model
+    a = 6378137.0
+    finv = 298.257223563
+
+    # Data from array
+    lla = np.asarray(lla, dtype=float)
+    lat = lla[:, 0]
+    lon = lla[:, 1]
+    h = lla[:, 2]
+
+    # Unit conversion
+    unit = unit.lower()
+    if unit == "deg":
+        lat = np.radians(lat)
+        lon = np.radians(lon)
+
+    # Intermediate stuff
+    b = a*(1-1/finv)
+    psi = np.arctan(np.tan(lat)*b/a)          # Magically works at the singularities!
+    r = a*np.cos(psi)+h*np.cos(lat)
+
+    x = r*np.cos(lon)
+    y = r*np.sin(lon)
+    z = b*np.sin(psi) + h*np.sin(lat)
+
+    return np.stack((x, y, z), axis=-1)
+
+
 def ecef_to_spherical(Xc):
     x = Xc[0,0] ; y = Xc[1,0] ; z = Xc[2,0]
     r = math.sqrt(x**2+y**2+z**2)
@@ -1,4 +1,5 @@
 import unittest
+from time import perf_counter
 from ..conversions import *
 
 
@@ -55,3 +56,84 @@ class Conversions(unittest.TestCase):
             self.assertAlmostEqual(dcm[0,2], results[i][6], msg='Falied at "%s".'%(rtype))
             self.assertAlmostEqual(dcm[1,2], results[i][7], msg='Falied at "%s".'%(rtype))
             self.assertAlmostEqual(dcm[2,2], results[i][8], msg='Falied at "%s".'%(rtype))
+
+
+class BatchConversions(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.lla = np.column_stack((rng.uniform(-1.5, 1.5, 100), rng.uniform(-3, 3, 100), rng.uniform(-100, 1e4, 100)))
+        q = rng.randn(100, 4)
+        self.q = q / np.linalg.norm(q, axis=1)[:, np.newaxis]
+
+    def test_wgs84_ecef(self):
+        ecef = wgs84_to_ecef_batch(self.lla)
+        self.assertEqual(ecef.shape, (100, 3))
+        for lla, x in zip(self.lla, ecef):
+            np.testing.assert_allclose(wgs84_to_ecef(lla.reshape(3, 1))[:, 0], x)
+        np.testing.assert_allclose(ecef_to_wgs84_batch(ecef), self.lla, atol=1e-6)
+
+        deg = self.lla.copy()
+        deg[:, :2] = np.rad2deg(deg[:, :2])
+        np.testing.assert_allclose(wgs84_to_ecef_batch(deg, "deg"), ecef)
+
+    def test_ecef_to_wgs84_poles(self):
+        lla = ecef_to_wgs84_batch([[0, 0, 6400000], [0, 0, -6400000], [7000000, 0, 0]])
+        np.testing.assert_allclose(lla[:, 0], [np.pi/2, -np.pi/2, 0])
+        np.testing.assert_allclose(lla[:2, 2], 6400000 - 6356752.314245, rtol=1e-9)
+
+    def test_quaternions(self):
+        dcm = q_to_dcm_batch(self.q)
+        self.assertEqual(dcm.shape, (100, 3, 3))
+        np.testing.assert_allclose(np.linalg.det(dcm), 1)
+        for q, d in zip(self.q, dcm):
+            np.testing.assert_allclose(q_to_dcm(q.reshape(4, 1)), d)
+
+        # q and -q are the same rotation.
+        q = dcm_to_q_batch(dcm)
+        np.testing.assert_allclose(np.abs(np.sum(q * self.q, axis=1)), 1)
+        for d, q1 in zip(dcm, q):
+            np.testing.assert_allclose(dcm_to_q(d)[:, 0], q1)
+
+        with self.assertRaises(ValueError):
+            dcm_to_q_batch(np.eye(4)[np.newaxis])
+
+    def test_dcm_to_euler(self):
+        dcm = q_to_dcm_batch(self.q)
+        for rtype in ['zyx', 'zyz', 'zxy', 'zxz', 'yxz', 'yxy', 'yzx', 'yzy', 'xyz', 'xyx', 'xzy', 'xzx']:
+            angles = dcm_to_euler_batch(dcm, rtype)
+            self.assertEqual(angles.shape, (100, 3))
+            np.testing.assert_allclose(dcm_to_euler(dcm[0], rtype), angles[0])
+            np.testing.assert_allclose([euler_to_dcm(*a, rtype=rtype) for a in angles], dcm, atol=1e-9)
+        np.testing.assert_allclose(dcm_to_euler_batch(dcm, unit='deg'), np.rad2deg(dcm_to_euler_batch(dcm)))
+        with self.assertRaises(ValueError):
+            dcm_to_euler_batch(dcm, 'zzz')
+        with self.assertRaises(ValueError):
+            dcm_to_euler(dcm[0], 'zzz')
+
+    def test_flat_to_lla(self):
+        x = np.random.RandomState(1).randn(100, 3) * 1000
+        lla = flat_to_lla_batch(x, self.lla)
+        for x1, lla0, lla1 in zip(x, self.lla, lla):
+            np.testing.assert_allclose(flat_to_lla(x1.reshape(3, 1), lla0.reshape(3, 1))[:, 0], lla1)
+        np.testing.assert_allclose(flat_to_lla_batch(x, self.lla[0]), flat_to_lla_batch(x, self.lla[[0] * 100]))
+
+    def test_speedup(self):
+        """The batch functions must be much faster than calling the single-sample functions in a loop."""
+        n = 1000
+        lla = np.tile(self.lla, (n // 100, 1))
+        dcm = np.tile(q_to_dcm_batch(self.q), (n // 100, 1, 1))
+        functions = [(wgs84_to_ecef, wgs84_to_ecef_batch, lla, (3, 1)),
+                     (ecef_to_wgs84, ecef_to_wgs84_batch, wgs84_to_ecef_batch(lla), (3, 1)),
+                     (q_to_dcm, q_to_dcm_batch, np.tile(self.q, (n // 100, 1)), (4, 1)),
+                     (dcm_to_q, dcm_to_q_batch, dcm, (3, 3)),
+                     (dcm_to_euler, dcm_to_euler_batch, dcm, (3, 3))]
+        for single, batch, samples, shape in functions:
+            t0 = perf_counter()
+            for sample in samples:
+                single(sample.reshape(shape))
+            t_loop = perf_counter() - t0
+            t0 = perf_counter()
+            batch(samples)
+            t_batch = perf_counter() - t0
+            self.assertGreater(t_loop, 10 * t_batch, "{}: loop {:.2e} [s], batch {:.2e} [s]".format(
+                single.__name__, t_loop, t_batch))
@@ -1,4 +1,5 @@
 import unittest
+from time import perf_counter
 from ..transformations import *
 
 class Transformations(unittest.TestCase):
@@ -40,4 +41,72 @@ class Transformations(unittest.TestCase):
         
     def test_TEa(self):
         dcm = TEa(0, 0, 0)
-        self.assertEqual(np.linalg.det(dcm),1)
\ No newline at end of file
+        self.assertEqual(np.linalg.det(dcm),1)
+
+
+class StackedTransformations(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.angles = rng.uniform(-np.pi, np.pi, (3, 50))
+        self.v = rng.randn(50, 3)
+        self.functions = [(TCI, TCI_batch, TCI_apply, 1), (TIC, TIC_batch, TIC_apply, 1),
+                          (Tab, Tab_batch, Tab_apply, 2), (Tba, Tba_batch, Tba_apply, 2),
+                          (TEC, TEC_batch, TEC_apply, 2), (TCE, TCE_batch, TCE_apply, 2),
+                          (TbE, TbE_batch, TbE_apply, 3), (TEb, TEb_batch, TEb_apply, 3),
+                          (TaE, TaE_batch, TaE_apply, 3), (TEa, TEa_batch, TEa_apply, 3)]
+
+    def test_batch(self):
+        for single, batch, apply, n_angles in self.functions:
+            angles = self.angles[:n_angles] * (1e4 if single in (TCI, TIC) else 1)
+            T = batch(*angles)
+            self.assertEqual(T.shape, (50, 3, 3))
+            for i in range(50):
+                np.testing.assert_allclose(T[i], single(*angles[:, i]), atol=1e-12, err_msg=single.__name__)
+
+            # Scalar angles are broadcast.
+            np.testing.assert_allclose(batch(*angles[:, 0]), single(*angles[:, 0])[np.newaxis], atol=1e-12)
+
+    def test_out(self):
+        out = np.zeros((50, 3, 3))
+        self.assertIs(TbE_batch(*self.angles, out=out), out)
+        np.testing.assert_allclose(out, TbE_batch(*self.angles))
+        self.assertIs(TEb_batch(*self.angles, out=out), out)
+        np.testing.assert_allclose(out, TbE_batch(*self.angles).transpose(0, 2, 1))
+        with self.assertRaises(ValueError):
+            TbE_batch(*self.angles, out=np.zeros((49, 3, 3)))
+
+    def test_apply(self):
+        for single, batch, apply, n_angles in self.functions:
+            angles = self.angles[:n_angles] * (1e4 if single in (TCI, TIC) else 1)
+            np.testing.assert_allclose(apply(*angles, self.v), transform(batch(*angles), self.v), atol=1e-12,
+                                       err_msg=single.__name__)
+
+        # Transform the vectors in place.
+        v = self.v.copy()
+        self.assertIs(TaE_apply(*self.angles, v, out=v), v)
+        np.testing.assert_allclose(TEa_apply(*self.angles, v), self.v)
+
+        # A single vector is broadcast.
+        np.testing.assert_allclose(Tab_apply(*self.angles[:2], self.v[0]),
+                                   transform(Tab_batch(*self.angles[:2]), np.tile(self.v[0], (50, 1))))
+
+    def test_speedup(self):
+        """Building or applying the matrices of many samples at once must be much faster than a loop."""
+        n = 1000
+        angles = np.tile(self.angles, n // 50)
+        v = np.tile(self.v, (n // 50, 1))
+
+        t0 = perf_counter()
+        for i in range(n):
+            TbE(*angles[:, i]).dot(v[i])
+        t_loop = perf_counter() - t0
+        t0 = perf_counter()
+        transform(TbE_batch(*angles), v)
+        t_batch = perf_counter() - t0
+        t0 = perf_counter()
+        TbE_apply(*angles, v)
+        t_apply = perf_counter() - t0
+
+        msg = "loop {:.2e} [s], batch {:.2e} [s], apply {:.2e} [s]".format(t_loop, t_batch, t_apply)
+        self.assertGreater(t_loop, 10 * t_batch, msg)
+        self.assertGreater(t_loop, 10 * t_apply, msg)
@@ -217,4 +217,463 @@ def TEa(chi, gamma, mu):
         Transformation matrix from aerodynamic to Vehicle carried normal frame.
     """
     
-    return TaE(chi, gamma, mu).transpose()
\ No newline at end of file
+    return TaE(chi, gamma, mu).transpose()
+
+# Stacked transformations
+#
+# The *_batch functions take arrays of N angles and return the N transformation matrices as an (N, 3, 3) array. Scalar
+# angles are broadcast against the arrays. Pass ``out`` to fill an existing array instead of allocating a new one.
+#
+# The *_apply functions transform N vectors, (N, 3) array, directly. They rotate the vectors about one axis at a time,
+# so the matrices are never built. Use :func:`transform` to apply matrices that are already built.
+
+def transform(T, v, out=None):
+    """Applies stacked transformation matrices to vectors.
+    
+    Parameters
+    ----------
+    T : array_like
+        Transformation matrices, shape (N, 3, 3).
+    v : array_like
+        Vectors, shape (N, 3).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to.
+        
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    return np.einsum('nij,nj->ni', T, v, out=out)
+
+def TCI_batch(t, omega_t = 7.2921235169904e-5, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-I` to :ref:`sec:F-C`,
+    see :func:`TCI`.
+    
+    Parameters
+    ----------
+    t : array_like
+        Times (s), shape (N,).
+    omega_t : float, optional
+        Earth's rotational rate (rad/s).
+    out : numpy_array, optional
+        Array (N, 3, 3) to write the matrices to.
+    
+    Returns
+    -------
+    TCI : numpy_array
+        Transformation matrices, shape (N, 3, 3).
+    """
+    
+    sang, cang = _sin_cos(omega_t*np.asarray(t, dtype=float))
+    out = _stack_out(sang.shape[1], out)
+    out[:, 0, 0] = cang[0]
+    out[:, 0, 1] = sang[0]
+    out[:, 0, 2] = 0
+    out[:, 1, 0] = -sang[0]
+    out[:, 1, 1] = cang[0]
+    out[:, 1, 2] = 0
+    out[:, 2, 0] = 0
+    out[:, 2, 1] = 0
+    out[:, 2, 2] = 1
+    return out
+
+def TIC_batch(t, omega_t = 7.2921235169904e-5, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-C` to :ref:`sec:F-I`,
+    see :func:`TIC`. Parameters as in :func:`TCI_batch`."""
+    
+    out = _stack_out(np.size(t), out)
+    TCI_batch(t, omega_t, out.transpose(0, 2, 1))
+    return out
+
+def Tab_batch(alpha, beta, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-b` to :ref:`sec:F-a`,
+    see :func:`Tab`.
+    
+    Parameters
+    ----------
+    alpha : array_like
+        Aerodynamic angles of attack (radians), shape (N,).
+    beta : array_like
+        Aerodynamic angles of side-slip (radians), shape (N,).
+    out : numpy_array, optional
+        Array (N, 3, 3) to write the matrices to.
+        
+    Returns
+    -------
+    Tab : numpy_array
+        Transformation matrices, shape (N, 3, 3).
+    """
+    
+    sang, cang = _sin_cos(alpha, beta)
+    out = _stack_out(sang.shape[1], out)
+    out[:, 0, 0] = cang[1]*cang[0]
+    out[:, 0, 1] = sang[1]
+    out[:, 0, 2] = cang[1]*sang[0]
+    out[:, 1, 0] = -sang[1]*cang[0]
+    out[:, 1, 1] = cang[1]
+    out[:, 1, 2] = -sang[1]*sang[0]
+    out[:, 2, 0] = -sang[0]
+    out[:, 2, 1] = 0
+    out[:, 2, 2] = cang[0]
+    return out
+
+def Tba_batch(alpha, beta, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-a` to :ref:`sec:F-b`,
+    see :func:`Tba`. Parameters as in :func:`Tab_batch`."""
+    
+    out = _stack_out(np.broadcast(alpha, beta).size, out)
+    Tab_batch(alpha, beta, out.transpose(0, 2, 1))
+    return out
+
+def TEC_batch(tau, delta, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-C` to the
+    :ref:`sec:F-E`, see :func:`TEC`.
+    
+    Parameters
+    ----------
+    tau : array_like
+        Longitudes (radians), shape (N,).
+    delta : array_like
+        Latitudes (radians), shape (N,).
+    out : numpy_array, optional
+        Array (N, 3, 3) to write the matrices to.
+    
+    Returns
+    -------
+    TEC : numpy_array
+        Transformation matrices, shape (N, 3, 3).
+    """
+    
+    sang, cang = _sin_cos(tau, delta)
+    out = _stack_out(sang.shape[1], out)
+    out[:, 0, 0] = -sang[1]*cang[0]
+    out[:, 0, 1] = -sang[1]*sang[0]
+    out[:, 0, 2] = cang[1]
+    out[:, 1, 0] = -sang[0]
+    out[:, 1, 1] = cang[0]
+    out[:, 1, 2] = 0
+    out[:, 2, 0] = -cang[1]*cang[0]
+    out[:, 2, 1] = -cang[1]*sang[0]
+    out[:, 2, 2] = -sang[1]
+    return out
+
+def TCE_batch(tau, delta, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-E` to the
+    :ref:`sec:F-C`, see :func:`TCE`. Parameters as in :func:`TEC_batch`."""
+    
+    out = _stack_out(np.broadcast(tau, delta).size, out)
+    TEC_batch(tau, delta, out.transpose(0, 2, 1))
+    return out
+
+def TbE_batch(psi, theta, phi, out=None):
+    """Stacked transformation matrices from :ref:`sec:F-E` to the
+    :ref:`sec:F-b`, see :func:`TbE`.
+    
+    Parameters
+    ----------
+    psi : array_like
+        Yaw angles about the Z_E-axis (radians), shape (N,).
+    theta : array_like
+        Pitch angles about the Y_E-axis (radians), shape (N,).
+    phi : array_like
+        Roll angles about the X_E-axis (radians), shape (N,).
+    out : numpy_array, optional
+        Array (N, 3, 3) to write the matrices to.
+    
+    Returns
+    -------
+    TbE : numpy_array
+        Transformation matrices, shape (N, 3, 3).
+    """
+    
+    sang, cang = _sin_cos(psi, theta, phi)
+    out = _stack_out(sang.shape[1], out)
+    out[:, 0, 0] = cang[1]*cang[0]
+    out[:, 0, 1] = cang[1]*sang[0]
+    out[:, 0, 2] = -sang[1]
+    out[:, 1, 0] = sang[2]*sang[1]*cang[0]-cang[2]*sang[0]
+    out[:, 1, 1] = sang[2]*sang[1]*sang[0]+cang[2]*cang[0]
+    out[:, 1, 2] = sang[2]*cang[1]
+    out[:, 2, 0] = cang[2]*sang[1]*cang[0]+sang[2]*sang[0]
+    out[:, 2, 1] = cang[2]*sang[1]*sang[0]-sang[2]*cang[0]
+    out[:, 2, 2] = cang[2]*cang[1]
+    return out
+
+def TEb_batch(psi, theta, phi, out=None):
+    """Stacked transformation matrices from the :ref:`sec:F-b` to
+    :ref:`sec:F-E`, see :func:`TEb`. Parameters as in :func:`TbE_batch`."""
+    
+    out = _stack_out(np.broadcast(psi, theta, phi).size, out)
+    TbE_batch(psi, theta, phi, out.transpose(0, 2, 1))
+    return out
+
+def TaE_batch(chi, gamma, mu, out=None):
+    """Stacked transformation matrices from the :ref:`sec:F-E` to the
+    :ref:`sec:F-a`, see :func:`TaE`.
+    
+    Parameters
+    ----------
+    chi : array_like
+        Aerodynamic heading angles about the Z_E-axis (radians), shape (N,).
+    gamma : array_like
+        Aerodynamic flight-path angles about the Y_E-axis (radians), shape (N,).
+    mu : array_like
+        Aerodynamic bank angles about the X_a-axis (radians), shape (N,).
+    out : numpy_array, optional
+        Array (N, 3, 3) to write the matrices to.
+    
+    Returns
+    -------
+    TaE : numpy_array
+        Transformation matrices, shape (N, 3, 3).
+    """
+    
+    sang, cang = _sin_cos(chi, gamma, mu)
+    out = _stack_out(sang.shape[1], out)
+    out[:, 0, 0] = cang[1]*cang[0]
+    out[:, 0, 1] = cang[1]*sang[0]
+    out[:, 0, 2] = -sang[1]
+    out[:, 1, 0] = -sang[2]*sang[1]*cang[0]-cang[2]*sang[0]
+    out[:, 1, 1] = -sang[2]*sang[1]*sang[0]+cang[2]*cang[0]
+    out[:, 1, 2] = -sang[2]*cang[1]
+    out[:, 2, 0] = cang[2]*sang[1]*cang[0]-sang[2]*sang[0]
+    out[:, 2, 1] = cang[2]*sang[1]*sang[0]+sang[2]*cang[0]
+    out[:, 2, 2] = cang[2]*cang[1]
+    return out
+
+def TEa_batch(chi, gamma, mu, out=None):
+    """Stacked transformation matrices from the :ref:`sec:F-a` to the
+    :ref:`sec:F-E`, see :func:`TEa`. Parameters as in :func:`TaE_batch`."""
+    
+    out = _stack_out(np.broadcast(chi, gamma, mu).size, out)
+    TaE_batch(chi, gamma, mu, out.transpose(0, 2, 1))
+    return out
+
+def TCI_apply(t, v, omega_t = 7.2921235169904e-5, out=None):
+    """Transforms vectors from :ref:`sec:F-I` to :ref:`sec:F-C`, equal to
+    ``transform(TCI_batch(t), v)``.
+    
+    Parameters
+    ----------
+    t : array_like
+        Times (s), shape (N,).
+    v : array_like
+        Vectors, shape (N, 3).
+    omega_t : float, optional
+        Earth's rotational rate (rad/s).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to. May be ``v`` itself.
+    
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    sang, cang = _sin_cos(omega_t*np.asarray(t, dtype=float))
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 2, sang[0], cang[0])
+    return out
+
+def TIC_apply(t, v, omega_t = 7.2921235169904e-5, out=None):
+    """Transforms vectors from :ref:`sec:F-C` to :ref:`sec:F-I`. Parameters as
+    in :func:`TCI_apply`."""
+    
+    sang, cang = _sin_cos(omega_t*np.asarray(t, dtype=float))
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 2, -sang[0], cang[0])
+    return out
+
+def Tab_apply(alpha, beta, v, out=None):
+    """Transforms vectors from :ref:`sec:F-b` to :ref:`sec:F-a`, equal to
+    ``transform(Tab_batch(alpha, beta), v)``.
+    
+    Parameters
+    ----------
+    alpha : array_like
+        Aerodynamic angles of attack (radians), shape (N,).
+    beta : array_like
+        Aerodynamic angles of side-slip (radians), shape (N,).
+    v : array_like
+        Vectors, shape (N, 3).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to. May be ``v`` itself.
+        
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    sang, cang = _sin_cos(alpha, beta)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 1, -sang[0], cang[0])
+    _rotate(out, 2, sang[1], cang[1])
+    return out
+
+def Tba_apply(alpha, beta, v, out=None):
+    """Transforms vectors from :ref:`sec:F-a` to :ref:`sec:F-b`. Parameters as
+    in :func:`Tab_apply`."""
+    
+    sang, cang = _sin_cos(alpha, beta)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 2, -sang[1], cang[1])
+    _rotate(out, 1, sang[0], cang[0])
+    return out
+
+def TEC_apply(tau, delta, v, out=None):
+    """Transforms vectors from :ref:`sec:F-C` to the :ref:`sec:F-E`, equal to
+    ``transform(TEC_batch(tau, delta), v)``.
+    
+    Parameters
+    ----------
+    tau : array_like
+        Longitudes (radians), shape (N,).
+    delta : array_like
+        Latitudes (radians), shape (N,).
+    v : array_like
+        Vectors, shape (N, 3).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to. May be ``v`` itself.
+    
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    sang, cang = _sin_cos(tau, delta)
+    out = _vectors_out(v, sang.shape[1], out)
+    # Rotation about the Z-axis by tau, followed by a rotation about the Y-axis by -(delta + pi/2).
+    _rotate(out, 2, sang[0], cang[0])
+    _rotate(out, 1, -cang[1], -sang[1])
+    return out
+
+def TCE_apply(tau, delta, v, out=None):
+    """Transforms vectors from :ref:`sec:F-E` to the :ref:`sec:F-C`. Parameters
+    as in :func:`TEC_apply`."""
+    
+    sang, cang = _sin_cos(tau, delta)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 1, cang[1], -sang[1])
+    _rotate(out, 2, -sang[0], cang[0])
+    return out
+
+def TbE_apply(psi, theta, phi, v, out=None):
+    """Transforms vectors from :ref:`sec:F-E` to the :ref:`sec:F-b`, equal to
+    ``transform(TbE_batch(psi, theta, phi), v)``.
+    
+    Parameters
+    ----------
+    psi : array_like
+        Yaw angles about the Z_E-axis (radians), shape (N,).
+    theta : array_like
+        Pitch angles about the Y_E-axis (radians), shape (N,).
+    phi : array_like
+        Roll angles about the X_E-axis (radians), shape (N,).
+    v : array_like
+        Vectors, shape (N, 3).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to. May be ``v`` itself.
+    
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    sang, cang = _sin_cos(psi, theta, phi)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 2, sang[0], cang[0])
+    _rotate(out, 1, sang[1], cang[1])
+    _rotate(out, 0, sang[2], cang[2])
+    return out
+
+def TEb_apply(psi, theta, phi, v, out=None):
+    """Transforms vectors from the :ref:`sec:F-b` to :ref:`sec:F-E`. Parameters
+    as in :func:`TbE_apply`."""
+    
+    sang, cang = _sin_cos(psi, theta, phi)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 0, -sang[2], cang[2])
+    _rotate(out, 1, -sang[1], cang[1])
+    _rotate(out, 2, -sang[0], cang[0])
+    return out
+
+def TaE_apply(chi, gamma, mu, v, out=None):
+    """Transforms vectors from the :ref:`sec:F-E` to the :ref:`sec:F-a`, equal
+    to ``transform(TaE_batch(chi, gamma, mu), v)``.
+    
+    Parameters
+    ----------
+    chi : array_like
+        Aerodynamic heading angles about the Z_E-axis (radians), shape (N,).
+    gamma : array_like
+        Aerodynamic flight-path angles about the Y_E-axis (radians), shape (N,).
+    mu : array_like
+        Aerodynamic bank angles about the X_a-axis (radians), shape (N,).
+    v : array_like
+        Vectors, shape (N, 3).
+    out : numpy_array, optional
+        Array (N, 3) to write the result to. May be ``v`` itself.
+    
+    Returns
+    -------
+    v : numpy_array
+        Transformed vectors, shape (N, 3).
+    """
+    
+    sang, cang = _sin_cos(chi, gamma, mu)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 2, sang[0], cang[0])
+    _rotate(out, 1, sang[1], cang[1])
+    _rotate(out, 0, -sang[2], cang[2])
+    return out
+
+def TEa_apply(chi, gamma, mu, v, out=None):
+    """Transforms vectors from the :ref:`sec:F-a` to the :ref:`sec:F-E`.
+    Parameters as in :func:`TaE_apply`."""
+    
+    sang, cang = _sin_cos(chi, gamma, mu)
+    out = _vectors_out(v, sang.shape[1], out)
+    _rotate(out, 0, sang[2], cang[2])
+    _rotate(out, 1, -sang[1], cang[1])
+    _rotate(out, 2, -sang[0], cang[0])
+    return out
+
+def _sin_cos(*angles):
+    """Returns the sines and cosines of the broadcast angles, both shape (number of angles, N)."""
+    angles = np.array(np.broadcast_arrays(*angles), dtype=float).reshape(len(angles), -1)
+    return np.sin(angles), np.cos(angles)
+
+def _stack_out(n, out):
+    """Returns the array to write n stacked matrices to."""
+    if out is None:
+        return np.empty((n, 3, 3))
+    if out.shape != (n, 3, 3):
+        raise ValueError("Expected an output array with shape {}, got {}".format((n, 3, 3), out.shape))
+    return out
+
+def _vectors_out(v, n, out):
+    """Copies the vectors into the array the result of n transformations is written to."""
+    v = np.asarray(v, dtype=float)
+    shape = (max(n, v.shape[0]) if v.ndim == 2 else n, 3)
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError("Expected an output array with shape {}, got {}".format(shape, out.shape))
+    if out is not v:
+        out[...] = v
+    return out
+
+# Vector components changed by a rotation about each axis.
+_rotation_planes = {0: (1, 2), 1: (2, 0), 2: (0, 1)}
+
+def _rotate(v, axis, s, c):
+    """Rotates the frame of the vectors v in place about an axis, given the sine and cosine of the angle."""
+    i, j = _rotation_planes[axis]
+    vi = v[:, i].copy()
+    v[:, i] = c*vi + s*v[:, j]
+    v[:, j] = c*v[:, j] - s*vi
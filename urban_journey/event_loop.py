@@ -1,12 +1,23 @@
 """This module contains f"""
 
+import os
 import asyncio
-from threading import Thread, Semaphore
+from threading import Thread, Semaphore, Lock, current_thread
 
 
 loop = None
 thread = None
 
+shards = {}
+"""
+Dictionary holding the ``(loop, thread)`` tuple of each shard. Shards are extra event loops, each running on its own
+thread, used to spread the modules over multiple cores. Shard 0 is the main event loop.
+"""
+
+shard_count = os.cpu_count() or 1  #: Number of shards modules are spread over by :func:`auto_shard`.
+next_auto_shard = 0  #: Shard assigned to the next module by :func:`auto_shard`.
+shard_lock = Lock()  #: Lock protecting the creation of shards.
+
 
 def get(debug_enabled=False) -> asyncio.BaseEventLoop:
     """Returns the event secondary event loop."""
@@ -50,3 +61,76 @@ def event_loop_target(s):
     loop = None
     thread = None
 
+
+
+def get_shard(index=0) -> asyncio.BaseEventLoop:
+    """
+    Returns the event loop of a shard. The shard is started on the first call.
+
+    :param int index: Index of the shard. Shard 0 is the main event loop returned by :func:`get`.
+    """
+    if index == 0:
+        return get()
+    if index < 0:
+        raise ValueError("Shard index must be positive.")
+    if index not in shards:
+        with shard_lock:
+            if index not in shards:
+                s = Semaphore(0)
+                shard_thread = Thread(target=shard_target, args=(index, s), daemon=True,
+                                      name="uj_shard_{}".format(index))
+                shard_thread.start()
+                s.acquire()
+    return shards[index][0]
+
+
+def get_shard_thread(index=0) -> Thread:
+    """
+    Returns the thread running the event loop of a shard. None if the shard is not running.
+
+    :param int index: Index of the shard.
+    """
+    if index == 0:
+        return get_thread()
+    return shards[index][1] if index in shards else None
+
+
+def set_shard_count(count):
+    """
+    Sets the number of shards the modules are spread over by :func:`auto_shard`.
+
+    :param int count: Number of shards.
+    """
+    global shard_count, next_auto_shard
+    if count < 1:
+        raise ValueError("There must be at least one shard.")
+    shard_count = count
+    next_auto_shard = 0
+
+
+def auto_shard():
+    """
+    Returns the index of the shard the next module should run on. Modules are assigned round-robin to the shards.
+
+    :rtype: int
+    """
+    global next_auto_shard
+    with shard_lock:
+        index = next_auto_shard
+        next_auto_shard = (next_auto_shard + 1) % shard_count
+    return index
+
+
+def stop_shards():
+    """Stops the event loops of all shards except the main event loop."""
+    for shard_loop, _ in list(shards.values()):
+        shard_loop.call_soon_threadsafe(shard_loop.stop)
+
+
+def shard_target(index, s):
+    shard_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(shard_loop)
+    shards[index] = (shard_loop, current_thread())
+    s.release()
+    shard_loop.run_forever()
+    del shards[index]
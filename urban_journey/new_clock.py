@@ -1,4 +1,6 @@
+import math
 import asyncio
+from enum import Enum
 from traceback import print_exception
 import sys
 
@@ -6,23 +8,37 @@ from urban_journey.pubsub.trigger import TriggerBase
 from urban_journey.pubsub.descriptor.instance import DescriptorInstance
 from urban_journey.pubsub.descriptor.static import DescriptorStatic
 from urban_journey import event_loop
+from urban_journey.timer_wheel import get_timer_wheel
 
 
 # TODO: Add a clock that can be created dynamically.
 
 
+class OverrunPolicy(Enum):
+    """
+    Enumerator for the policy applied when a clock tick is still running at the deadline of the next tick.
+    """
+    skip = 0  #: The missed ticks are dropped. The clock continues at the next deadline in the future.
+    burst = 1  #: The missed ticks are fired back to back until the clock has caught up with its deadlines.
+    stretch = 2  #: The next tick fires immediately and the following deadlines are shifted by the overrun.
+
+
 class ClockStatic(DescriptorStatic, TriggerBase):
     """
     Class used to statically declare a clock using a descriptor.
+
+    :param OverrunPolicy overrun_policy: Default overrun policy of the clock instances.
     """
-    def __init__(self):
+    def __init__(self, overrun_policy=OverrunPolicy.skip):
         DescriptorStatic.__init__(self, ClockInstance)
         TriggerBase.__init__(self)
+        self.overrun_policy = OverrunPolicy(overrun_policy)  #: Default overrun policy of the clock instances.
 
     def add_obj(self, obj):
         t = self.instances_base_class(obj,
                                       self.attribute_name,
                                       self)
+        t.overrun_policy = self.overrun_policy
         self.instances[id(obj)] = t
         for activity in self._activities:
             t.add_activity(activity)
@@ -47,15 +63,41 @@ class ClockStatic(DescriptorStatic, TriggerBase):
 class ClockInstance(DescriptorInstance, TriggerBase):
     """
     Class used to create clock instances for statically/descriptor defined clocks.
+
+    The ticks are scheduled against absolute deadlines, so the clock doesn't drift by the runtime of the activities or
+    the latency of the event loop. The lateness of each tick and the overruns are recorded, see :func:`stats`.
+
+    Set :attr:`use_timer_wheel` to schedule the ticks in the :class:`urban_journey.timer_wheel.TimerWheel` shared by all
+    clocks on the event loop instead. Clocks with deadlines in the same tick of the wheel are then fired together by a
+    single wakeup, at the cost of rounding each deadline up to the next tick of the wheel. This pays off for many clocks
+    with periods well above the resolution of the wheel. Set :attr:`align_to_period` as well to align the deadlines to
+    multiples of the period, so all clocks with equal or harmonic periods tick together, regardless of when they were
+    started.
     """
 
     def __init__(self, parent_object, attribute_name, static_descriptor):
         TriggerBase.__init__(self)
         DescriptorInstance.__init__(self, parent_object, attribute_name, static_descriptor)
 
-        self.loop = event_loop.get()  #: main event loop.
+        self.loop = getattr(parent_object, "loop", None) or event_loop.get()  #: Event loop of the parent module.
         self.period = 1  #: Clock period.
         self.running = False  #: True if the clock is running.
+        self.overrun_policy = OverrunPolicy.skip  #: Policy applied when a tick runs past the next deadline.
+        self.use_timer_wheel = False
+        """
+        True to schedule the ticks in the shared timer wheel. The deadlines are rounded up to the next tick of the
+        wheel. Clocks with a period shorter than the resolution of the wheel always use their own event loop timer.
+        """
+        self.align_to_period = False
+        """True to align the deadlines of the ticks to multiples of the period. Only used with the timer wheel."""
+        self.__timer = None  #: Timer of the next tick in the timer wheel.
+
+        # Statistics
+        self.ticks = 0  #: Number of ticks fired.
+        self.overruns = 0  #: Number of times a tick ran past the next deadline.
+        self.skipped = 0  #: Number of ticks dropped by the skip overrun policy.
+        self.jitter_max = 0.  #: Largest deviation in seconds between a deadline and the start of its tick.
+        self.jitter_sum = 0.  #: Sum of the deviations in seconds between the deadlines and the start of their ticks.
 
     @property
     def frequency(self):
@@ -83,15 +125,123 @@ class ClockInstance(DescriptorInstance, TriggerBase):
         Stop the clock.
         """
         self.running = False
+        if self.__timer is not None:
+            self.__timer.cancel()
+
+    @property
+    def jitter_mean(self):
+        """Mean deviation in seconds between the deadlines and the start of their ticks."""
+        return self.jitter_sum / self.ticks if self.ticks else 0.
+
+    def stats(self):
+        """
+        Returns a dictionary with the tick, overrun and jitter statistics of this clock.
+
+        :rtype: dict
+        """
+        return {"ticks": self.ticks,
+                "overruns": self.overruns,
+                "skipped": self.skipped,
+                "jitter_mean": self.jitter_mean,
+                "jitter_max": self.jitter_max}
+
+    def reset_stats(self):
+        """Resets the statistics of this clock."""
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter_max = 0.
+        self.jitter_sum = 0.
+
+    async def sleep_until(self, deadline):
+        """
+        Sleeps until the loop time reaches the deadline.
+
+        :param float deadline: Loop time to wake up at.
+        """
+        future = self.loop.create_future()
+        handle = self.loop.call_at(deadline, future.set_result, None)
+        try:
+            await future
+        finally:
+            handle.cancel()
+
+    def record_tick(self, deadline):
+        """
+        Updates the statistics at the start of a tick.
+
+        :param float deadline: Deadline of the tick.
+        """
+        jitter = abs(self.loop.time() - deadline)
+        self.jitter_sum += jitter
+        if jitter > self.jitter_max:
+            self.jitter_max = jitter
+        self.ticks += 1
+
+    def next_deadline(self, deadline):
+        """
+        Returns the deadline of the next tick, applying the overrun policy if the current tick ran past it.
+
+        :param float deadline: Deadline of the tick that just finished.
+        :rtype: float
+        """
+        deadline += self.period
+        now = self.loop.time()
+        if now > deadline:
+            self.overruns += 1
+            if self.overrun_policy is OverrunPolicy.skip:
+                missed = int((now - deadline) // self.period) + 1
+                self.skipped += missed
+                deadline += missed * self.period
+            elif self.overrun_policy is OverrunPolicy.stretch:
+                deadline = now
+            # With the burst policy the deadline is left in the past, so the next ticks fire right away.
+        return deadline
 
     async def timer_callback(self):
         """
         Co-routine that schedules the clock ticks.
 
         """
+        wheel = get_timer_wheel(self.loop)
+        if self.use_timer_wheel and self.period >= wheel.resolution:
+            if self.align_to_period:
+                # The first tick is still at least one period away.
+                deadline = (math.ceil(self.loop.time() / self.period) + 1) * self.period
+            else:
+                deadline = self.loop.time() + self.period
+            self.__timer = wheel.call_at(deadline, self.wheel_callback, deadline)
+            return
+
+        deadline = self.loop.time() + self.period
         while self.running:
-            await asyncio.sleep(self.period)
+            await self.sleep_until(deadline)
+            if not self.running:
+                break
+            self.record_tick(deadline)
             await self.trigger()
+            deadline = self.next_deadline(deadline)
+
+    def wheel_callback(self, deadline):
+        """
+        Called by the timer wheel at the deadline of a tick.
+
+        :param float deadline: Deadline of the tick.
+        """
+        if self.running:
+            asyncio.ensure_future(self.wheel_tick(deadline), loop=self.loop)
+
+    async def wheel_tick(self, deadline):
+        """
+        Runs a tick scheduled by the timer wheel and schedules the next one.
+
+        :param float deadline: Deadline of the tick.
+        """
+        self.record_tick(deadline)
+        await self.trigger()
+        if self.running:
+            deadline = self.next_deadline(deadline)
+            self.__timer = get_timer_wheel(self.loop).call_at(deadline, self.wheel_callback, deadline)
 
     async def trigger(self):
         """
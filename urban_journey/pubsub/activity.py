@@ -1,11 +1,14 @@
 from enum import Enum
-from asyncio import Lock, iscoroutinefunction
+from asyncio import iscoroutinefunction, get_event_loop, CancelledError
+from collections import deque
 import inspect
 from copy import copy
+from functools import partial
 import sys
 from traceback import print_exception
 
 from .trigger import TriggerBase
+from . import executors
 
 
 # Ahhhh. I don't want to document this. Just look at it. Who would even want to go through this code.  -- Aaron
@@ -14,8 +17,51 @@ class ActivityMode(Enum):
     """
     Enumerator for the activity mode.
     """
-    drop = 0
-    schedule = 2
+    drop = 0  #: Triggers arriving while the activity is running are dropped.
+    concurrent = 1  #: Every trigger runs the activity right away, even if it's already running.
+    schedule = 2  #: Triggers arriving while the activity is running wait for it to finish.
+
+
+class ActivityState:
+    """
+    Run state of an activity for a single module instance. Modules can run on different event loops, so the runs of an
+    activity are only serialized per instance.
+    """
+    __slots__ = ("running", "waiters")
+
+    def __init__(self):
+        self.running = False  #: True while the activity is running. Not used in concurrent mode.
+        self.waiters = deque()  #: Futures of the triggers waiting for their turn in schedule mode.
+
+
+def compile_binder(target):
+    """
+    Generates a function calling a module activity with the data coming in from the triggers. The generated function
+    has the signature ``bind(target, instance, sender_parameters)``. Each parameter of the target, except ``self``, is
+    filled in with the data of the sender with the same name or None.
+
+    Returns None if the parameters of the target can't be bound this way.
+
+    :param target: Activity target.
+    """
+    positional = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    parameters = list(inspect.signature(target).parameters.values())
+    if not parameters or parameters[0].name != "self" or parameters[0].kind not in positional:
+        return None
+
+    arguments = ["instance"]
+    for parameter in parameters[1:]:
+        if parameter.kind in positional:
+            arguments.append("get({!r})".format(parameter.name))
+        elif parameter.kind is inspect.Parameter.KEYWORD_ONLY:
+            arguments.append("{0}=get({0!r})".format(parameter.name))
+
+    source = "def bind(target, instance, sender_parameters):\n" \
+             "    get = sender_parameters.get\n" \
+             "    return target({})\n".format(", ".join(arguments))
+    namespace = {}
+    exec(source, namespace)
+    return namespace["bind"]
 
 
 class ActivityBase:
@@ -27,24 +73,57 @@ class ActivityBase:
         pass
 
 
-def activity(trigger: TriggerBase, *args, mode=ActivityMode.schedule, **kwargs):
-    """Activity decorator factory. This function returns a function decorator class."""
+def activity(trigger: TriggerBase, *args, mode=ActivityMode.schedule, executor=None, output=None, **kwargs):
+    """
+    Activity decorator factory. This function returns a function decorator class.
+
+    By default the decorated function must be a coroutine, which runs on the event loop. If ``executor`` is set, the
+    decorated function must be a regular function. Its body runs in a managed thread or process pool while the activity
+    awaits the result on the event loop, so CPU bound activities don't stall the other modules. Ports are only ever
+    accessed from the event loop, use ``output`` to flush the return value of the function.
+
+    Process activities run in a worker process without access to the module instance, so they must be defined at module
+    or class level and can not take ``self``. Their arguments and return value are pickled. On python 3.8 and higher
+    the buffers of numpy arrays are sent out-of-band.
+
+    :param trigger: Trigger of the activity.
+    :param ActivityMode mode: Activity mode. The drop and schedule modes only serialize the runs of the same module
+       instance, the instances of a module class run independently.
+    :param string executor: None to run the activity on the event loop, "thread" or "process" to run it in a pool.
+    :param output: Name of the output port the return value is flushed to. If this is a tuple of names, the function
+       must return a tuple with the data for each port. None values are not flushed.
+    """
     if not isinstance(trigger, TriggerBase) and trigger is not None:
         raise TypeError("trigger must inherit from TriggerBase")
+    if executor is not None and executor not in executors.executor_types:
+        raise ValueError("Unknown executor type '{}'. Use one of {}.".format(
+            executor, ", ".join(executors.executor_types)))
 
     class ActivityDecorator(ActivityBase):
         def __init__(self, target):
-            if not iscoroutinefunction(target):
-                raise TypeError("I find your lack of async disturbing.")
-            self.target = target  #: target coroutine for this activity.
+            if executor is None:
+                if not iscoroutinefunction(target):
+                    raise TypeError("I find your lack of async disturbing.")
+            else:
+                if iscoroutinefunction(target):
+                    raise TypeError("Activities running in an executor must be regular functions.")
+                if executor == "process":
+                    if "<locals>" in target.__qualname__:
+                        raise TypeError("Process activities must be defined at module or class level.")
+                    if "self" in inspect.signature(target).parameters:
+                        raise TypeError("Process activities don't have access to the module instance. "
+                                        "Remove the self parameter.")
+            self.target = target  #: target function for this activity.
+            self.executor = executor  #: Type of executor the activity runs in. None to run it on the event loop.
+            self.output = output  #: Name or tuple of names of the output ports the return value is flushed to.
 
             self.__trigger_obj = None
 
             self.trigger_obj = trigger
 
-            self.mode = mode
+            self.mode = ActivityMode(mode)
 
-            self.lock = Lock()
+            self.unbound_state = ActivityState()  #: Run state of the activity when it's triggered without instance.
 
             # Create empty parameter dictionary
             self.parameters = inspect.signature(target).parameters
@@ -56,6 +135,14 @@ def activity(trigger: TriggerBase, *args, mode=ActivityMode.schedule, **kwargs):
             self._args = args
             self._kwargs = kwargs
 
+            self.bind = None
+            """
+            Precompiled function binding the trigger data to the parameters of the target. None if the activity has to
+            go through the generic binding.
+            """
+            if executor is None and not args and not kwargs:
+                self.bind = compile_binder(target)
+
         @property
         def trigger_obj(self):
             """
@@ -79,22 +166,23 @@ def activity(trigger: TriggerBase, *args, mode=ActivityMode.schedule, **kwargs):
             :param senders: Dictionary with string typed key containing
             """
             try:
-                if self.lock.locked():
-                    if self.mode is ActivityMode.drop:
-                        return
-                with (await self.lock):
-                    # TODO: Remove support for "instance is None". This is currently only meant to be used in unittests.
-
-                    # Create new parameters dictionary and fill it in with the data coming in from the triggers.
-                    params = copy(self.empty_param_dict)
-                    for param in params:
-                        if param in sender_parameters:
-                            params[param] = sender_parameters[param]
-
-                    if instance is None:
-                        await self.target(*args, *self._args, **kwargs, **self._kwargs, **params)
+                serialized = self.mode is not ActivityMode.concurrent
+                if serialized:
+                    state = self.state(instance)
+                    if state.running:
+                        if self.mode is ActivityMode.drop:
+                            return
+                        await self.wait_turn(state)
+                    state.running = True
+
+                try:
+                    if self.bind is not None and instance is not None and not args and not kwargs:
+                        await self.bind(self.target, instance, sender_parameters)
                     else:
-                        await self.target(instance, *args, *self._args, **kwargs, **self._kwargs, **params)
+                        await self.run_generic(sender_parameters, instance, args, kwargs)
+                finally:
+                    if serialized:
+                        self.next_turn(state)
 
             except Exception as e:
                 # On exeption let the exception handler of the root node deal with it.
@@ -104,6 +192,110 @@ def activity(trigger: TriggerBase, *args, mode=ActivityMode.schedule, **kwargs):
                 else:
                     instance.root.handle_exception(sys.exc_info())
 
+        def state(self, instance):
+            """
+            Returns the run state of the activity for a module instance. It's kept in the
+            :attr:`urban_journey.ModuleBase.activity_states` of the instance.
+
+            :rtype: ActivityState
+            """
+            if instance is None:
+                return self.unbound_state
+            state = instance.activity_states.get(self)
+            if state is None:
+                state = instance.activity_states[self] = ActivityState()
+            return state
+
+        async def wait_turn(self, state):
+            """Waits until the runs of the same instance scheduled before this one have finished."""
+            waiter = get_event_loop().create_future()
+            state.waiters.append(waiter)
+            try:
+                await waiter
+            except CancelledError:
+                # Pass the turn on if it was handed to this run right before it got cancelled.
+                if waiter.done() and not waiter.cancelled():
+                    self.next_turn(state)
+                raise
+
+        def next_turn(self, state):
+            """Hands the activity over to the next waiting run of the same instance, if any."""
+            while state.waiters:
+                waiter = state.waiters.popleft()
+                if not waiter.done():
+                    # The activity stays marked as running.
+                    waiter.set_result(None)
+                    return
+            state.running = False
+
+        async def run_generic(self, sender_parameters, instance, args, kwargs):
+            """
+            Runs the target, binding the trigger data and extra arguments to its parameters at run time.
+            """
+            # TODO: Remove support for "instance is None". This is currently only meant to be used in unittests.
+
+            # Create new parameters dictionary and fill it in with the data coming in from the triggers.
+            params = copy(self.empty_param_dict)
+            for param in params:
+                if param in sender_parameters:
+                    params[param] = sender_parameters[param]
+
+            if self.executor is not None:
+                result = await self.run_in_executor(instance, args + self._args,
+                                                    dict(kwargs, **self._kwargs, **params))
+                if self.output is not None and instance is not None:
+                    await self.flush_output(instance, result)
+            elif instance is None:
+                await self.target(*args, *self._args, **kwargs, **self._kwargs, **params)
+            else:
+                await self.target(instance, *args, *self._args, **kwargs, **self._kwargs, **params)
+
+        async def run_in_executor(self, instance, args, kwargs):
+            """
+            Runs the target in the executor and returns the result.
+
+            :param instance: Module instance. It's only passed to thread activities.
+            :param tuple args: Positional arguments of the target.
+            :param dict kwargs: Keyword arguments of the target.
+            """
+            loop = get_event_loop()
+            if self.executor == "thread":
+                if instance is not None:
+                    args = (instance,) + args
+                return await loop.run_in_executor(executors.get_executor("thread"),
+                                                  partial(self.target, *args, **kwargs))
+            else:
+                data, buffers = executors.dumps((args, kwargs))
+                try:
+                    data, result_buffers = await loop.run_in_executor(executors.get_executor("process"),
+                                                                      executors.run_process_target,
+                                                                      self.target.__module__,
+                                                                      self.target.__qualname__,
+                                                                      data,
+                                                                      buffers)
+                finally:
+                    # Remove the shared memory blocks, whether the worker got to open them or not.
+                    executors.release(buffers)
+                try:
+                    return executors.loads(data, result_buffers)
+                finally:
+                    executors.release(result_buffers)
+
+        async def flush_output(self, instance, result):
+            """
+            Flushes the return value of an executor activity to the output ports.
+
+            :param instance: Module instance.
+            :param result: Return value of the target.
+            """
+            if isinstance(self.output, str):
+                if result is not None:
+                    await getattr(instance, self.output).flush(result)
+            else:
+                for name, data in zip(self.output, result):
+                    if data is not None:
+                        await getattr(instance, name).flush(data)
+
         def __call__(self, *args, **kwargs):
             return self.target(*args, **kwargs)
 
@@ -1,8 +1,13 @@
-from asyncio import wait_for, ensure_future
+from asyncio import wait_for, ensure_future, get_event_loop, run_coroutine_threadsafe, wrap_future
+from itertools import count, groupby
+from time import monotonic
+
+import numpy as np
 
 # from urban_journey.debug import print_channel_transmit
 from urban_journey.pubsub.ports.output import OutputPortDescriptorInstance, OutputPort
 from urban_journey.pubsub.ports.input import InputPortDescriptorInstance, InputPort
+from urban_journey.pubsub.channels.envelope import Envelope, LatencyHistogram
 from urban_journey import event_loop
 import logging
 
@@ -14,15 +19,46 @@ class Channel:
     """
     The channel class transmits data between input and output ports.
 
+    Input ports belonging to modules on another event loop shard are handed the data thread-safely on their own loop.
+
+    Remotes can subscribe to a channel through a :class:`urban_journey.pubsub.networking.connection.Connection`. The
+    data flushed on the channel is then also forwarded to them. Nothing is sent over the network as long as no remote
+    is subscribed.
+
     :param string name: Name of the channel.
     :param float timeout: Time out for input channels.
+    :param int batch_size: If not None, the channel runs in batched mode. Messages flushed within the same event loop
+       iteration are gathered and delivered to the input ports as a single batch. If non-zero the batch is delivered as
+       soon as it holds ``batch_size`` messages.
+    :param bool stack: If True, batches are stacked into a single numpy array using :func:`numpy.stack` instead of
+       being delivered as a list.
+    :param bool envelopes: If True, each message is wrapped in an
+       :class:`urban_journey.pubsub.channels.envelope.Envelope` holding its sequence number, publish time and source
+       port. The latency between publishing and delivery to the input ports is recorded in :attr:`latency`.
     """
-    def __init__(self, name, timeout=6):
+    def __init__(self, name, timeout=6, batch_size=None, stack=False, envelopes=False):
         self.name = name  #: Channel name.
         self.output_list = []  #: List of output ports.
         self.input_list = []  #: List of input ports.
         self.timeout = timeout  #: Time-out for input ports.
-        self.loop = event_loop.get()  #: The main event loop.
+        self.loop = event_loop.get()  #: The main event loop. Batches are gathered on this loop.
+        self.remote_subscribers = []  #: Connections to the remotes subscribed to this channel.
+
+        self.batch_size = batch_size  #: Maximum batch size. None if batching is disabled, 0 for no limit.
+        self.stack = stack  #: True if batches are stacked into numpy arrays.
+        self.__batch = []  #: Messages waiting to be delivered as a batch.
+        self.__batch_handle = None  #: Handle to the scheduled batch delivery.
+
+        self.envelopes = False  #: True if the messages are wrapped in envelopes.
+        self.sequence = 0  #: Sequence number of the last message published with envelopes enabled.
+        self.__sequence_counter = count(1)  #: Counter handing out the sequence numbers.
+        self.latency = None
+        """
+        :class:`urban_journey.pubsub.channels.envelope.LatencyHistogram` with the latencies between publishing and
+        delivery to the input ports. None if envelopes are disabled.
+        """
+        if envelopes:
+            self.enable_envelopes()
 
     def add_port(self, port):
         """
@@ -49,15 +85,191 @@ class Channel:
         else:
             raise Exception("Port not subscribed to channel.")
 
-    async def flush(self, data):
+    def add_remote_subscriber(self, connection):
+        """
+        Forward the data flushed on this channel to a remote.
+
+        :param urban_journey.pubsub.networking.connection.Connection connection: Connection to the remote.
+        """
+        if connection not in self.remote_subscribers:
+            self.remote_subscribers.append(connection)
+
+    def remove_remote_subscriber(self, connection):
+        """
+        Stop forwarding data to a remote.
+
+        :param urban_journey.pubsub.networking.connection.Connection connection: Connection to the remote.
         """
-        Flushes the data to all registered input ports.
+        if connection in self.remote_subscribers:
+            self.remote_subscribers.remove(connection)
+
+    def enable_batching(self, batch_size=0, stack=False):
+        """
+        Switch the channel to batched mode.
+
+        :param int batch_size: Maximum number of messages in a batch. 0 to only limit batches to one event loop
+           iteration.
+        :param bool stack: True to deliver the batches as a stacked numpy array.
+        """
+        self.batch_size = batch_size
+        self.stack = stack
+
+    def disable_batching(self):
+        """
+        Switch the channel back to per message delivery. Messages still waiting in the batch are delivered first.
+        """
+        self.flush_batch()
+        self.batch_size = None
+
+    def enable_envelopes(self):
+        """Wrap the messages in envelopes from now on and start recording the latency."""
+        if self.latency is None:
+            self.latency = LatencyHistogram()
+        self.envelopes = True
+
+    def disable_envelopes(self):
+        """Transmit bare messages from now on. The latency histogram is kept."""
+        self.envelopes = False
+
+    @property
+    def batched(self):
+        """True if the channel is running in batched mode."""
+        return self.batch_size is not None
+
+    async def flush(self, data, source=None, origin=None):
+        """
+        Flushes the data to all registered input ports and subscribed remotes.
 
         :param data: The data to be flushed.
+        :param source: Output port publishing the data. Only used with envelopes enabled.
+        :param origin: Connection the data was received from, if it came from a remote. The data is not forwarded back
+           to it.
         """
         # ctlog.debug("Channel.flush({})".format(data))
-        for i, port in enumerate(self.input_list):
-            # We don't want this function to block until all ports
-            # have processed the data or timed-out. So instead we create the futures and
-            # ensure it on the event loop.
-            ensure_future(port.flush(data), loop=self.loop)
+        if self.remote_subscribers:
+            await self.forward(data, origin)
+
+        if self.envelopes:
+            self.sequence = next(self.__sequence_counter)
+            data = Envelope(data, self.sequence, monotonic(), source)
+
+        loop = get_event_loop()
+        if self.batch_size is None:
+            for i, port in enumerate(self.input_list):
+                if port.queue is None:
+                    # We don't want this function to block until all ports
+                    # have processed the data or timed-out. So instead we create the futures and
+                    # ensure it on the event loop.
+                    self.deliver(port, data, loop)
+                elif port.loop is loop:
+                    # Ports with a bounded queue apply their queue policy. This blocks the publisher if the queue is
+                    # full and the policy is set to block.
+                    await port.queue.put(data)
+                else:
+                    # The queue lives on another shard. Wait for it there so that the backpressure still reaches the
+                    # publisher.
+                    await wrap_future(run_coroutine_threadsafe(port.queue.put(data), port.loop), loop=loop)
+        elif loop is self.loop:
+            self.add_to_batch(data)
+        else:
+            # The batch is only ever touched on the loop of the channel.
+            self.loop.call_soon_threadsafe(self.add_to_batch, data)
+
+    async def forward(self, data, origin=None):
+        """
+        Forwards data to all subscribed remotes. Waits until the data has been handed to the connections, so slow
+        connections push back on the publisher.
+
+        :param data: The data to be forwarded.
+        :param origin: Connection the data was received from. The data is not forwarded back to it.
+        """
+        loop = get_event_loop()
+        for connection in list(self.remote_subscribers):
+            if connection is origin:
+                continue
+            if connection.closed:
+                self.remove_remote_subscriber(connection)
+                continue
+            try:
+                if connection.loop is loop:
+                    await connection.channel_data(self.name, data)
+                else:
+                    await wrap_future(run_coroutine_threadsafe(connection.channel_data(self.name, data),
+                                                               connection.loop), loop=loop)
+            except ConnectionError:
+                # The connection closed while the data was being forwarded.
+                self.remove_remote_subscriber(connection)
+
+    @staticmethod
+    def deliver(port, data, loop):
+        """
+        Delivers data to an input port without waiting for it to be processed.
+
+        :param port: Input port.
+        :param data: The data being transmitted.
+        :param loop: Event loop the caller is running on.
+        """
+        if port.loop is loop:
+            if port.queue is None:
+                ensure_future(port.flush(data), loop=loop)
+            else:
+                ensure_future(port.queue.put(data), loop=loop)
+        else:
+            # Hand the data over to the shard running the port.
+            if port.queue is None:
+                run_coroutine_threadsafe(port.flush(data), port.loop)
+            else:
+                run_coroutine_threadsafe(port.queue.put(data), port.loop)
+
+    def add_to_batch(self, data):
+        """
+        Adds data to the batch waiting to be delivered. This must be called on the loop of the channel.
+
+        :param data: The data to be flushed.
+        """
+        self.__batch.append(data)
+        if self.batch_size and len(self.__batch) >= self.batch_size:
+            self.flush_batch()
+        elif self.__batch_handle is None:
+            # Deliver the batch on the next loop iteration. Everything flushed until then ends up in this batch.
+            self.__batch_handle = self.loop.call_soon(self.flush_batch)
+
+    def flush_batch(self):
+        """
+        Delivers the messages gathered in batched mode to all registered input ports. Each input port receives one
+        list, or numpy array if stacking is enabled, with all messages in the batch. If envelopes were enabled or
+        disabled while the batch was gathered, the messages with and without envelopes are delivered as separate
+        batches, in order.
+        """
+        if self.__batch_handle is not None:
+            self.__batch_handle.cancel()
+            self.__batch_handle = None
+
+        if not self.__batch:
+            return
+
+        batch, self.__batch = self.__batch, []
+        for enveloped, messages in groupby(batch, lambda message: isinstance(message, Envelope)):
+            self.deliver_batch(list(messages), enveloped)
+
+    def deliver_batch(self, batch, enveloped):
+        """
+        Delivers a batch to all registered input ports.
+
+        :param list batch: Messages in the batch.
+        :param bool enveloped: True if the messages are wrapped in envelopes.
+        """
+        envelopes = None
+        if enveloped:
+            envelopes = batch
+            batch = [envelope.data for envelope in envelopes]
+        if self.stack:
+            try:
+                batch = np.stack(batch)
+            except ValueError:
+                ctlog.warning("Channel '{}' could not stack batch, delivering it as a list.".format(self.name))
+        if envelopes is not None:
+            batch = Envelope(batch, envelopes[-1].sequence, envelopes[0].timestamp, count=len(envelopes))
+
+        for port in self.input_list:
+            self.deliver(port, batch, self.loop)
@@ -2,7 +2,9 @@
 Creates and destroys channels as needed and keeps a record of all currently living channels.
 """
 from urban_journey.pubsub.channels.channel import Channel
+from urban_journey.pubsub.channels.shared_memory import SharedMemoryChannel
 from urban_journey.pubsub.networking.listener import Listener
+from urban_journey.pubsub.networking.connection_manager import ConnectionManager
 
 
 class ChannelRegister:
@@ -10,18 +12,47 @@ class ChannelRegister:
     The channel register keeps a list of all existing channels and creates
     a channel when necessary.
 
-    It also keeps a list of all remote connections and listeners if existing.
+    It also keeps a list of all remote connections and listeners if existing. The channels are bridged over these
+    connections, so remotes can subscribe to them.
     """
     def __init__(self):
         self.channels = {}  #: Dictionary holding the channels.
-        self.connections = {}
-        self.listeners = {}
+        self.connections = {}  #: Dictionary holding the connections to remotes by name.
+        self.listeners = {}  #: Dictionary holding the listeners by name.
+        self.connection_manager = ConnectionManager(self)
+        """
+        :class:`urban_journey.pubsub.networking.connection_manager.ConnectionManager` holding the connections opened by
+        :func:`connect`.
+        """
 
     def new_listener(self, host, port):
+        """
+        Starts listening for connections from remotes.
+
+        :param string host: Listening host.
+        :param int port: Listening port.
+        :return: The listener.
+        :rtype: urban_journey.pubsub.networking.listener.Listener
+        """
         listener_name = "{}:{}".format(host, port)
         if listener_name not in self.listeners:
-            listener = Listener(host, port, self.connections)
+            listener = Listener(host, port, self.connections, channel_register=self)
             self.listeners[listener_name] = listener
+        return self.listeners[listener_name]
+
+    async def connect(self, host, port, timeout=None):
+        """
+        Co-routine returning the connection to a remote listening on the given host and port. The connection is shared
+        by everyone connecting to the same remote and it's re-opened if it drops. Once the connection is ready, the
+        channels with local input ports are subscribed to on the remote.
+
+        :param string host: Remote host.
+        :param int port: Remote port.
+        :param float timeout: Maximum time in seconds to wait for the connection. None to wait until connected.
+        :return: The connection.
+        :rtype: urban_journey.pubsub.networking.connection.Connection
+        """
+        return await self.connection_manager.get(host, port, timeout)
 
     def get_channel(self, channel_name):
         """
@@ -33,9 +64,29 @@ class ChannelRegister:
             self.create_channel(channel_name)
         return self.channels[channel_name]
 
-    def create_channel(self, channel_name):
+    def create_channel(self, channel_name, **kwargs):
         """
         Creates a new channel
         :param channel_name: The name of the new channel.
+        :param kwargs: Extra keyword arguments passed to :class:`urban_journey.pubsub.channels.channel.Channel`, eg.
+           ``batch_size`` and ``stack`` to create a batched channel or ``envelopes`` to enable envelopes.
+        :return: The new channel.
+        """
+        self.channels[channel_name] = Channel(channel_name, **kwargs)
+        return self.channels[channel_name]
+
+    def create_shared_memory_channel(self, channel_name, n_slots=16, slot_size=1 << 20, **kwargs):
+        """
+        Creates a new channel backed by shared memory. Numpy arrays flushed on this channel are delivered as read-only
+        copies to the processes that created a shared memory channel with the same name. This has to be called before
+        any port subscribes to the channel.
+
+        :param channel_name: The name of the new channel.
+        :param int n_slots: Number of arrays the shared memory ring can hold.
+        :param int slot_size: Maximum size in bytes of the arrays.
+        :param kwargs: Extra keyword arguments passed to
+           :class:`urban_journey.pubsub.channels.shared_memory.SharedMemoryChannel`.
         """
-        self.channels[channel_name] = Channel(channel_name)
+        if channel_name in self.channels:
+            raise ValueError("Channel '{}' already exists.".format(channel_name))
+        self.channels[channel_name] = SharedMemoryChannel(channel_name, n_slots, slot_size, **kwargs)
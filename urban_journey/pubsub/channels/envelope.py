@@ -0,0 +1,114 @@
+"""
+Envelopes wrapped around the data transmitted by channels with envelopes enabled, and the latency histograms
+measured with them.
+"""
+from bisect import bisect_right
+from time import monotonic
+
+
+class Envelope:
+    """
+    Wraps a message transmitted through a channel with envelopes enabled.
+
+    :param data: The data being transmitted.
+    :param int sequence: Sequence number of the message in the channel. For a batch, the sequence number of the last
+       message in the batch.
+    :param float timestamp: Time at which the message was published, as returned by :func:`time.monotonic`. For a batch,
+       the publish time of the first message in the batch.
+    :param source: Output port that published the message. None if unknown.
+    :param int count: Number of messages in the envelope. Larger than one for batches.
+    """
+    __slots__ = ("data", "sequence", "timestamp", "source", "count")
+
+    def __init__(self, data, sequence, timestamp, source=None, count=1):
+        self.data = data  #: The data being transmitted.
+        self.sequence = sequence  #: Sequence number of the message in the channel.
+        self.timestamp = timestamp  #: Time at which the message was published.
+        self.source = source  #: Output port that published the message.
+        self.count = count  #: Number of messages in the envelope.
+
+    @property
+    def age(self):
+        """Time in seconds since the message was published."""
+        return monotonic() - self.timestamp
+
+    def __repr__(self):
+        return "Envelope(sequence={}, timestamp={}, source={}, data={!r})".format(
+            self.sequence, self.timestamp, getattr(self.source, "attribute_name", self.source), self.data)
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with logarithmically spaced bins.
+
+    :param float min_latency: Upper edge in seconds of the first bin.
+    :param float max_latency: Lower edge in seconds of the last bin.
+    :param int bins_per_decade: Number of bins per factor 10.
+    """
+    def __init__(self, min_latency=1e-6, max_latency=10., bins_per_decade=10):
+        edges = [min_latency]
+        factor = 10 ** (1 / bins_per_decade)
+        while edges[-1] < max_latency:
+            edges.append(edges[-1] * factor)
+        self.edges = edges  #: Edges between the bins in seconds.
+        self.counts = [0] * (len(edges) + 1)  #: Number of latencies in each bin.
+
+        self.count = 0  #: Number of latencies recorded.
+        self.total = 0.  #: Sum of all latencies recorded.
+        self.max = 0.  #: Largest latency recorded.
+
+    def record(self, latency):
+        """
+        Adds a latency to the histogram.
+
+        :param float latency: Latency in seconds.
+        """
+        self.counts[bisect_right(self.edges, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    @property
+    def mean(self):
+        """Mean latency in seconds."""
+        return self.total / self.count if self.count else 0.
+
+    def percentile(self, q):
+        """
+        Returns the upper edge of the bin holding the given percentile. This overestimates the latency by at most one
+        bin width.
+
+        :param float q: Percentile between 0 and 100.
+        :rtype: float
+        """
+        if not self.count:
+            return 0.
+        threshold = self.count * q / 100
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold and cumulative:
+                return self.edges[i] if i < len(self.edges) else self.max
+        return self.max
+
+    def summary(self):
+        """
+        Returns a dictionary with the number of latencies recorded and the mean, max, 50th, 90th and 99th percentile
+        latency.
+
+        :rtype: dict
+        """
+        return {"count": self.count,
+                "mean": self.mean,
+                "max": self.max,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99)}
+
+    def reset(self):
+        """Clears the histogram."""
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
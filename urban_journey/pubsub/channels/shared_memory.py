@@ -0,0 +1,292 @@
+"""
+Shared memory backed channels used to transmit numpy arrays between processes without copying them through a socket.
+"""
+import os
+import hashlib
+import asyncio
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Shared memory is only available on python 3.8 and higher.
+    shared_memory = None
+
+try:
+    import fcntl
+except ImportError:
+    # Writers in different processes can't be serialized on platforms without fcntl.
+    fcntl = None
+
+from urban_journey.pubsub.channels.channel import Channel
+import logging
+
+
+ctlog = logging.getLogger('channels_transmission')
+
+max_ndim = 8  #: Maximum number of dimensions of the arrays transmitted through a shared memory ring.
+alignment = 64  #: Alignment in bytes of the data slots.
+
+ring_header_dtype = np.dtype([("write_count", "<u8"),
+                              ("n_slots", "<u8"),
+                              ("slot_size", "<u8"),
+                              ("initialized", "<u8")])
+
+slot_header_dtype = np.dtype([("sequence", "<u8"),
+                              ("pid", "<i8"),
+                              ("nbytes", "<u8"),
+                              ("ndim", "<u8"),
+                              ("dtype", "S16"),
+                              ("shape", "<u8", (max_ndim,))])
+
+
+def shared_memory_name(channel_name):
+    """
+    Returns the name of the shared memory block used by a channel. The name is hashed since the maximum length of
+    shared memory names is very limited on some platforms.
+
+    :param string channel_name: Name of the channel.
+    :rtype: string
+    """
+    return "uj_" + hashlib.sha1(channel_name.encode()).hexdigest()[:20]
+
+
+class SharedMemoryRing:
+    """
+    Ring of preallocated slots in a shared memory block. Processes write numpy arrays into the slots, other processes
+    read copies of them.
+
+    Writers are serialized by a lock file next to the block (on platforms with :mod:`fcntl`, otherwise only the writers
+    in a single process are serialized). Readers use the slot sequence numbers as a seqlock: a slot is copied and then
+    checked again, so arrays overwritten while they were being read are detected and dropped instead of delivered torn.
+
+    :param string name: Name of the shared memory block.
+    :param int n_slots: Number of slots in the ring.
+    :param int slot_size: Size in bytes of each slot.
+    :param bool create: True to create the block, False to attach to an existing one. If None, the block is created if
+       it doesn't exist yet.
+    """
+    def __init__(self, name, n_slots=16, slot_size=1 << 20, create=None):
+        if shared_memory is None:
+            raise RuntimeError("Shared memory channels require python 3.8 or higher.")
+
+        self.name = name  #: Name of the shared memory block.
+        slot_size = -(-slot_size // alignment) * alignment
+        size = self.get_data_offset(n_slots) + n_slots * slot_size
+
+        self.created = False  #: True if this instance created the shared memory block.
+        if create is None:
+            try:
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+                self.created = True
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(name)
+        else:
+            self.shm = shared_memory.SharedMemory(name, create=create, size=size if create else 0)
+            self.created = create
+
+        self.header = np.ndarray((), ring_header_dtype, buffer=self.shm.buf)
+        if self.created:
+            self.header["n_slots"] = n_slots
+            self.header["slot_size"] = slot_size
+            self.header["write_count"] = 0
+            self.header["initialized"] = 1
+        self.n_slots = int(self.header["n_slots"])  #: Number of slots in the ring.
+        self.slot_size = int(self.header["slot_size"])  #: Size in bytes of each slot.
+        self.data_offset = self.get_data_offset(self.n_slots)  #: Offset of the first data slot.
+
+        self.slot_headers = np.ndarray((self.n_slots,), slot_header_dtype, buffer=self.shm.buf,
+                                       offset=ring_header_dtype.itemsize)
+        self.slots = np.ndarray((self.n_slots, self.slot_size), np.uint8, buffer=self.shm.buf,
+                                offset=self.data_offset)
+
+        self.write_lock = threading.Lock()  #: Lock serializing the writers in this process.
+        self.lock_path = os.path.join(tempfile.gettempdir(), name + ".lock")  #: Path of the lock file.
+        self.lock_file = None  #: File locked to serialize the writers in different processes.
+        if fcntl is not None:
+            self.lock_file = open(self.lock_path, "a")
+
+    @staticmethod
+    def get_data_offset(n_slots):
+        """
+        Returns the offset of the first data slot in the shared memory block.
+
+        :param int n_slots: Number of slots in the ring.
+        :rtype: int
+        """
+        headers_size = ring_header_dtype.itemsize + n_slots * slot_header_dtype.itemsize
+        return -(-headers_size // alignment) * alignment
+
+    @property
+    def write_count(self):
+        """Total number of arrays written into the ring. This is also the sequence number of the newest array."""
+        return int(self.header["write_count"])
+
+    def write(self, array):
+        """
+        Copies an array into the next slot of the ring.
+
+        :param numpy.ndarray array: Array to write.
+        :return: Sequence number of the array.
+        :rtype: int
+        """
+        array = np.ascontiguousarray(array)
+        if array.nbytes > self.slot_size:
+            raise ValueError("Array of {} bytes does not fit in the {} byte slots of shared memory ring '{}'.".format(
+                array.nbytes, self.slot_size, self.name))
+        if array.ndim > max_ndim:
+            raise ValueError("Arrays sent through shared memory can have at most {} dimensions.".format(max_ndim))
+        if array.dtype.hasobject:
+            raise TypeError("Arrays containing python objects cannot be sent through shared memory.")
+
+        with self.write_lock:
+            if self.lock_file is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                sequence = self.write_count + 1
+                header = self.slot_headers[(sequence - 1) % self.n_slots]
+
+                # Invalidate the slot while it's being written to.
+                header["sequence"] = 0
+                self.slots[(sequence - 1) % self.n_slots, :array.nbytes] = array.reshape(-1).view(np.uint8)
+                header["pid"] = os.getpid()
+                header["nbytes"] = array.nbytes
+                header["ndim"] = array.ndim
+                header["dtype"] = array.dtype.str.encode()
+                header["shape"][:array.ndim] = array.shape
+                header["sequence"] = sequence
+
+                self.header["write_count"] = sequence
+            finally:
+                if self.lock_file is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        return sequence
+
+    def read(self, sequence):
+        """
+        Returns a read-only copy of the array with the given sequence number.
+
+        :param int sequence: Sequence number of the array.
+        :return: ``(array, pid)`` with the pid of the process that wrote the array. None if the slot has already been
+           overwritten, or was overwritten while it was being copied.
+        """
+        slot = (sequence - 1) % self.n_slots
+        header = self.slot_headers[slot]
+        if header["sequence"] != sequence:
+            return None
+
+        try:
+            ndim = int(header["ndim"])
+            array = np.ndarray(tuple(int(n) for n in header["shape"][:ndim]),
+                               np.dtype(header["dtype"].decode()),
+                               buffer=self.shm.buf,
+                               offset=self.data_offset + slot * self.slot_size).copy()
+            pid = int(header["pid"])
+        except (ValueError, TypeError):
+            # The header was being rewritten while it was read.
+            return None
+
+        # The slot was reused by a writer while it was being copied.
+        if header["sequence"] != sequence:
+            return None
+        array.flags.writeable = False
+        return array, pid
+
+    def close(self):
+        """
+        Detaches from the shared memory block. The block and its lock file are removed if they were created by this
+        instance.
+        """
+        # Release the views on the buffer before closing it.
+        del self.header, self.slot_headers, self.slots
+        self.shm.close()
+        if self.created:
+            self.shm.unlink()
+        if self.lock_file is not None:
+            self.lock_file.close()
+            if self.created:
+                try:
+                    os.remove(self.lock_path)
+                except FileNotFoundError:
+                    pass
+
+
+class SharedMemoryChannel(Channel):
+    """
+    Bases: :class:`urban_journey.pubsub.channels.channel.Channel`
+
+    Channel backed by a :class:`SharedMemoryRing`. The data flushed by output ports in this process is written into the
+    ring and delivered to the local input ports. Arrays written by other processes are read from the ring and delivered
+    to the local input ports as read-only copies.
+
+    Only numpy arrays can be transmitted through a shared memory channel.
+
+    :param string name: Name of the channel.
+    :param int n_slots: Number of slots in the ring.
+    :param int slot_size: Size in bytes of each slot. This is the maximum size of the transmitted arrays.
+    :param float poll_interval: Interval in seconds at which the ring is checked for new arrays.
+    :param string shm_name: Name of the shared memory block. By default it's derived from the channel name.
+    :param float timeout: Time out for input channels.
+    """
+    def __init__(self, name, n_slots=16, slot_size=1 << 20, poll_interval=0.001, shm_name=None, timeout=6, **kwargs):
+        super().__init__(name, timeout, **kwargs)
+        self.ring = SharedMemoryRing(shm_name or shared_memory_name(name), n_slots, slot_size)
+        """:class:`SharedMemoryRing` holding the transmitted arrays."""
+
+        self.poll_interval = poll_interval  #: Interval in seconds at which the ring is checked for new arrays.
+        self.read_count = self.ring.write_count  #: Sequence number of the last array read from the ring.
+        self.missed = 0  #: Number of arrays overwritten before they could be read.
+        self.running = False  #: True if the reader co-routine is running.
+
+    def add_port(self, port):
+        super().add_port(port)
+        # Only start reading the ring once there is someone to deliver the data to.
+        if self.input_list and not self.running:
+            self.running = True
+            asyncio.run_coroutine_threadsafe(self.reader(), self.loop)
+
+    async def flush(self, data, source=None, origin=None):
+        """
+        Writes the data into the shared memory ring and flushes it to all local input ports and subscribed remotes.
+
+        :param numpy.ndarray data: The data to be flushed.
+        :param source: Output port publishing the data.
+        :param origin: Connection the data was received from, if it came from a remote.
+        """
+        self.ring.write(data)
+        await super().flush(data, source, origin)
+
+    async def reader(self):
+        """
+        Co-routine polling the ring for arrays written by other processes and delivering them to the local input ports.
+        """
+        pid = os.getpid()
+        while self.running:
+            write_count = self.ring.write_count
+            if write_count == self.read_count:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            # Skip the arrays that have already been overwritten.
+            if write_count - self.read_count > self.ring.n_slots:
+                self.missed += write_count - self.read_count - self.ring.n_slots
+                self.read_count = write_count - self.ring.n_slots
+
+            for sequence in range(self.read_count + 1, write_count + 1):
+                self.read_count = sequence
+                result = self.ring.read(sequence)
+                if result is None:
+                    self.missed += 1
+                    continue
+                array, writer_pid = result
+                # Arrays written by this process have already been delivered by flush.
+                if writer_pid != pid:
+                    await Channel.flush(self, array)
+
+    def close(self):
+        """Stops reading the ring and detaches from the shared memory block."""
+        self.running = False
+        self.ring.close()
@@ -0,0 +1,172 @@
+"""
+Managed thread and process pools used to run the body of CPU bound activities outside of the event loop.
+"""
+import pickle
+import importlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    # Shared memory is only available on python 3.8 and higher.
+    shared_memory = None
+
+
+executor_types = {"thread": ThreadPoolExecutor,
+                  "process": ProcessPoolExecutor}
+"""Executor classes for each executor type."""
+
+max_workers = {"thread": None,
+               "process": None}
+"""Maximum number of workers of each executor type. None to use the concurrent.futures default."""
+
+executors = {}  #: Dictionary holding the executors created so far.
+
+shared_memory_threshold = 1 << 16
+"""Out-of-band buffers of at least this many bytes are passed to the other process through shared memory."""
+
+
+def get_executor(executor_type):
+    """
+    Returns the managed executor of the given type. It's created on the first call.
+
+    :param string executor_type: Either "thread" or "process".
+    :rtype: concurrent.futures.Executor
+    """
+    if executor_type not in executor_types:
+        raise ValueError("Unknown executor type '{}'. Use one of {}.".format(
+            executor_type, ", ".join(executor_types)))
+    if executor_type not in executors:
+        if executor_type == "process" and shared_memory is not None:
+            # Start the resource tracker before the workers, so they share it. The shared memory blocks are then
+            # tracked by the same tracker, whichever process creates or removes them.
+            resource_tracker.ensure_running()
+        executors[executor_type] = executor_types[executor_type](max_workers[executor_type])
+    return executors[executor_type]
+
+
+def shutdown_executors(wait=True):
+    """
+    Shuts down all managed executors. New executors are created if an executor activity is triggered afterwards.
+
+    :param bool wait: True to block until all pending calls have finished.
+    """
+    for executor_type in list(executors):
+        executors.pop(executor_type).shutdown(wait)
+
+
+class SharedBuffer:
+    """
+    Out-of-band buffer passed to an other process through a shared memory block. The process creating the block owns
+    it and removes it with :func:`release` once the other process is done with it. Until then the block stays
+    registered with the resource tracker, so it's cleaned up at exit even if nobody ever opens it.
+
+    :param pickle.PickleBuffer buffer: Buffer to copy into the block.
+    """
+    def __init__(self, buffer):
+        raw = buffer.raw()
+        self.nbytes = raw.nbytes  #: Size of the buffer in bytes.
+        shm = shared_memory.SharedMemory(create=True, size=max(self.nbytes, 1))
+        with shm.buf[:self.nbytes] as view:
+            view[:] = raw
+        self.name = shm.name  #: Name of the shared memory block.
+        shm.close()
+
+    def open(self):
+        """
+        Copies the buffer out of the shared memory block.
+
+        :rtype: bytearray
+        """
+        shm = shared_memory.SharedMemory(self.name)
+        try:
+            with shm.buf[:self.nbytes] as view:
+                return bytearray(view)
+        finally:
+            shm.close()
+
+    def release(self):
+        """Removes the shared memory block. Does nothing if it's already removed."""
+        try:
+            shm = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def release(buffers):
+    """
+    Removes the shared memory blocks of out-of-band buffers returned by :func:`dumps`.
+
+    :param list buffers: Out-of-band buffers.
+    """
+    for buffer in buffers:
+        if isinstance(buffer, SharedBuffer):
+            buffer.release()
+
+
+def dumps(obj):
+    """
+    Serializes an object to be sent to a worker process. On python 3.8 and higher pickle protocol 5 is used and the
+    buffers of numpy arrays are kept out-of-band. Buffers of at least :data:`shared_memory_threshold` bytes are copied
+    once into a :class:`SharedBuffer`, so only the name of the shared memory block is pickled into the pipe of the
+    process pool. Smaller buffers are copied into bytearrays, which are pickled along with the pickle stream. Pass the
+    buffers to :func:`release` once the other process has loaded them.
+
+    :param obj: Object to serialize.
+    :return: ``(data, buffers)`` tuple to be passed to :func:`loads`.
+    """
+    if pickle.HIGHEST_PROTOCOL >= 5:
+        buffers = []
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        # Buffers are passed as bytearrays so the arrays rebuilt on top of them are writable.
+        share = shared_memory is not None
+        return data, [SharedBuffer(buffer) if share and buffer.raw().nbytes >= shared_memory_threshold
+                      else bytearray(buffer.raw()) for buffer in buffers]
+    else:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), []
+
+
+def loads(data, buffers):
+    """
+    Deserializes an object serialized with :func:`dumps`. The shared memory blocks of the buffers are copied into
+    bytearrays and the arrays are rebuilt on top of them. The blocks are left to be removed by :func:`release`.
+
+    :param bytes data: Pickle stream.
+    :param list buffers: Out-of-band buffers.
+    """
+    if buffers:
+        return pickle.loads(data, buffers=[buffer.open() if isinstance(buffer, SharedBuffer) else buffer
+                                           for buffer in buffers])
+    else:
+        return pickle.loads(data)
+
+
+def resolve_target(module_name, qualname):
+    """
+    Finds the target function of an activity by module and qualified name.
+
+    :param string module_name: Name of the module where the activity is defined.
+    :param string qualname: Qualified name of the activity.
+    """
+    obj = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    # The name points to the activity decorator object. Unwrap it.
+    return getattr(obj, "target", obj)
+
+
+def run_process_target(module_name, qualname, data, buffers):
+    """
+    Runs the target of an activity in a worker process. The shared memory blocks of the arguments are removed by the
+    calling process, those of the return value have to be removed by the calling process as well.
+
+    :param string module_name: Name of the module where the activity is defined.
+    :param string qualname: Qualified name of the activity.
+    :param bytes data: Serialized ``(args, kwargs)`` tuple.
+    :param list buffers: Out-of-band buffers of the serialized arguments.
+    :return: Serialized return value of the target.
+    """
+    args, kwargs = loads(data, buffers)
+    return dumps(resolve_target(module_name, qualname)(*args, **kwargs))
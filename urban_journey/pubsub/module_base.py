@@ -1,5 +1,6 @@
 import inspect
 
+from urban_journey import event_loop
 from urban_journey.pubsub.trigger import TriggerBase
 from urban_journey.common.cached import cached_class
 from urban_journey.pubsub.activity import ActivityBase
@@ -8,24 +9,45 @@ from urban_journey.pubsub.descriptor.static import DescriptorStatic
 
 
 class ModuleBase:
-    def __init__(self, channel_register=None):
+    """
+    Base class for all modules.
+
+    :param urban_journey.ChannelRegister channel_register: Channel register in which the ports look for channels.
+    :param int shard: Index of the event loop shard the activities of this module run on. See
+       :func:`urban_journey.event_loop.get_shard`.
+    """
+    def __init__(self, channel_register=None, shard=0):
         self.channel_register = channel_register
         """
         Variable holding an :class:`urban_journey.ChannelRegister` object. The ports will look in this channel register
         for channels when subscribing
         """
+        self.shard = shard  #: Index of the event loop shard this module runs on.
+        self.loop = event_loop.get_shard(shard)  #: Event loop on which the ports and clocks of this module run.
+        self.activity_states = {}
+        """
+        Dictionary holding the :class:`urban_journey.pubsub.activity.ActivityState` of the activities of this module, by
+        activity.
+        """
         self.__initialize_descriptors()
         self.channel_names = {}
         """
         Dictionary containing alternative channel names for the ports to subscribe to. It can be used to
         programmatically change the channel name before calling :func:`subscribe`
         """
+        self.queue_settings = {}
+        """
+        Dictionary containing ``(queue_size, queue_policy)`` tuples for the input ports that should get a bounded
+        queue. The queues are created when calling :func:`subscribe`.
+        """
 
     def subscribe(self):
         """Subscribes all ports to the channels."""
         for port_name in self.ports:
-            getattr(self, port_name).subscribe(
-                self.channel_names[port_name] if port_name in self.channel_names else None)
+            port = getattr(self, port_name)
+            if port_name in self.queue_settings:
+                port.set_queue(*self.queue_settings[port_name])
+            port.subscribe(self.channel_names[port_name] if port_name in self.channel_names else None)
 
     def unsubscribe(self):
         """Unsubscribes all ports."""
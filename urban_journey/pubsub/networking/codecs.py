@@ -0,0 +1,294 @@
+"""
+Wire codecs used to serialize the packages transmitted through a connection.
+
+Every package is prefixed by a 4 byte unsigned big endian header. The lowest 28 bits hold the length of the payload,
+bits 28 to 30 the id of the codec used to encode it. Bit 31 flags compressed payloads, see
+:mod:`urban_journey.pubsub.networking.compression`. Codec 0 is umsgpack, which produces the same frames as before codecs
+were introduced, so it's always understood by the remote. It's also the only codec allowed during the handshake. The
+other codecs are negotiated in the identify exchange.
+"""
+import pickle
+import struct
+
+import umsgpack
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+length_bits = 28  #: Number of bits in the frame header holding the length of the payload.
+max_frame_length = (1 << length_bits) - 1  #: Maximum length of a payload.
+codec_id_bits = 3  #: Number of bits in the frame header holding the codec id.
+compressed_flag = 1 << 31  #: Bit in the frame header flagging compressed payloads.
+
+header_struct = struct.Struct(">I")  #: Struct of the frame header in front of each package.
+table_length_struct = struct.Struct(">I")  #: Struct of the length of the tables in front of the payload of some codecs.
+array_alignment = 8  #: Alignment in bytes of the arrays in the payload of the ndarray codec.
+
+
+def pack_header(length, codec_id=0, compressed=False):
+    """
+    Returns the frame header of a package.
+
+    :param int length: Length of the payload.
+    :param int codec_id: Id of the codec used to encode the payload.
+    :param bool compressed: True if the payload is compressed.
+    :rtype: bytes
+    """
+    if length > max_frame_length:
+        raise ValueError("Packages can be at most {} bytes long. This one is {} bytes.".format(
+            max_frame_length, length))
+    return header_struct.pack(length | (codec_id << length_bits) | (compressed_flag if compressed else 0))
+
+
+def unpack_header(header):
+    """
+    Unpacks a frame header.
+
+    :param header: The 4 header bytes.
+    :return: ``(length, codec_id, compressed)`` tuple.
+    """
+    value, = header_struct.unpack_from(header)
+    return (value & max_frame_length,
+            (value >> length_bits) & ((1 << codec_id_bits) - 1),
+            bool(value & compressed_flag))
+
+
+class Codec:
+    """
+    Base class of the wire codecs.
+
+    :param int codec_id: Id of the codec written into the frame headers. Between 0 and 7.
+    :param string name: Name of the codec used during negotiation.
+    """
+    available = True  #: False if the codec can't be used because a dependency is missing.
+    supports_arrays = False  #: True if the codec transmits numpy arrays without serializing them element by element.
+
+    def __init__(self, codec_id, name):
+        if not 0 <= codec_id < (1 << codec_id_bits):
+            raise ValueError("Codec ids must be between 0 and {}.".format((1 << codec_id_bits) - 1))
+        self.codec_id = codec_id  #: Id of the codec written into the frame headers.
+        self.name = name  #: Name of the codec used during negotiation.
+        self.enabled = True  #: False to neither send nor accept packages encoded with this codec.
+
+    def encode(self, command_id, args):
+        """
+        Encodes a package.
+
+        :param int command_id: Network command id.
+        :param args: Command arguments.
+        :return: List of bytes like objects forming the payload. They can be written as-is with
+           :func:`asyncio.StreamWriter.writelines`.
+        """
+        raise NotImplementedError()
+
+    def decode(self, payload):
+        """
+        Decodes a package.
+
+        :param payload: Bytes like object holding the payload.
+        :return: ``[command_id, args]`` list.
+        """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "{}({}, '{}')".format(self.__class__.__name__, self.codec_id, self.name)
+
+
+class UmsgpackCodec(Codec):
+    """Pure python msgpack codec. Always available and the codec used during the handshake."""
+
+    def encode(self, command_id, args):
+        return [umsgpack.packb((command_id, args))]
+
+    def decode(self, payload):
+        # umsgpack only accepts bytes and bytearrays.
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        return umsgpack.unpackb(payload)
+
+
+class MsgpackCodec(Codec):
+    """msgpack codec using the C extension of the msgpack package."""
+    available = msgpack is not None
+
+    def encode(self, command_id, args):
+        return [msgpack.packb((command_id, args), use_bin_type=True)]
+
+    def decode(self, payload):
+        return msgpack.unpackb(payload, raw=False)
+
+
+class PickleCodec(Codec):
+    """
+    Pickle protocol 5 codec. The buffers of numpy arrays are kept out-of-band and written after the pickle stream
+    without being copied into it. Only available on python 3.8 and higher.
+
+    Unpickling data can execute arbitrary code, so this codec is disabled by default. Only enable it with
+    :func:`enable_codec` if the remotes can be trusted.
+
+    Payload layout: ``[table length][table][pickle stream][buffer 0][buffer 1]...``, where the table is a msgpacked
+    list with the length of the pickle stream followed by the lengths of the buffers.
+    """
+    available = pickle.HIGHEST_PROTOCOL >= 5
+    supports_arrays = True
+
+    def __init__(self, codec_id, name):
+        super().__init__(codec_id, name)
+        self.enabled = False
+
+    def encode(self, command_id, args):
+        buffers = []
+        data = pickle.dumps((command_id, args), protocol=5, buffer_callback=buffers.append)
+        buffers = [buffer.raw() for buffer in buffers]
+        table = umsgpack.packb([len(data)] + [buffer.nbytes for buffer in buffers])
+        return [table_length_struct.pack(len(table)), table, data] + buffers
+
+    def decode(self, payload):
+        payload = memoryview(payload)
+        offset = table_length_struct.size + table_length_struct.unpack_from(payload)[0]
+        lengths = umsgpack.unpackb(payload[table_length_struct.size:offset].tobytes())
+        views = []
+        for length in lengths:
+            views.append(payload[offset:offset + length])
+            offset += length
+        data = pickle.loads(views[0], buffers=views[1:])
+        return [data[0], list(data[1])]
+
+
+class NdarrayCodec(Codec):
+    """
+    Codec transmitting the numpy arrays in the command arguments as raw contiguous bytes. The other arguments are
+    packed with umsgpack. The decoded arrays are read-only views on the received payload.
+
+    Payload layout: ``[table length][table][padding][array 0][padding][array 1]...``, where the table is the msgpacked
+    ``[command_id, args, arrays]`` list. The arrays are replaced by None in ``args`` and ``arrays`` holds the
+    ``[argument index, dtype, shape, offset]`` of each array.
+    """
+    supports_arrays = True
+
+    @staticmethod
+    def is_supported(arg):
+        """Returns True if the argument is an array that can be transmitted by this codec."""
+        return isinstance(arg, np.ndarray) and not arg.dtype.hasobject and arg.dtype.fields is None
+
+    @staticmethod
+    def table_padding(table_length):
+        """Returns the number of padding bytes after the table. The padding keeps the arrays aligned."""
+        return -(table_length_struct.size + table_length) % array_alignment
+
+    def encode(self, command_id, args):
+        args = list(args)
+        arrays = []
+        buffers = []
+        offset = 0
+        for i, arg in enumerate(args):
+            if self.is_supported(arg):
+                # ascontiguousarray turns 0-d arrays into 1-d arrays, so the shape is taken from the argument.
+                array = np.ascontiguousarray(arg)
+                padding = -offset % array_alignment
+                if padding:
+                    buffers.append(bytes(padding))
+                arrays.append([i, array.dtype.str, list(arg.shape), offset + padding])
+                buffers.append(memoryview(array.reshape(-1).view(np.uint8)))
+                offset += padding + array.nbytes
+                args[i] = None
+
+        table = umsgpack.packb([command_id, args, arrays])
+        return [table_length_struct.pack(len(table)), table, bytes(self.table_padding(len(table)))] + buffers
+
+    def decode(self, payload):
+        payload = memoryview(payload)
+        table_length, = table_length_struct.unpack_from(payload)
+        end = table_length_struct.size + table_length
+        command_id, args, arrays = umsgpack.unpackb(payload[table_length_struct.size:end].tobytes())
+        start = end + self.table_padding(table_length)
+        for i, dtype, shape, offset in arrays:
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape, dtype=np.int64))
+            array = np.frombuffer(payload, dtype, count, start + offset).reshape(shape)
+            args[i] = array
+        return [command_id, args]
+
+
+codecs = {}  #: Dictionary holding the registered codecs by id.
+codecs_by_name = {}  #: Dictionary holding the registered codecs by name.
+
+preferred_codecs = ["pickle", "msgpack", "umsgpack"]
+"""
+Names of the codecs in order of preference. The first one supported by both sides is used for all packages, except for
+packages holding numpy arrays, which use the ndarray codec if the remote supports it and no codec supporting arrays
+was negotiated.
+"""
+
+
+def register_codec(codec):
+    """
+    Registers a codec.
+
+    :param Codec codec: Codec to register.
+    """
+    if codec.codec_id in codecs and codecs[codec.codec_id].name != codec.name:
+        raise ValueError("Codec ids must be unique. '{}' and '{}' have the same id '{}'.".format(
+            codec.name, codecs[codec.codec_id].name, codec.codec_id))
+    codecs[codec.codec_id] = codec
+    codecs_by_name[codec.name] = codec
+
+
+def get_codec(codec_id):
+    """
+    Returns the codec with the given id, if it's usable.
+
+    :param int codec_id: Codec id.
+    :return: The codec. None if it's unknown, unavailable or disabled.
+    :rtype: Codec
+    """
+    codec = codecs.get(codec_id)
+    if codec is None or not (codec.available and codec.enabled):
+        return None
+    return codec
+
+
+def enable_codec(name, enabled=True):
+    """
+    Enables or disables a codec.
+
+    :param string name: Name of the codec.
+    :param bool enabled: False to disable the codec.
+    """
+    if name == "umsgpack" and not enabled:
+        raise ValueError("The umsgpack codec is needed for the handshake and can't be disabled.")
+    codecs_by_name[name].enabled = enabled
+
+
+def local_codecs():
+    """
+    Returns the names of the codecs that can be used by this process.
+
+    :rtype: list
+    """
+    return [codec.name for codec in codecs.values() if codec.available and codec.enabled]
+
+
+def negotiate(remote_codecs):
+    """
+    Picks the codec used to send packages to a remote.
+
+    :param remote_codecs: Names of the codecs supported by the remote.
+    :return: The preferred codec supported by both sides.
+    :rtype: Codec
+    """
+    for name in preferred_codecs:
+        codec = codecs_by_name.get(name)
+        if name in remote_codecs and codec is not None and codec.available and codec.enabled:
+            return codec
+    return codecs_by_name["umsgpack"]
+
+
+register_codec(UmsgpackCodec(0, "umsgpack"))
+register_codec(MsgpackCodec(1, "msgpack"))
+register_codec(PickleCodec(2, "pickle"))
+register_codec(NdarrayCodec(3, "ndarray"))
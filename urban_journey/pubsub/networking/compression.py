@@ -0,0 +1,220 @@
+"""
+Compression of large packages transmitted through a connection.
+
+A compressed package has bit 31 of its frame header set. Its payload starts with a single byte holding the id of the
+compressor, followed by the compressed payload of the codec. The compressors supported by both sides are negotiated in
+the identify exchange. Only packages larger than the compression threshold of the connection are compressed, and only
+if compressing them actually makes them smaller.
+"""
+import zlib
+import lzma
+import time
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+from urban_journey.pubsub.networking.codecs import max_frame_length
+
+
+# CPU time of the current thread. Only the process wide CPU time is available before python 3.7.
+cpu_time = getattr(time, "thread_time", time.process_time)
+
+
+class Compressor:
+    """
+    Base class of the compressors.
+
+    :param int compressor_id: Id of the compressor written in front of the compressed payload. Between 1 and 255.
+    :param string name: Name of the compressor used during negotiation.
+    """
+    available = True  #: False if the compressor can't be used because a dependency is missing.
+
+    def __init__(self, compressor_id, name):
+        if not 0 < compressor_id < 256:
+            raise ValueError("Compressor ids must be between 1 and 255.")
+        self.compressor_id = compressor_id  #: Id of the compressor written in front of the compressed payload.
+        self.name = name  #: Name of the compressor used during negotiation.
+        self.prefix = bytes((compressor_id,))  #: Byte written in front of the compressed payload.
+
+    def compress(self, data):
+        """
+        Compresses data.
+
+        :param data: Bytes like object.
+        :rtype: bytes
+        """
+        raise NotImplementedError()
+
+    def decompress(self, data):
+        """
+        Decompresses data. The decompressed data may not be larger than the maximum package length.
+
+        :param data: Bytes like object.
+        :rtype: bytes
+        :raises ValueError: If the decompressed data is too large.
+        """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "{}({}, '{}')".format(self.__class__.__name__, self.compressor_id, self.name)
+
+
+class ZlibCompressor(Compressor):
+    """zlib (deflate) compression. A good trade-off between speed and compression ratio."""
+    level = 6  #: Compression level between 1 (fastest) and 9 (smallest).
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        decompressor = zlib.decompressobj()
+        result = decompressor.decompress(data, max_frame_length)
+        if decompressor.unconsumed_tail:
+            raise ValueError("Decompressed package is too large.")
+        if not decompressor.eof:
+            raise ValueError("Compressed package is truncated.")
+        return result
+
+
+class LzmaCompressor(Compressor):
+    """lzma compression. The smallest output, but by far the slowest. Only useful for very slow links."""
+    preset = 1  #: Compression preset between 0 (fastest) and 9 (smallest).
+
+    def compress(self, data):
+        return lzma.compress(data, preset=self.preset)
+
+    def decompress(self, data):
+        decompressor = lzma.LZMADecompressor()
+        result = decompressor.decompress(data, max_frame_length)
+        if not decompressor.eof:
+            raise ValueError("Decompressed package is too large or truncated.")
+        return result
+
+
+class Lz4Compressor(Compressor):
+    """lz4 compression. Very fast, but a lower compression ratio. Only available if the lz4 package is installed."""
+    available = lz4 is not None
+
+    def compress(self, data):
+        return lz4.frame.compress(data)
+
+    def decompress(self, data):
+        # Stop at the maximum package length, instead of checking the size after decompressing everything.
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        result = decompressor.decompress(data, max_frame_length)
+        if not decompressor.eof:
+            raise ValueError("Decompressed package is too large or truncated.")
+        return result
+
+
+class CompressionStats:
+    """
+    Statistics of the packages compressed or decompressed by a connection.
+    """
+    def __init__(self):
+        self.frames = 0  #: Number of packages processed.
+        self.skipped = 0  #: Number of packages sent uncompressed because compression didn't make them smaller.
+        self.raw_bytes = 0  #: Number of bytes before compression.
+        self.compressed_bytes = 0  #: Number of bytes after compression.
+        self.cpu_time = 0.  #: CPU time in seconds spent compressing or decompressing.
+
+    def record(self, raw_bytes, compressed_bytes, cpu_time):
+        """
+        Records a processed package.
+
+        :param int raw_bytes: Size of the uncompressed payload.
+        :param int compressed_bytes: Size of the compressed payload.
+        :param float cpu_time: CPU time in seconds spent on it.
+        """
+        self.frames += 1
+        self.raw_bytes += raw_bytes
+        self.compressed_bytes += compressed_bytes
+        self.cpu_time += cpu_time
+
+    @property
+    def ratio(self):
+        """Compression ratio, uncompressed size divided by compressed size."""
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 1.
+
+    def summary(self):
+        """
+        Returns a dictionary with the compression statistics.
+
+        :rtype: dict
+        """
+        return {"frames": self.frames,
+                "skipped": self.skipped,
+                "raw_bytes": self.raw_bytes,
+                "compressed_bytes": self.compressed_bytes,
+                "ratio": self.ratio,
+                "cpu_time": self.cpu_time}
+
+
+compressors = {}  #: Dictionary holding the registered compressors by id.
+compressors_by_name = {}  #: Dictionary holding the registered compressors by name.
+
+preferred_compressors = ["lz4", "zlib"]
+"""
+Names of the compressors in order of preference. The first one supported by both sides is used. lzma is supported, but
+only used if it's added to this list.
+"""
+
+
+def register_compressor(compressor):
+    """
+    Registers a compressor.
+
+    :param Compressor compressor: Compressor to register.
+    """
+    if compressor.compressor_id in compressors and compressors[compressor.compressor_id].name != compressor.name:
+        raise ValueError("Compressor ids must be unique. '{}' and '{}' have the same id '{}'.".format(
+            compressor.name, compressors[compressor.compressor_id].name, compressor.compressor_id))
+    compressors[compressor.compressor_id] = compressor
+    compressors_by_name[compressor.name] = compressor
+
+
+def local_compressors():
+    """
+    Returns the names of the compressors that can be used by this process.
+
+    :rtype: list
+    """
+    return [compressor.name for compressor in compressors.values() if compressor.available]
+
+
+def negotiate(remote_compressors, preferred=None):
+    """
+    Picks the compressor used to send packages to a remote.
+
+    :param remote_compressors: Names of the compressors supported by the remote.
+    :param preferred: Names of the compressors in order of preference. By default :data:`preferred_compressors`.
+    :return: The preferred compressor supported by both sides. None if there is none.
+    :rtype: Compressor
+    """
+    for name in preferred_compressors if preferred is None else preferred:
+        compressor = compressors_by_name.get(name)
+        if name in remote_compressors and compressor is not None and compressor.available:
+            return compressor
+    return None
+
+
+def decompress(payload):
+    """
+    Decompresses the payload of a compressed package.
+
+    :param payload: Bytes like object holding the compressor id followed by the compressed data.
+    :return: The decompressed payload.
+    :rtype: bytes
+    :raises ValueError: If the compressor is unknown or the data can't be decompressed.
+    """
+    compressor = compressors.get(payload[0])
+    if compressor is None or not compressor.available:
+        raise ValueError("Unknown compressor '{}'.".format(payload[0]))
+    return compressor.decompress(memoryview(payload)[1:])
+
+
+register_compressor(ZlibCompressor(1, "zlib"))
+register_compressor(LzmaCompressor(2, "lzma"))
+register_compressor(Lz4Compressor(3, "lz4"))
@@ -1,10 +1,12 @@
 import sys
+from collections import deque
 from urban_journey import event_loop
 import asyncio
 from urban_journey.pubsub.networking.decoder import Decoder
+from urban_journey.pubsub.networking.codecs import get_codec, codecs_by_name, local_codecs, negotiate, pack_header
+from urban_journey.pubsub.networking.compression import CompressionStats, local_compressors, cpu_time, \
+    negotiate as negotiate_compressor
 from urban_journey.pubsub.networking.network_command import network_command, NetworkCommandBase
-import umsgpack
-import struct
 import logging
 import time
 import inspect
@@ -26,6 +28,9 @@ plog = logging.getLogger("networking.ping_pong")
 # transmitted.
 salt = b"urban_journey"
 
+# Before python 3.12 writelines joins the buffers into a single bytes object, so the transport never holds on to them.
+writelines_copies = sys.version_info < (3, 12)
+
 # Use this regex to comment out all debug logging. Replace logger_name by logger name
 # (?:(\s+)|(?:#\s*))(logger_name\.debug.+)
 # $1# $2
@@ -36,9 +41,41 @@ salt = b"urban_journey"
 
 
 class Connection:
-    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, loop=None):
+    """
+    Connection to a remote urban journey instance.
+
+    If a channel register is given, the remote can subscribe to the channels in it. The data flushed on these channels
+    is then forwarded to the remote, multiplexed by channel name over this connection. Once the connection is ready,
+    it subscribes to all remote channels that have local input ports.
+
+    Transmitted packages are put on a send queue. A writer co-routine coalesces all queued packages into a single
+    ``writelines`` call, so many small packages cost a single system call. The queue is flushed as soon as it holds
+    ``flush_size`` bytes, otherwise ``flush_delay`` seconds after the first package was queued. With a flush delay of
+    0 everything transmitted within the same event loop iteration is coalesced. The writer only waits for the socket
+    to drain once more than ``high_water`` bytes are buffered. Senders are only blocked while the send queue and socket
+    buffer together hold more than ``high_water`` bytes.
+
+    Packages larger than ``compression_threshold`` bytes can be compressed, trading CPU time for bandwidth on slow
+    links. Both sides advertise the compressors they support in the identify exchange, so a connection always accepts
+    compressed packages. Whether it compresses the packages it sends is set by ``compression``. Packages that don't
+    get smaller are sent uncompressed. See :mod:`urban_journey.pubsub.networking.compression`.
+
+    :param asyncio.StreamReader reader: Reader object
+    :param asyncio.StreamWriter writer: Writer object
+    :param loop: Event loop onto which the connection is running.
+    :param urban_journey.ChannelRegister channel_register: Channel register whose channels are bridged.
+    :param int flush_size: Number of queued bytes at which the send queue is flushed right away.
+    :param float flush_delay: Maximum time in seconds a package waits in the send queue.
+    :param int high_water: Number of buffered bytes above which the writer waits for the socket to drain.
+    :param compression: Names of the compressors to use in order of preference. True to use the default preference
+       order, :data:`urban_journey.pubsub.networking.compression.preferred_compressors`. None to send everything
+       uncompressed.
+    :param int compression_threshold: Size in bytes above which packages are compressed.
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, loop=None, channel_register=None,
+                 flush_size=64 * 1024, flush_delay=0., high_water=1 << 20, compression=None,
+                 compression_threshold=64 * 1024):
         self.loop = loop or event_loop.get()  #: Event loop onto which the host is running.
-        self.close_event
         self.reader = reader  #: :class:`asyncio.StreamReader` object of the connection.
         self.writer = writer  #: :class:`asyncio.StreamReader` object of the connection.
         self.decoder = Decoder(self.close)  #: Decoder object.
@@ -75,40 +112,76 @@ class Connection:
         self.hostname = socket.gethostname()
         self.remote_hostname = None
 
+        self.codec = get_codec(0)  #: Codec used to send packages. Negotiated in the identify exchange.
+        self.remote_codecs = ["umsgpack"]  #: Names of the codecs supported by the remote.
+
+        self.compression = compression  #: Names of the compressors to use. True for the default order, None for none.
+        self.compression_threshold = compression_threshold  #: Size in bytes above which packages are compressed.
+        self.compressor = None  #: Compressor used to send large packages. Negotiated in the identify exchange.
+        self.remote_compressors = []  #: Names of the compressors supported by the remote.
+        self.compression_stats = CompressionStats()
+        """:class:`urban_journey.pubsub.networking.compression.CompressionStats` of the compressed packages sent."""
+
+        self.channel_register = channel_register  #: Channel register whose channels are bridged.
+        self.subscriptions = set()  #: Names of the local channels the remote is subscribed to.
+        self.remote_subscriptions = set()  #: Names of the remote channels this side is subscribed to.
+
+        self.flush_size = flush_size  #: Number of queued bytes at which the send queue is flushed right away.
+        self.flush_delay = flush_delay  #: Maximum time in seconds a package waits in the send queue.
+        self.high_water = high_water  #: Number of buffered bytes above which the writer waits for the socket to drain.
+        self.send_queue = deque()  #: Buffers of the packages waiting to be written.
+        self.send_queue_bytes = 0  #: Number of bytes waiting in the send queue.
+        self.__send_event = asyncio.Event()  #: Set when packages are put on the send queue.
+        self.__writable_event = asyncio.Event()  #: Set while the send queue is below the high-water mark.
+        self.__writable_event.set()
+        writer.transport.set_write_buffer_limits(high=high_water)
+
+        # Statistics
+        self.bytes_sent = 0  #: Number of bytes written, including the frame headers.
+        self.frames_sent = 0  #: Number of packages written.
+        self.flushes = 0  #: Number of times the send queue was written to the socket.
+
         # Start co-routines
+        asyncio.run_coroutine_threadsafe(self.frame_writer(), self.loop)
         asyncio.run_coroutine_threadsafe(self.package_handler(), self.loop)
         asyncio.run_coroutine_threadsafe(self.data_reader(), self.loop)
         asyncio.run_coroutine_threadsafe(self.handshake(), self.loop)
 
     @classmethod
-    async def from_host(cls, host, port):
+    async def from_host(cls, host, port, **kwargs):
         """
         Creates a connection instance from a host address and port.
 
         :param string host: Host address
         :param int port: Port
+        :param kwargs: Extra keyword arguments passed to the constructor.
         :return: Instance of Connection
         """
         dlog.debug("Creating connection from host at '{}:{}'.".format(host, port))
         reader, writer = await asyncio.open_connection(host, port)
-        return cls(reader, writer)
+        return cls(reader, writer, **kwargs)
 
     async def data_reader(self):
         """
-        Co-routine that is constantly listening for data coming in through the connection. The data is then passed to
-        the decoder.
+        Co-routine that is constantly listening for data coming in through the connection. The decoder reads the
+        packages straight from the stream, one whole package at a time.
         """
 
         dlog.debug(self.log_prefix + "Waiting for incoming data.")
         while self.running:
-            data = await self.reader.read(1024)
-            # dlog.debug(self.log_prefix + "in_data {}".format(data))
-            if self.reader.at_eof():
-                self.running = False
+            try:
+                if not await self.decoder.read_frame(self.reader):
+                    break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # The remote closed the connection.
                 break
-            await self.decoder.digest(data)
+        self.running = False
+        # Wake up the frame writer, so it stops as well.
+        self.__send_event.set()
+        self.drop_subscriptions()
         dlog.debug(self.log_prefix + "Closed")
-        self.__closed_condition.notify_all()
+        with await self.__closed_condition:
+            self.__closed_condition.notify_all()
 
     async def package_handler(self):
         """
@@ -135,7 +208,10 @@ class Connection:
 
         :param command_id: Command id
         :param *args: Command arguments
+        :raises ConnectionError: If the connection is closed.
         """
+        if not self.running:
+            raise ConnectionError(self.log_prefix + "Connection closed")
 
         # Always allow if it's ready to transmit.
         # Only allow handshake and identify packages if it's not ready to transmit.
@@ -146,10 +222,100 @@ class Connection:
             self.__command_dictionary[command_id].func.__name__,
             args
         ))
-        data = umsgpack.packb((command_id, args))
-        self.writer.write(struct.pack(">I", len(data)))
-        self.writer.write(data)
-        await self.writer.drain()
+        codec = self.select_codec(args) if self.ready else get_codec(0)
+        buffers = codec.encode(command_id, args)
+        length = sum(len(buffer) for buffer in buffers)
+        compressed = False
+        if self.compressor is not None and length >= self.compression_threshold:
+            buffers, length, compressed = self.compress(buffers, length)
+        # The caller is free to modify its data once transmit has returned. Buffers viewing the data of the caller, eg.
+        # the memory of numpy arrays, are only copied if the frame is not handed to the transport before that.
+        if not (writelines_copies and self.send_queue_bytes + 4 + length >= self.flush_size):
+            buffers = [buffer if isinstance(buffer, bytes) else bytes(buffer) for buffer in buffers]
+        self.send_queue.append(pack_header(length, codec.codec_id, compressed))
+        self.send_queue.extend(buffers)
+        self.send_queue_bytes += 4 + length
+        self.frames_sent += 1
+
+        if self.send_queue_bytes >= self.flush_size:
+            self.flush_send_queue()
+        self.__send_event.set()
+
+        # Wait for the writer to drain the socket if too much data is buffered.
+        if self.send_queue_bytes + self.writer.transport.get_write_buffer_size() >= self.high_water:
+            self.__writable_event.clear()
+            await self.__writable_event.wait()
+            if not self.running:
+                raise ConnectionError(self.log_prefix + "Connection closed")
+
+    def compress(self, buffers, length):
+        """
+        Compresses the payload of a package. The payload is left as it is if compressing doesn't make it smaller.
+
+        :param buffers: List of bytes like objects forming the payload.
+        :param int length: Length of the payload.
+        :return: ``(buffers, length, compressed)`` tuple.
+        """
+        t0 = cpu_time()
+        data = self.compressor.compress(b"".join(buffers))
+        dt = cpu_time() - t0
+        if len(data) + 1 >= length:
+            self.compression_stats.skipped += 1
+            self.compression_stats.cpu_time += dt
+            return buffers, length, False
+        self.compression_stats.record(length, len(data) + 1, dt)
+        return [self.compressor.prefix, data], len(data) + 1, True
+
+    def flush_send_queue(self):
+        """
+        Writes all packages in the send queue to the socket in a single call. On python versions before 3.12 the
+        transport joins the buffers into a single bytes object for this.
+        """
+        if not self.send_queue:
+            return
+        buffers, self.send_queue = self.send_queue, deque()
+        self.writer.writelines(buffers)
+        self.bytes_sent += self.send_queue_bytes
+        self.send_queue_bytes = 0
+        self.flushes += 1
+
+    async def frame_writer(self):
+        """
+        Co-routine writing the send queue to the socket. See :class:`Connection`.
+        """
+        try:
+            while self.running:
+                await self.__send_event.wait()
+                if self.flush_delay:
+                    # Cork the socket to give other packages the chance to join. The queue is flushed right away by
+                    # transmit if it reaches the flush size in the meantime.
+                    await asyncio.sleep(self.flush_delay)
+                self.__send_event.clear()
+                self.flush_send_queue()
+
+                if self.writer.transport.get_write_buffer_size() >= self.high_water:
+                    try:
+                        await self.writer.drain()
+                    except ConnectionError:
+                        break
+                self.__writable_event.set()
+        finally:
+            # Never leave a transmit waiting on a writer that is gone.
+            self.__writable_event.set()
+
+    def select_codec(self, args):
+        """
+        Returns the codec used to send a package. This is the negotiated codec, unless the arguments hold numpy arrays
+        that can be sent more efficiently by the ndarray codec.
+
+        :param args: Command arguments.
+        :rtype: urban_journey.pubsub.networking.codecs.Codec
+        """
+        if not self.codec.supports_arrays and "ndarray" in self.remote_codecs:
+            ndarray_codec = codecs_by_name["ndarray"]
+            if ndarray_codec.enabled and any(map(ndarray_codec.is_supported, args)):
+                return ndarray_codec
+        return self.codec
 
     def transmit_threadsafe(self, command_id, *args):
         """
@@ -173,11 +339,17 @@ class Connection:
         return not self.running
 
     def close(self):
+        # Write whatever is still in the send queue before closing.
+        self.flush_send_queue()
+        self.running = False
+        self.closing_semaphore.release()
+        self.__send_event.set()
+        self.__writable_event.set()
         self.writer.close()
 
     async def wait_for_closed(self):
-        with self.__closed_condition:
-            self.__closed_condition.wait_for(lambda: not self.running)
+        with await self.__closed_condition:
+            await self.__closed_condition.wait_for(lambda: not self.running)
 
     async def wait_for_ready(self):
         with await self.__ready_condition:
@@ -264,16 +436,24 @@ class Connection:
         """
         Sends the identification information to the remote.
         """
-        await self.transmit_identify_reply(self.hostname)
+        await self.transmit_identify_reply(self.hostname, local_codecs(), local_compressors())
 
     @identify_reply.handler
-    async def identify_reply(self, hostname):
+    async def identify_reply(self, hostname, codecs=("umsgpack",), compressors=()):
         nlog.debug(self.log_prefix + "")
         self.remote_hostname = hostname
+        self.remote_codecs = list(codecs)
+        self.codec = negotiate(codecs)
+        self.remote_compressors = list(compressors)
+        if self.compression:
+            self.compressor = negotiate_compressor(
+                compressors, None if self.compression is True else self.compression)
         self.ready = True
         self.decoder.restricted = False
         with await self.__ready_condition:
             self.__ready_condition.notify_all()
+        if self.channel_register is not None:
+            asyncio.ensure_future(self.subscribe_inputs())
 
     # Ping Pong ========================================================================================================
     @network_command(4)
@@ -310,4 +490,74 @@ class Connection:
     async def pong(self):
         self.ping_semaphore.release()
 
+    # Channels =========================================================================================================
+    @network_command(6)
+    async def subscribe_channel(self, channel_name):
+        """
+        Subscribes to a channel on the remote. The data flushed on it is forwarded to the local channel with the same
+        name.
 
+        :param string channel_name: Name of the channel.
+        """
+        self.remote_subscriptions.add(channel_name)
+        await self.transmit_subscribe_channel(channel_name)
+
+    @subscribe_channel.handler
+    async def subscribe_channel(self, channel_name):
+        if self.channel_register is None:
+            nlog.warning(self.log_prefix + "Remote subscribed to channel '{}', but there is no channel register.".format(
+                channel_name))
+            return
+        self.subscriptions.add(channel_name)
+        self.channel_register.get_channel(channel_name).add_remote_subscriber(self)
+
+    @network_command(7)
+    async def unsubscribe_channel(self, channel_name):
+        """
+        Stops the remote from forwarding the data of a channel.
+
+        :param string channel_name: Name of the channel.
+        """
+        self.remote_subscriptions.discard(channel_name)
+        await self.transmit_unsubscribe_channel(channel_name)
+
+    @unsubscribe_channel.handler
+    async def unsubscribe_channel(self, channel_name):
+        self.subscriptions.discard(channel_name)
+        if self.channel_register is not None and channel_name in self.channel_register.channels:
+            self.channel_register.channels[channel_name].remove_remote_subscriber(self)
+
+    @network_command(8)
+    async def channel_data(self, channel_name, data):
+        """
+        Sends the data flushed on a channel the remote is subscribed to.
+
+        :param string channel_name: Name of the channel.
+        :param data: The data being transmitted.
+        """
+        await self.transmit_channel_data(channel_name, data)
+
+    @channel_data.handler
+    async def channel_data(self, channel_name, data):
+        # Drop data that was not asked for. It might still be in flight after unsubscribing.
+        if self.channel_register is None or channel_name not in self.remote_subscriptions:
+            return
+        await self.channel_register.get_channel(channel_name).flush(data, origin=self)
+
+    async def subscribe_inputs(self):
+        """
+        Subscribes to all remote channels that have input ports in the local channel register.
+        """
+        for channel_name, channel in list(self.channel_register.channels.items()):
+            if channel.input_list and channel_name not in self.remote_subscriptions:
+                await self.subscribe_channel(channel_name)
+
+    def drop_subscriptions(self):
+        """
+        Stops forwarding data to the remote. Called when the connection is closed.
+        """
+        if self.channel_register is not None:
+            for channel_name in self.subscriptions:
+                if channel_name in self.channel_register.channels:
+                    self.channel_register.channels[channel_name].remove_remote_subscriber(self)
+        self.subscriptions.clear()
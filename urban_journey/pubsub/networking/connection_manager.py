@@ -0,0 +1,204 @@
+"""
+Pool of connections to remotes, keyed by host and port, that are re-established automatically when they drop.
+"""
+import asyncio
+import logging
+
+from urban_journey import event_loop
+from urban_journey.pubsub.networking.connection import Connection
+from urban_journey.pubsub.channels.envelope import LatencyHistogram
+
+
+nlog = logging.getLogger("networking")
+
+
+class ConnectionMetrics:
+    """
+    Connection statistics of a single remote kept by the :class:`ConnectionManager`.
+    """
+    def __init__(self):
+        self.connects = 0  #: Number of times the connection was established for the first time.
+        self.reconnects = 0  #: Number of times the connection was re-established after it dropped.
+        self.disconnects = 0  #: Number of times the connection dropped.
+        self.failures = 0  #: Number of failed connection attempts.
+        self.consecutive_failures = 0  #: Number of failed connection attempts since the last successful one.
+        self.last_reconnect_latency = None  #: Time in seconds it took to re-establish the connection the last time.
+        self.reconnect_latency = LatencyHistogram(min_latency=1e-3, max_latency=1000.)
+        """
+        :class:`urban_journey.pubsub.channels.envelope.LatencyHistogram` with the times between the connection
+        dropping and it being ready again.
+        """
+
+    def summary(self):
+        """
+        Returns a dictionary with the connection statistics.
+
+        :rtype: dict
+        """
+        return {"connects": self.connects,
+                "reconnects": self.reconnects,
+                "disconnects": self.disconnects,
+                "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures,
+                "last_reconnect_latency": self.last_reconnect_latency,
+                "reconnect_latency": self.reconnect_latency.summary()}
+
+
+class ConnectionManager:
+    """
+    Keeps a single connection per remote host and port, shared by everyone talking to that remote.
+
+    Each remote is supervised by a co-routine. If the connection drops, it's re-opened with an exponential backoff
+    between the attempts. The new connection performs the handshake again and re-subscribes to the remote channels the
+    old connection was subscribed to.
+
+    Managed connections should be closed with :func:`close`. Connections closed in any other way are re-opened.
+
+    :param urban_journey.ChannelRegister channel_register: Channel register whose channels are bridged over the
+       connections.
+    :param loop: Event loop onto which the connections are running.
+    :param float initial_backoff: Time in seconds to wait before retrying after the first failed attempt.
+    :param float max_backoff: Maximum time in seconds between two attempts.
+    :param float backoff_factor: Factor by which the time between attempts grows after each failed attempt.
+    :param float ready_timeout: Maximum time in seconds the handshake may take.
+    :param kwargs: Extra keyword arguments passed to :class:`urban_journey.pubsub.networking.connection.Connection`.
+    """
+    def __init__(self, channel_register=None, loop=None, initial_backoff=0.1, max_backoff=10., backoff_factor=2.,
+                 ready_timeout=5., **kwargs):
+        self.channel_register = channel_register  #: Channel register whose channels are bridged.
+        self.loop = loop or event_loop.get()  #: Event loop onto which the connections are running.
+        self.initial_backoff = initial_backoff  #: Time in seconds to wait after the first failed attempt.
+        self.max_backoff = max_backoff  #: Maximum time in seconds between two attempts.
+        self.backoff_factor = backoff_factor  #: Factor by which the time between attempts grows.
+        self.ready_timeout = ready_timeout  #: Maximum time in seconds the handshake may take.
+        self.connection_kwargs = kwargs  #: Extra keyword arguments passed to the connections.
+
+        self.connections = {}  #: Dictionary holding the current connection to each remote by "host:port".
+        self.metrics = {}  #: Dictionary holding the :class:`ConnectionMetrics` of each remote by "host:port".
+        self.__supervisors = {}  #: Dictionary holding the supervisor task of each remote.
+        self.__waiters = {}  #: Dictionary holding the futures waiting for a remote to be connected.
+
+    @staticmethod
+    def key(host, port):
+        """Returns the key of a remote in the pool."""
+        return "{}:{}".format(host, port)
+
+    async def get(self, host, port, timeout=None):
+        """
+        Co-routine returning the connection to a remote. The connection is opened if there is none yet. If it's
+        reconnecting, this waits until it's ready again.
+
+        :param string host: Remote host.
+        :param int port: Remote port.
+        :param float timeout: Maximum time in seconds to wait. None to wait until connected.
+        :rtype: urban_journey.pubsub.networking.connection.Connection
+        :raises asyncio.TimeoutError: If the remote couldn't be connected to in time.
+        """
+        key = self.key(host, port)
+        connection = self.connections.get(key)
+        if connection is not None and connection.ready and not connection.closed:
+            return connection
+
+        if key not in self.__supervisors:
+            self.metrics.setdefault(key, ConnectionMetrics())
+            self.__supervisors[key] = asyncio.ensure_future(self.supervise(host, port), loop=self.loop)
+
+        future = self.loop.create_future()
+        self.__waiters.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if future in self.__waiters.get(key, ()):
+                self.__waiters[key].remove(future)
+
+    async def open(self, host, port):
+        """
+        Opens a connection and waits for the handshake to finish.
+
+        :param string host: Remote host.
+        :param int port: Remote port.
+        :rtype: urban_journey.pubsub.networking.connection.Connection
+        """
+        connection = await Connection.from_host(host, port, channel_register=self.channel_register,
+                                                **self.connection_kwargs)
+        try:
+            await asyncio.wait_for(connection.wait_for_ready(), self.ready_timeout)
+        except asyncio.TimeoutError:
+            connection.close()
+            raise
+        return connection
+
+    async def supervise(self, host, port):
+        """
+        Co-routine keeping the connection to a remote open.
+
+        :param string host: Remote host.
+        :param int port: Remote port.
+        """
+        key = self.key(host, port)
+        metrics = self.metrics[key]
+        backoff = self.initial_backoff
+        subscriptions = set()  # Remote channels to re-subscribe to.
+        disconnect_time = None
+
+        while key in self.__supervisors:
+            try:
+                connection = await self.open(host, port)
+            except (OSError, asyncio.TimeoutError) as e:
+                metrics.failures += 1
+                metrics.consecutive_failures += 1
+                nlog.warning("Connection to '{}' failed ({}). Retrying in {:.2f} [s]".format(key, e, backoff))
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * self.backoff_factor, self.max_backoff)
+                continue
+
+            backoff = self.initial_backoff
+            metrics.consecutive_failures = 0
+            if disconnect_time is None:
+                metrics.connects += 1
+            else:
+                metrics.reconnects += 1
+                metrics.last_reconnect_latency = self.loop.time() - disconnect_time
+                metrics.reconnect_latency.record(metrics.last_reconnect_latency)
+                nlog.info("Reconnected to '{}' in {:.3f} [s]".format(key, metrics.last_reconnect_latency))
+
+            for channel_name in subscriptions:
+                if channel_name not in connection.remote_subscriptions:
+                    await connection.subscribe_channel(channel_name)
+
+            self.connections[key] = connection
+            if self.channel_register is not None:
+                self.channel_register.connections[key] = connection
+            for future in self.__waiters.pop(key, ()):
+                if not future.done():
+                    future.set_result(connection)
+
+            await connection.wait_for_closed()
+            subscriptions = set(connection.remote_subscriptions)
+            disconnect_time = self.loop.time()
+            metrics.disconnects += 1
+            if key in self.__supervisors:
+                nlog.warning("Connection to '{}' dropped. Reconnecting.".format(key))
+
+    def close(self, host, port):
+        """
+        Closes the connection to a remote and stops reconnecting to it.
+
+        :param string host: Remote host.
+        :param int port: Remote port.
+        """
+        key = self.key(host, port)
+        supervisor = self.__supervisors.pop(key, None)
+        if supervisor is not None:
+            supervisor.cancel()
+        connection = self.connections.pop(key, None)
+        if connection is not None:
+            connection.close()
+            if self.channel_register is not None and self.channel_register.connections.get(key) is connection:
+                del self.channel_register.connections[key]
+
+    def close_all(self):
+        """Closes all connections."""
+        for key in list(self.__supervisors):
+            host, port = key.rsplit(":", 1)
+            self.close(host, port)
@@ -0,0 +1,362 @@
+"""
+Datagram (UDP) transport for lossy, high rate channels like sensor telemetry. Lost packages are not retransmitted, so a
+lost package never holds back the ones behind it.
+
+The packages use the same ``[command_id, args]`` framing and codecs as :class:`urban_journey.pubsub.networking.
+connection.Connection`, prefixed by a datagram header holding the sequence number of the package and the index and
+number of fragments. Packages larger than a datagram are split into fragments and reassembled by the receiver. If any
+fragment is lost, the whole package is lost.
+
+There is no handshake, so only the umsgpack, msgpack and ndarray codecs are used. Packages encoded with any other codec
+are dropped, even if it's enabled, since anybody able to reach the port can send them.
+"""
+import asyncio
+import inspect
+import functools
+import struct
+import logging
+from collections import OrderedDict
+
+from urban_journey import event_loop
+from urban_journey.pubsub.networking.decoder import Decoder
+from urban_journey.pubsub.networking.network_command import network_command, NetworkCommandBase
+from urban_journey.pubsub.networking.codecs import codecs, codecs_by_name, pack_header, unpack_header, max_frame_length
+
+
+nlog = logging.getLogger("networking")
+
+datagram_header_struct = struct.Struct(">IHH")
+"""Struct of the datagram header. Holds the sequence number, fragment index and number of fragments."""
+
+sequence_modulo = 1 << 32  #: Sequence numbers wrap around at this value.
+
+datagram_codecs = ("umsgpack", "msgpack", "ndarray")  #: Names of the codecs allowed to encode datagram packages.
+
+
+class SequenceStats:
+    """
+    Sequence number statistics of the packages received from a single sender.
+    """
+    def __init__(self):
+        self.last_sequence = None  #: Highest sequence number received.
+        self.received = 0  #: Number of packages received in order.
+        self.lost = 0  #: Number of packages skipped in the sequence. Late packages are not subtracted.
+        self.reordered = 0  #: Number of packages received after a package with a higher sequence number.
+        self.duplicates = 0  #: Number of packages received more than once.
+
+    def update(self, sequence):
+        """
+        Registers the sequence number of a received package.
+
+        :param int sequence: Sequence number.
+        :return: True if the package is newer than all packages received before.
+        """
+        if self.last_sequence is None:
+            self.last_sequence = sequence
+            self.received += 1
+            return True
+
+        # Interpret the difference as a signed 32 bit integer to handle wrap around.
+        delta = (sequence - self.last_sequence + sequence_modulo // 2) % sequence_modulo - sequence_modulo // 2
+        if delta > 0:
+            self.lost += delta - 1
+            self.last_sequence = sequence
+            self.received += 1
+            return True
+        elif delta == 0:
+            self.duplicates += 1
+        else:
+            self.reordered += 1
+        return False
+
+    @property
+    def loss_rate(self):
+        """Fraction of the packages that was lost."""
+        total = self.received + self.lost
+        return self.lost / total if total else 0.
+
+
+class DatagramConnection(asyncio.DatagramProtocol):
+    """
+    Datagram endpoint bridging channels to a remote. Create it with :func:`open`.
+
+    Select the channels sent to the remote with :func:`forward_channel`. The received channel data is flushed on the
+    channels in the channel register. Like :class:`urban_journey.pubsub.networking.connection.Connection`, it can be
+    added to the remote subscribers of a channel.
+
+    :param urban_journey.ChannelRegister channel_register: Channel register whose channels are bridged.
+    :param tuple remote_addr: ``(host, port)`` tuple of the remote to send to. None to only receive.
+    :param loop: Event loop onto which the endpoint is running.
+    :param string codec: Name of the codec used to encode the packages without arrays. Either "umsgpack" or "msgpack".
+    :param int max_datagram_size: Maximum size in bytes of the datagrams, header included.
+    :param bool fragment: True to split large packages into multiple datagrams. If False they are dropped.
+    :param float reassembly_timeout: Time in seconds after which incomplete packages are dropped.
+    :param bool drop_reordered: True to drop packages older than the newest package received from the same sender.
+    :param receive: Names of the channels accepted from remotes. None to accept all channels.
+    :param int max_reassemblies: Maximum number of incomplete packages kept. Once reached, the oldest one is dropped.
+    """
+    def __init__(self, channel_register=None, remote_addr=None, loop=None, codec="umsgpack", max_datagram_size=1400,
+                 fragment=True, reassembly_timeout=1., drop_reordered=True, receive=None, max_reassemblies=64):
+        self.channel_register = channel_register  #: Channel register whose channels are bridged.
+        self.remote_addr = remote_addr  #: ``(host, port)`` tuple of the remote to send to.
+        self.loop = loop or event_loop.get()  #: Event loop onto which the endpoint is running.
+        if codec not in datagram_codecs:
+            raise ValueError("Codec '{}' can not be used for datagrams. Use one of {}.".format(
+                codec, ", ".join(datagram_codecs)))
+        self.codec = codecs_by_name[codec]  #: Codec used to encode the packages without arrays.
+        self.max_datagram_size = max_datagram_size  #: Maximum size in bytes of the datagrams.
+        self.fragment = fragment  #: True to split large packages into multiple datagrams.
+        self.reassembly_timeout = reassembly_timeout  #: Time in seconds after which incomplete packages are dropped.
+        self.drop_reordered = drop_reordered  #: True to drop packages older than the newest one received.
+        self.receive = None if receive is None else set(receive)  #: Names of the channels accepted from remotes.
+        self.max_reassemblies = max_reassemblies  #: Maximum number of incomplete packages kept.
+
+        self.transport = None  #: :class:`asyncio.DatagramTransport` of the endpoint.
+        self.decoder = Decoder(self.invalid_package, self.loop)  #: Decoder used to decode and validate the packages.
+        self.decoder.restricted = False
+        self.sequence = 0  #: Sequence number of the last package sent.
+        self.forwarded_channels = set()  #: Names of the channels sent to the remote.
+        self.senders = {}  #: Dictionary holding the :class:`SequenceStats` of each sender address.
+        self.fragments = OrderedDict()
+        """
+        Ordered dictionary holding the ``[fragments, n_received, time]`` of each incomplete package by sender and
+        sequence, oldest first.
+        """
+
+        # Statistics
+        self.packages_sent = 0  #: Number of packages sent.
+        self.datagrams_sent = 0  #: Number of datagrams sent.
+        self.datagrams_received = 0  #: Number of datagrams received.
+        self.oversized = 0  #: Number of packages not sent because they didn't fit in a datagram.
+        self.incomplete = 0  #: Number of packages dropped because some of their fragments never arrived.
+        self.invalid = 0  #: Number of invalid datagrams and packages received.
+        self.rejected = 0  #: Number of packages received for channels that are not accepted.
+
+        self.__command_dictionary = {}
+        for member_name in dir(self):
+            member = inspect.getattr_static(self, member_name)
+            if isinstance(member, NetworkCommandBase):
+                self.__command_dictionary[member.command_id] = functools.partial(member.handler_func, self)
+
+    @classmethod
+    async def open(cls, local_addr, remote_addr=None, loop=None, **kwargs):
+        """
+        Co-routine creating a datagram endpoint.
+
+        :param tuple local_addr: ``(host, port)`` tuple to bind to. Use port 0 to pick a free port.
+        :param tuple remote_addr: ``(host, port)`` tuple of the remote to send to.
+        :param loop: Event loop onto which the endpoint is running.
+        :param kwargs: Extra keyword arguments passed to the constructor.
+        :rtype: DatagramConnection
+        """
+        connection = cls(remote_addr=remote_addr, loop=loop, **kwargs)
+        await connection.bind(local_addr)
+        return connection
+
+    async def bind(self, local_addr):
+        """
+        Co-routine creating the datagram endpoint of this connection. It has to run on the event loop of the connection.
+
+        :param tuple local_addr: ``(host, port)`` tuple to bind to. Use port 0 to pick a free port.
+        """
+        await self.loop.create_datagram_endpoint(lambda: self, local_addr=local_addr)
+
+    @property
+    def local_addr(self):
+        """``(host, port)`` tuple the endpoint is bound to."""
+        return self.transport.get_extra_info("sockname")[:2]
+
+    @property
+    def closed(self):
+        return self.transport is None or self.transport.is_closing()
+
+    def close(self):
+        """Stops forwarding channels and closes the endpoint."""
+        for channel_name in list(self.forwarded_channels):
+            self.stop_forwarding(channel_name)
+        if self.transport is not None:
+            self.transport.close()
+
+    def forward_channel(self, channel_name):
+        """
+        Sends the data flushed on a channel to the remote.
+
+        :param string channel_name: Name of the channel.
+        """
+        self.forwarded_channels.add(channel_name)
+        self.channel_register.get_channel(channel_name).add_remote_subscriber(self)
+
+    def stop_forwarding(self, channel_name):
+        """
+        Stops sending the data of a channel to the remote.
+
+        :param string channel_name: Name of the channel.
+        """
+        self.forwarded_channels.discard(channel_name)
+        if channel_name in self.channel_register.channels:
+            self.channel_register.channels[channel_name].remove_remote_subscriber(self)
+
+    # Protocol =========================================================================================================
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def error_received(self, exc):
+        nlog.warning("Datagram endpoint error: {}".format(exc))
+
+    def transmit(self, command_id, *args):
+        """
+        Sends a package to the remote. This never blocks. If the socket buffer is full, the package is lost.
+
+        :param command_id: Command id
+        :param *args: Command arguments
+        """
+        ndarray_codec = codecs_by_name["ndarray"]
+        codec = ndarray_codec if any(map(ndarray_codec.is_supported, args)) else self.codec
+        buffers = codec.encode(command_id, args)
+        # The package has to be cut in fragments anyway, so it's joined into a single buffer here.
+        payload = b"".join([pack_header(sum(len(buffer) for buffer in buffers), codec.codec_id)] + buffers)
+
+        chunk_size = self.max_datagram_size - datagram_header_struct.size
+        n_fragments = max(-(-len(payload) // chunk_size), 1)
+        if n_fragments > 1 and (not self.fragment or n_fragments > 0xFFFF):
+            self.oversized += 1
+            return
+
+        self.sequence = (self.sequence + 1) % sequence_modulo
+        view = memoryview(payload)
+        for i in range(n_fragments):
+            self.transport.sendto(b"".join((datagram_header_struct.pack(self.sequence, i, n_fragments),
+                                            view[i * chunk_size:(i + 1) * chunk_size])),
+                                  self.remote_addr)
+        self.datagrams_sent += n_fragments
+        self.packages_sent += 1
+
+    def datagram_received(self, data, addr):
+        self.datagrams_received += 1
+        if len(data) < datagram_header_struct.size:
+            self.invalid += 1
+            return
+
+        sequence, index, n_fragments = datagram_header_struct.unpack_from(data)
+        if index >= n_fragments:
+            self.invalid += 1
+            return
+        payload = memoryview(data)[datagram_header_struct.size:]
+
+        if n_fragments > 1:
+            payload = self.reassemble(addr, sequence, index, n_fragments, payload)
+            if payload is None:
+                return
+
+        if addr not in self.senders:
+            self.senders[addr] = SequenceStats()
+        if not self.senders[addr].update(sequence) and self.drop_reordered:
+            return
+
+        if len(payload) < 4 or unpack_header(payload)[0] != len(payload) - 4:
+            self.invalid += 1
+            return
+        length, codec_id, compressed = unpack_header(payload)
+        # Check the codec before the decoder does, since it accepts every enabled codec, including pickle.
+        if codec_id not in codecs or codecs[codec_id].name not in datagram_codecs:
+            self.invalid += 1
+            return
+        if not self.decoder.check_header(length, codec_id, compressed):
+            return
+        package = self.decoder.decode(payload[4:], codec_id, compressed)
+        if package is None:
+            return
+        handler = self.__command_dictionary.get(package[0])
+        if handler is None:
+            self.invalid += 1
+            return
+        asyncio.ensure_future(handler(*package[1]), loop=self.loop)
+
+    def reassemble(self, addr, sequence, index, n_fragments, payload):
+        """
+        Stores a fragment of a package. Packages that could never be decoded because they would be longer than the
+        maximum frame length are dropped right away. The remote has to use the same maximum datagram size or a smaller
+        one.
+
+        :return: The whole package once all of its fragments have been received, otherwise None.
+        """
+        max_payload = self.max_datagram_size - datagram_header_struct.size
+        if len(payload) > max_payload or n_fragments * max_payload > max_frame_length + 4:
+            self.invalid += 1
+            return None
+        now = self.loop.time()
+        key = (addr, sequence)
+        entry = self.fragments.get(key)
+        if entry is None:
+            self.expire_fragments(now)
+            if len(self.fragments) >= self.max_reassemblies:
+                self.fragments.popitem(last=False)
+                self.incomplete += 1
+            entry = self.fragments[key] = [[None] * n_fragments, 0, now]
+        fragments = entry[0]
+        if len(fragments) != n_fragments:
+            self.invalid += 1
+            return None
+        if fragments[index] is None:
+            fragments[index] = payload
+            entry[1] += 1
+        if entry[1] < n_fragments:
+            return None
+        del self.fragments[key]
+        return memoryview(b"".join(fragments))
+
+    def expire_fragments(self, now):
+        """
+        Drops the incomplete packages older than the reassembly timeout. The packages are stored oldest first, so only
+        the expired ones are visited.
+
+        :param float now: Current loop time.
+        """
+        fragments = self.fragments
+        while fragments and now - next(iter(fragments.values()))[2] > self.reassembly_timeout:
+            fragments.popitem(last=False)
+            self.incomplete += 1
+
+    def invalid_package(self):
+        """Called by the decoder when it receives an invalid package."""
+        self.invalid += 1
+
+    def stats(self):
+        """
+        Returns a dictionary with the transport statistics, summed over all senders.
+
+        :rtype: dict
+        """
+        received = sum(stats.received for stats in self.senders.values())
+        lost = sum(stats.lost for stats in self.senders.values())
+        return {"packages_sent": self.packages_sent,
+                "datagrams_sent": self.datagrams_sent,
+                "datagrams_received": self.datagrams_received,
+                "packages_received": received,
+                "lost": lost,
+                "reordered": sum(stats.reordered for stats in self.senders.values()),
+                "duplicates": sum(stats.duplicates for stats in self.senders.values()),
+                "loss_rate": lost / (received + lost) if received + lost else 0.,
+                "oversized": self.oversized,
+                "incomplete": self.incomplete,
+                "invalid": self.invalid,
+                "rejected": self.rejected}
+
+    # Channels =========================================================================================================
+    @network_command(8)
+    async def channel_data(self, channel_name, data):
+        """
+        Sends the data flushed on a forwarded channel.
+
+        :param string channel_name: Name of the channel.
+        :param data: The data being transmitted.
+        """
+        if self.remote_addr is not None:
+            self.transmit(8, channel_name, data)
+
+    @channel_data.handler
+    async def channel_data(self, channel_name, data):
+        if self.channel_register is None or (self.receive is not None and channel_name not in self.receive):
+            self.rejected += 1
+            return
+        await self.channel_register.get_channel(channel_name).flush(data, origin=self)
@@ -1,8 +1,7 @@
-import umsgpack
-from io import BytesIO
-import struct
 import asyncio
 from urban_journey import event_loop
+from urban_journey.pubsub.networking.codecs import get_codec, unpack_header
+from urban_journey.pubsub.networking.compression import CompressionStats, decompress, cpu_time
 
 
 restricted_allowed_data_length = 1024
@@ -12,18 +11,28 @@ class Decoder:
     """
     This class is used to decode the incoming data into usable packages.
 
+    Each package is prefixed by a 4 byte header holding its length, the id of the codec it's encoded with and whether
+    it's compressed, see :mod:`urban_journey.pubsub.networking.codecs` and
+    :mod:`urban_journey.pubsub.networking.compression`. Packages can either be read straight from a stream reader with
+    :func:`read_frame` or be pushed into the decoder in arbitrary chunks with :func:`digest`.
+
     :param error_callback: A Callable that is called whenever an error occurs while decoding the data.
     :param loop: Event loop on which to run the internal queue holding the decoded packages.
+    :param int buffer_size: Initial size in bytes of the buffer used by :func:`digest`. It grows to fit the largest
+       package received.
     """
 
-    def __init__(self, error_callback=None, loop=None):
+    def __init__(self, error_callback=None, loop=None, buffer_size=64 * 1024):
         self.state = 0
         """The current state of the decoder. If 0, it's reading the data length. If 1, it's reading the data."""
 
         self.error_callback = error_callback  #: Function that is called whenever an error occurs decoding the data.
-        self.buffer = BytesIO()  #: Buffer used to hold the data being read.
+        self.buffer = bytearray(buffer_size)  #: Preallocated buffer used by :func:`digest` to hold the data being read.
+        self.view = memoryview(self.buffer)  #: Memoryview on the buffer, used to fill it without copying the input.
         self.block_read = 0  #: Number of bytes read in the current block.
         self.data_length = 0  #: The length of the current package being read.
+        self.codec_id = 0  #: Id of the codec of the current package being read.
+        self.compressed = False  #: True if the current package being read is compressed.
         self.queue = asyncio.Queue(10, loop=loop or event_loop.get())  #: Queue holding the packages received.
         self.get = self.queue.get
         self.get_nowait = self.queue.get_nowait
@@ -32,8 +41,98 @@ class Decoder:
         """
         If ``True`` this means that the decoder is running in restricted mode.
         In the restricted mode the decoder only allows packages big enough for
-        the handshake packages.
+        the handshake packages, encoded with the umsgpack codec and uncompressed.
+        """
+
+        # Statistics
+        self.packages_received = 0  #: Number of packages decoded.
+        self.bytes_received = 0  #: Number of bytes received, including the length prefixes.
+        self.compression_stats = CompressionStats()
+        """:class:`urban_journey.pubsub.networking.compression.CompressionStats` of the decompressed packages."""
+
+    def error(self):
+        """Calls the error callback, if any."""
+        if self.error_callback is not None:
+            self.error_callback()
+
+    def check_header(self, data_length, codec_id, compressed):
+        """
+        Checks whether a package with the given header is allowed. Calls the error callback if it's not.
+
+        :param int data_length: Length of the package.
+        :param int codec_id: Id of the codec the package is encoded with.
+        :param bool compressed: True if the package is compressed.
+        :return: True if the package is allowed.
+        """
+        if self.restricted and (data_length > restricted_allowed_data_length or codec_id != 0 or compressed):
+            self.error()
+            return False
+        if get_codec(codec_id) is None:
+            self.error()
+            return False
+        return True
+
+    def decode(self, payload, codec_id=0, compressed=False):
         """
+        Unpacks and validates a package. Calls the error callback if it's invalid.
+
+        :param payload: Packed package.
+        :param int codec_id: Id of the codec the package is encoded with.
+        :param bool compressed: True if the package is compressed.
+        :return: Decoded ``[command_id, args]`` package. None if the package was invalid.
+        """
+        try:
+            if compressed:
+                t0 = cpu_time()
+                raw = decompress(payload)
+                self.compression_stats.record(len(raw), len(payload), cpu_time() - t0)
+                payload = raw
+            data = get_codec(codec_id).decode(payload)
+        except:
+            self.error()
+            return None
+
+        if (not isinstance(data, list)) or \
+           (len(data) != 2) or \
+           (not isinstance(data[0], int)) or \
+           (not isinstance(data[1], list)):
+            self.error()
+            return None
+        return data
+
+    async def read_frame(self, reader):
+        """
+        Reads a single package from a stream reader and puts it on the queue. The header is read first, after which
+        the whole payload is read in one go, no matter how large it is.
+
+        :param asyncio.StreamReader reader: Stream to read from.
+        :return: True if a package was read, False if the data was invalid.
+        :raises asyncio.IncompleteReadError: If the stream ended.
+        """
+        data_length, codec_id, compressed = unpack_header(await reader.readexactly(4))
+        if not self.check_header(data_length, codec_id, compressed):
+            return False
+
+        data = self.decode(await reader.readexactly(data_length), codec_id, compressed)
+        if data is None:
+            return False
+
+        self.packages_received += 1
+        self.bytes_received += 4 + data_length
+        await self.queue.put(data)
+        return True
+
+    def reserve(self, size):
+        """
+        Makes sure the buffer is large enough to hold the given number of bytes. Grows it to the next power of two if
+        it's not.
+
+        :param int size: Number of bytes needed.
+        """
+        if size > len(self.buffer):
+            self.view.release()
+            self.buffer = bytearray(1 << (size - 1).bit_length())
+            self.view = memoryview(self.buffer)
 
     async def digest(self, bts):
         """
@@ -42,45 +141,35 @@ class Decoder:
         :param bts: Bytes to be processed.
         """
 
+        bts = memoryview(bts)
         read = 0  # Number of bytes read.
         while read < len(bts):
             if self.state == 0:  # Reading message length
-                dl = self.buffer.write(bts[read:(4 - self.block_read + read)])
+                dl = min(4 - self.block_read, len(bts) - read)
+                self.view[self.block_read:self.block_read + dl] = bts[read:read + dl]
                 self.block_read += dl
                 read += dl
                 if self.block_read == 4:
-                    self.data_length = struct.unpack(">I", self.buffer.getvalue())[0]
+                    self.data_length, self.codec_id, self.compressed = unpack_header(self.buffer)
                     self.state = 1
                     self.block_read = 0
-                    self.buffer.seek(0)
-                    self.buffer.truncate()
-                    if self.restricted and self.data_length > restricted_allowed_data_length:
-                        if self.error_callback is not None:
-                            self.error_callback()
-                            break
+                    if not self.check_header(self.data_length, self.codec_id, self.compressed):
+                        break
+                    self.reserve(self.data_length)
 
             elif self.state == 1:  # Reading data block
-                dl = self.buffer.write(bts[read:(self.data_length - self.block_read + read)])
+                dl = min(self.data_length - self.block_read, len(bts) - read)
+                self.view[self.block_read:self.block_read + dl] = bts[read:read + dl]
                 self.block_read += dl
                 read += dl
                 if self.block_read == self.data_length:
-                    try:
-                        data = umsgpack.unpackb(self.buffer.getvalue())
-
-                        if (len(data) != 2) or \
-                           (not isinstance(data[0], int)) or \
-                           (not isinstance(data[1], list)):
-
-                            if self.error_callback is not None:
-                                self.error_callback()
-                            break
-                    except:
-                        if self.error_callback is not None:
-                            self.error_callback()
+                    # The buffer is reused for the next package, so the payload is copied out of it once.
+                    data = self.decode(self.buffer[:self.data_length], self.codec_id, self.compressed)
+                    if data is None:
                         break
 
+                    self.packages_received += 1
+                    self.bytes_received += 4 + self.data_length
                     await self.queue.put(data)
                     self.state = 0
                     self.block_read = 0
-                    self.buffer.seek(0)
-                    self.buffer.truncate()
@@ -11,12 +11,23 @@ nlog = logging.getLogger("networking")
 
 
 class Listener:
-    def __init__(self, host, port, connections, loop=None):
+    """
+    Listens for incoming connections.
+
+    :param string host: Listening host
+    :param int port: Listening port
+    :param dict connections: Dictionary in which the new connections are stored by name.
+    :param loop: Event loop onto which the listener is running.
+    :param urban_journey.ChannelRegister channel_register: Channel register whose channels are bridged over the new
+       connections.
+    """
+    def __init__(self, host, port, connections, loop=None, channel_register=None):
         self.host = host  #: Listening host
         self.port = port  #: Listening port
         self.loop = loop or event_loop.get()  #: Event loop onto which the listener is running.
         self.server = None  #: class:`asyncio.Server` instance used by the listener.
         self.connections = connections  #: Dictionary containing all connections.
+        self.channel_register = channel_register  #: Channel register whose channels are bridged.
 
         asyncio.run_coroutine_threadsafe(self.start_server(), self.loop)
 
@@ -54,10 +65,10 @@ class Listener:
         :param asyncio.StreamWriter writer: Writer object
         :return: Connection object.
         """
-        connection = Connection(reader, writer)
+        connection = Connection(reader, writer, channel_register=self.channel_register)
         # nlog.debug(self.log_prefix + "New connection '{}'".format(connection.name))
 
-        self.connections(connection)
+        self.connections[connection.name] = connection
 
     async def wait_until_started(self):
         """
@@ -1,6 +1,3 @@
-from urban_journey.pubsub.networking.listener import Listener
-from urban_journey.pubsub.networking.connection import Connection
-
 from urban_journey.ujml.module_node_base import ModuleNodeBase
 from urban_journey.ujml.attributes.std_types import String, Int
 
@@ -23,4 +20,4 @@ class ListenerNode(ModuleNodeBase):
             self.raise_exception(UjValueError, "The port number must be between 0 and 65535")
 
         # Open listener.
-        self.listener = Listener(self.host, self.port, self.root.connections)
+        self.listener = self.root.channel_register.new_listener(self.host, self.port)
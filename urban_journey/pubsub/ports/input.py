@@ -9,9 +9,13 @@ from urban_journey.pubsub.ports.base import PortBase, PortDescriptorBase
 from urban_journey.pubsub.trigger import TriggerBase
 from urban_journey.pubsub.descriptor.instance import DescriptorInstance
 from urban_journey.pubsub.descriptor.static import DescriptorStatic
+from urban_journey.pubsub.ports.queue import PortQueue, QueuePolicy
+from urban_journey.pubsub.channels.envelope import Envelope
+from urban_journey import event_loop
 import logging
 
 from asyncio import wait_for, wait, shield
+from time import monotonic
 
 
 ctlog = logging.getLogger('channels_transmission')
@@ -26,12 +30,48 @@ class InputPort(PortBase, TriggerBase):
     :param string attribute_name: The name of the port.
     :param string channel_name: The default channel name. If None `attribute_name` is used.
     :param float time_out: Timeout on the processing time.
+    :param int queue_size: If not None, the incoming data is held in a bounded queue of this size.
+    :param QueuePolicy queue_policy: Policy applied when the bounded queue is full.
+    :param bool keep_envelope: If True, data coming in from channels with envelopes enabled is passed to the
+       activities in its :class:`urban_journey.pubsub.channels.envelope.Envelope`. Otherwise the envelope is stripped.
     """
-    def __init__(self, parent_object, attribute_name, channel_name=None, time_out=5):
+    def __init__(self, parent_object, attribute_name, channel_name=None, time_out=5,
+                 queue_size=None, queue_policy=QueuePolicy.block, keep_envelope=False):
         PortBase.__init__(self, parent_object.channel_register, attribute_name, channel_name)
         TriggerBase.__init__(self)
         self.parent_object = parent_object  #: The parent module object.
         self.time_out = time_out  #: Time out
+        self.loop = getattr(parent_object, "loop", None) or event_loop.get()
+        """Event loop on which the data is delivered to this port. This is the event loop of the parent module."""
+
+        self.queue = None
+        """
+        :class:`urban_journey.pubsub.ports.queue.PortQueue` holding the incoming data. If None, the channel delivers
+        the data directly without any bound on the number of pending deliveries.
+        """
+        if queue_size is not None:
+            self.set_queue(queue_size, queue_policy)
+
+        self.keep_envelope = keep_envelope  #: True to pass envelopes on to the activities instead of stripping them.
+        self.last_sequence = None  #: Sequence number of the last envelope received.
+        self.missed = 0  #: Number of messages missing between the sequence numbers of the envelopes received.
+
+    def set_queue(self, queue_size, queue_policy=QueuePolicy.block):
+        """
+        Place a bounded queue between the channel and this port. Pass None as size to remove the queue.
+
+        :param int queue_size: Maximum number of items waiting to be processed.
+        :param QueuePolicy queue_policy: Policy applied when the queue is full.
+        """
+        if queue_size is None:
+            self.queue = None
+        else:
+            self.queue = PortQueue(self, queue_size, queue_policy, self.loop)
+
+    @property
+    def queue_depth(self):
+        """Number of items waiting in the queue of this port. Always 0 if the port has no queue."""
+        return 0 if self.queue is None else self.queue.depth
 
     async def flush(self, data):
         """
@@ -39,6 +79,14 @@ class InputPort(PortBase, TriggerBase):
 
         :param data: The data being transmitted.
         """
+        if type(data) is Envelope:
+            if self.channel is not None and self.channel.latency is not None:
+                self.channel.latency.record(monotonic() - data.timestamp)
+            if self.last_sequence is not None and data.sequence - data.count > self.last_sequence:
+                self.missed += data.sequence - data.count - self.last_sequence
+            self.last_sequence = data.sequence
+            if not self.keep_envelope:
+                data = data.data
         await self.trigger(data)
 
     async def trigger(self, data, *args, **kwargs):
@@ -73,10 +121,15 @@ class InputPortDescriptorInstance(InputPort, DescriptorInstance):
     :param string attribute_name: The name of the port.
     :param string channel_name: The default channel name. If None `attribute_name` is used.
     :param float time_out: Timeout on the processing time.
+    :param int queue_size: If not None, the incoming data is held in a bounded queue of this size.
+    :param QueuePolicy queue_policy: Policy applied when the bounded queue is full.
+    :param bool keep_envelope: If True, envelopes are passed on to the activities instead of being stripped.
     """
 
-    def __init__(self, parent_object, attribute_name, static_descriptor, channel_name=None, time_out=5):
-        InputPort.__init__(self, parent_object, attribute_name, channel_name, time_out)
+    def __init__(self, parent_object, attribute_name, static_descriptor, channel_name=None, time_out=5,
+                 queue_size=None, queue_policy=QueuePolicy.block, keep_envelope=False):
+        InputPort.__init__(self, parent_object, attribute_name, channel_name, time_out, queue_size, queue_policy,
+                           keep_envelope)
         DescriptorInstance.__init__(self, parent_object, attribute_name, static_descriptor)
 
 
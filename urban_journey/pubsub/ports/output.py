@@ -40,7 +40,7 @@ class OutputPort(PortBase):
         """
         # ctlog.debug("OutputPort.flush({})".format(data))
         if self.channel is not None:
-            await self.channel.flush(data)
+            await self.channel.flush(data, self)
 
     def flush_threadsafe(self, data):
         """
@@ -51,7 +51,7 @@ class OutputPort(PortBase):
         # ctlog.debug("OutputPort.flush_threadsafe({})".format(data))
         if self.channel is not None:
             loop = get_event_loop()
-            asyncio.run_coroutine_threadsafe(self.channel.flush(data), loop)
+            asyncio.run_coroutine_threadsafe(self.channel.flush(data, self), loop)
 
     __call__ = flush
 
@@ -0,0 +1,127 @@
+"""
+Bounded queues placed between a channel and an input port.
+"""
+from enum import Enum
+from collections import deque
+from asyncio import ensure_future
+
+from urban_journey import event_loop
+
+
+class QueuePolicy(Enum):
+    """
+    Enumerator for the policy applied when data arrives at a full input port queue.
+    """
+    block = 0  #: The publisher waits until there is space in the queue.
+    drop_oldest = 1  #: The oldest item in the queue is dropped.
+    drop_newest = 2  #: The incoming item is dropped.
+    coalesce_latest = 3  #: The incoming item replaces the newest item in the queue.
+
+
+class PortQueue:
+    """
+    Bounded queue holding the data waiting to be processed by an input port. The items are passed to the port one at
+    a time, so a slow port can never pile up more than ``max_size`` pending items.
+
+    :param port: Input port the data is delivered to.
+    :param int max_size: Maximum number of items in the queue.
+    :param QueuePolicy policy: Policy applied when the queue is full.
+    :param loop: Event loop on which the data is delivered.
+    """
+    def __init__(self, port, max_size, policy=QueuePolicy.block, loop=None):
+        if max_size < 1:
+            raise ValueError("The queue size must be at least 1.")
+        self.port = port  #: Input port the data is delivered to.
+        self.max_size = max_size  #: Maximum number of items in the queue.
+        self.policy = QueuePolicy(policy)  #: Policy applied when the queue is full.
+        self.loop = loop or event_loop.get()  #: Event loop on which the data is delivered.
+
+        self.items = deque()  #: Items waiting to be delivered.
+        self.__putters = deque()  #: Futures of the publishers waiting for space in the queue.
+        self.__consumer = None  #: Future of the co-routine delivering the items to the port.
+
+        # Counters
+        self.max_depth = 0  #: Largest number of items that have been waiting in the queue.
+        self.received = 0  #: Number of items received from the channel.
+        self.delivered = 0  #: Number of items delivered to the port.
+        self.dropped = 0  #: Number of items dropped by the drop_oldest and drop_newest policies.
+        self.coalesced = 0  #: Number of items replaced by the coalesce_latest policy.
+        self.blocked = 0  #: Number of times a publisher had to wait for space in the queue.
+
+    @property
+    def depth(self):
+        """Number of items currently waiting in the queue."""
+        return len(self.items)
+
+    @property
+    def full(self):
+        """True if the queue is full."""
+        return len(self.items) >= self.max_size
+
+    def counters(self):
+        """
+        Returns a dictionary with the current queue depth and counters.
+
+        :rtype: dict
+        """
+        return {"depth": self.depth,
+                "max_depth": self.max_depth,
+                "received": self.received,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "blocked": self.blocked}
+
+    async def put(self, data):
+        """
+        Puts data in the queue, applying the queue policy if it's full.
+
+        :param data: The data being transmitted.
+        """
+        self.received += 1
+        if self.full:
+            if self.policy is QueuePolicy.block:
+                self.blocked += 1
+                while self.full:
+                    putter = self.loop.create_future()
+                    self.__putters.append(putter)
+                    await putter
+            elif self.policy is QueuePolicy.drop_oldest:
+                self.items.popleft()
+                self.dropped += 1
+            elif self.policy is QueuePolicy.drop_newest:
+                self.dropped += 1
+                return
+            elif self.policy is QueuePolicy.coalesce_latest:
+                self.items[-1] = data
+                self.coalesced += 1
+                return
+
+        self.items.append(data)
+        if len(self.items) > self.max_depth:
+            self.max_depth = len(self.items)
+
+        # Start delivering the items if this isn't happening already.
+        if self.__consumer is None:
+            self.__consumer = ensure_future(self.consume(), loop=self.loop)
+
+    async def consume(self):
+        """
+        Co-routine delivering the items in the queue to the port one by one until the queue is empty.
+        """
+        try:
+            while self.items:
+                data = self.items.popleft()
+                self.__wake_putter()
+                await self.port.flush(data)
+                self.delivered += 1
+        finally:
+            self.__consumer = None
+
+    def __wake_putter(self):
+        """Releases the first publisher waiting for space in the queue."""
+        while self.__putters:
+            putter = self.__putters.popleft()
+            if not putter.done():
+                putter.set_result(None)
+                break
@@ -1,30 +1,72 @@
-from collections import defaultdict
+from collections import OrderedDict
+from asyncio import get_event_loop
 
 from urban_journey.pubsub.trigger.base import TriggerBase
 from urban_journey.pubsub.descriptor.instance import DescriptorInstance
 
 
+class JoinState:
+    """
+    Triggers received so far for one join of a :class:`ConditionAnd`.
+    """
+    __slots__ = ("mask", "params", "times")
+
+    def __init__(self):
+        self.mask = 0  #: Bitmask with a bit set for each child trigger received.
+        self.params = {}  #: Parameters sent by the child triggers received.
+        self.times = None  #: Dictionary with the loop time at which each child trigger was received. Time window only.
+
+
 class ConditionAnd(TriggerBase):
     """
     This class is a trigger that can be used to combine multiple triggers. It will
     only trigger once all of the child triggers have triggered at least once.
 
+    Each child trigger owns a bit in a bitmask, so checking whether all triggers have been received doesn't depend on the
+    number of child triggers.
+
+    By default the latest data of each child trigger is joined. Use :func:`aligned` to only join data belonging
+    together. The sequence key is called with the parameters sent by a single child trigger, a dictionary holding its
+    data by parameter name, eg. ``{"pos": data}``. To join the messages of the pos and dcm inputs carrying the same
+    ``"step"`` item::
+
+        @activity((pos & dcm).aligned(sequence_key=lambda params: next(iter(params.values()))["step"]))
+        async def update(self, pos, dcm):
+            ...
+
     :param *args: Child triggers that this trigger will wait for.
+    :param sequence_key: Function returning the sequence number of the parameters sent by a child trigger, see above.
+       Only data with the same sequence number is joined. When a sequence is completed, all older incomplete sequences
+       are dropped.
+    :param float time_window: Maximum time in seconds between the first and last trigger of a join. Triggers that are
+       older are forgotten.
+    :param int max_pending: Maximum number of incomplete sequences kept per instance.
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, sequence_key=None, time_window=None, max_pending=64):
         super().__init__()
 
-        self.trigger_received = defaultdict(self.trigger_received_factory)
+        self.sequence_key = sequence_key  #: Function returning the sequence number of the parameters of a trigger.
+        self.time_window = time_window  #: Maximum time in seconds between the first and last trigger of a join.
+        self.max_pending = max_pending  #: Maximum number of incomplete sequences kept per instance.
+
+        self.index = {}
         """
-        Dictionary holding a boolean for each child trigger. If True the trigger has already been triggered.
+        Dictionary holding the bit index of each child trigger. Instance triggers are added on arrival with the index of
+        their static descriptor.
         """
+        self.full_mask = 0  #: Bitmask with the bits of all child triggers set.
 
-        self.trigger_params = defaultdict(dict)
+        self.states = {}
         """
-        Dictionary holding the data sed by each trigger.
+        Dictionary holding the :class:`JoinState` of each instance. With a sequence key this is an ordered dictionary
+        holding the state of each pending sequence.
         """
 
+        # Statistics
+        self.joined = 0  #: Number of times all child triggers were joined.
+        self.dropped = 0  #: Number of incomplete sequences and expired triggers dropped.
+
         # Create the list of triggers and loop through all parameters.
         self.triggers = []  #: List of child triggers.
         for trigger in args:
@@ -36,9 +78,24 @@ class ConditionAnd(TriggerBase):
                 for tr in trigger.triggers:
                     self.add_trigger(tr)
                     tr.remove_activity(trigger)
+                self.sequence_key = self.sequence_key or trigger.sequence_key
+                self.time_window = self.time_window or trigger.time_window
             else:
                 self.add_trigger(trigger)
 
+    def aligned(self, sequence_key=None, time_window=None):
+        """
+        Sets the alignment of the joined data. See :class:`ConditionAnd`.
+
+        :param sequence_key: Function returning the sequence number of the parameters sent by a child trigger.
+        :param float time_window: Maximum time in seconds between the first and last trigger of a join.
+        :return: This trigger.
+        """
+        self.sequence_key = sequence_key
+        self.time_window = time_window
+        self.states.clear()
+        return self
+
     def add_trigger(self, trigger):
         """
         Add a trigger to the ConditionAnd
@@ -46,28 +103,73 @@ class ConditionAnd(TriggerBase):
         :param urban_journey.TriggerBase trigger: Trigger to add
         """
 
+        self.index[trigger] = len(self.triggers)
+        self.full_mask |= 1 << len(self.triggers)
         self.triggers.append(trigger)
         trigger.add_activity(self)
-        for trigger_received_instance in self.trigger_received:
-            trigger_received_instance[trigger] = False
 
-    def trigger_received_factory(self):
+    def index_of(self, sender):
+        """
+        Returns the bit index of a child trigger.
+
+        :param sender: Child trigger.
+        :rtype: int
+        """
+        try:
+            return self.index[sender]
+        except KeyError:
+            # It might be an instance descriptor trigger. In this case the static counterpart will be in the index.
+            if isinstance(sender, DescriptorInstance) and sender.static_descriptor in self.index:
+                index = self.index[sender] = self.index[sender.static_descriptor]
+                return index
+            # If this happens you where doing some kind of dark voodoo. Don't do it.
+            raise Exception("Received trigger from non registered trigger.")
+
+    def get_state(self, instance, sender_params):
         """
-        Factory function used by trigger_params to create new empty dictionary for any new triggers.
+        Returns the join state the parameters of a trigger belong to.
 
-        :return: A dictionary with each trigger as a key with None value.
+        :param instance: Module instance.
+        :param dict sender_params: Parameters sent by the trigger.
+        :rtype: JoinState
         """
-        r = {}
-        for trigger in self.triggers:
-            r[trigger] = False
-        return r
+        if self.sequence_key is None:
+            state = self.states.get(instance)
+            if state is None:
+                state = self.states[instance] = JoinState()
+            return state
+
+        pending = self.states.get(instance)
+        if pending is None:
+            pending = self.states[instance] = OrderedDict()
+        key = self.sequence_key(sender_params)
+        state = pending.get(key)
+        if state is None:
+            if len(pending) >= self.max_pending:
+                pending.popitem(last=False)
+                self.dropped += 1
+            state = pending[key] = JoinState()
+        return state
 
     def all_received(self, instance):
-        """Returns True if all triggers have been received."""
-        for _, value in self.trigger_received[instance].items():
-            if not value:
-                return False
-        return True
+        """Returns True if all triggers have been received. Not used with a sequence key."""
+        state = self.states.get(instance)
+        return state is not None and state.mask == self.full_mask
+
+    def expire(self, state):
+        """
+        Forgets the triggers of a join that are older than the time window.
+
+        :param JoinState state: Join state with all bits set.
+        :return: True if there are still triggers from all children left.
+        """
+        newest = max(state.times.values())
+        for index, time in list(state.times.items()):
+            if newest - time > self.time_window:
+                state.mask &= ~(1 << index)
+                del state.times[index]
+                self.dropped += 1
+        return state.mask == self.full_mask
 
     async def trigger(self, senders, sender_params, instance, *args, **kwargs):
         """
@@ -82,40 +184,36 @@ class ConditionAnd(TriggerBase):
 
         # TODO: Write proper documetation for the trigger function parameters.
 
-        sender = senders[0]
-        trigger_received_instance = self.trigger_received[instance]
-
-        # Check if it's one of the expected triggers
-        if sender not in trigger_received_instance:
-            # It's not, but it might be an instance descriptor trigger. In this case the static counterpart will be in
-            # the dictionary. So if this is the case, replace the static descriptor trigger with the instance.
-            if isinstance(sender, DescriptorInstance):
-                # Sanity check.
-                if sender.static_descriptor in trigger_received_instance:
-                    trigger_received_instance.pop(sender.static_descriptor)
-                    trigger_received_instance[sender] = True
-                else:
-                    # If this happens you where doing some kind of dark voodoo. Don't do it.
-                    raise Exception("Received trigger from non registered trigger.")
-            else:
-                # See comment above.
-                raise Exception("Received trigger from non registered trigger.")
-
-        # Mark trigger as received
-        trigger_received_instance[sender] = True
+        index = self.index_of(senders[0])
+        state = self.get_state(instance, sender_params)
 
-        # Add or replace sender parameters.
-        trigger_params_instance = self.trigger_params[instance]
-        for param, value in sender_params.items():
-            trigger_params_instance[param] = value
+        # Mark trigger as received and add or replace sender parameters.
+        state.mask |= 1 << index
+        state.params.update(sender_params)
+        if self.time_window is not None:
+            if state.times is None:
+                state.times = {}
+            state.times[index] = get_event_loop().time()
 
         # Check if all triggers have been received.
-        if self.all_received(instance):
-            # If they have, then trigger the activity.
-            for activity in self._activities:
-                await activity.trigger([self] + senders, trigger_params_instance, instance, *args, **kwargs)
-
-            # Reset the received and parameter dictionaries.
-            for trigger in trigger_received_instance:
-                trigger_received_instance[trigger] = False
-            trigger_params_instance.clear()
+        if state.mask != self.full_mask:
+            return
+        if self.time_window is not None and not self.expire(state):
+            return
+
+        # Reset the state before triggering, so triggers arriving in the mean time start a new join.
+        params = state.params
+        if self.sequence_key is None:
+            self.states[instance] = JoinState()
+        else:
+            # Drop the completed sequence and all older ones. They can't be completed in order anymore.
+            pending = self.states[instance]
+            while pending:
+                _, old_state = pending.popitem(last=False)
+                if old_state is state:
+                    break
+                self.dropped += 1
+
+        self.joined += 1
+        for activity in self._activities:
+            await activity.trigger([self] + senders, params, instance, *args, **kwargs)
@@ -0,0 +1,248 @@
+"""
+Hierarchical timer wheel shared by all clocks running on an event loop. Instead of every clock keeping its own timer
+on the event loop, the clocks register their deadlines in the wheel and the wheel keeps a single timer on the event
+loop for the next deadline that is due. All clocks due at the same tick are fired in a single pass.
+"""
+import math
+from weakref import WeakKeyDictionary
+
+
+timer_wheels = WeakKeyDictionary()  #: Dictionary holding the timer wheel of each event loop.
+
+
+def get_timer_wheel(loop):
+    """
+    Returns the timer wheel of an event loop. It's created on the first call. This must be called from the thread
+    running the event loop.
+
+    :param loop: Event loop.
+    :rtype: TimerWheel
+    """
+    if loop not in timer_wheels:
+        timer_wheels[loop] = TimerWheel(loop)
+    return timer_wheels[loop]
+
+
+class Timer:
+    """
+    Timer registered in a :class:`TimerWheel`.
+
+    :param float when: Loop time at which the callback is called.
+    :param int tick: Wheel tick at which the callback is called.
+    :param callback: Function to call.
+    :param tuple args: Arguments passed to the callback.
+    """
+    __slots__ = ("when", "tick", "callback", "args", "cancelled")
+
+    def __init__(self, when, tick, callback, args):
+        self.when = when  #: Loop time at which the callback is called.
+        self.tick = tick  #: Wheel tick at which the callback is called.
+        self.callback = callback  #: Function to call.
+        self.args = args  #: Arguments passed to the callback.
+        self.cancelled = False  #: True if the timer has been cancelled.
+
+    def cancel(self):
+        """Cancels the timer. The callback won't be called."""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hierarchical timer wheel. Time is divided in ticks of ``resolution`` seconds. Level 0 of the wheel has one slot per
+    tick for the next ``2 ** slot_bits`` ticks. Each next level has slots spanning a whole rotation of the level below.
+    Timers further away are placed in the higher levels and are cascaded down as the wheel turns.
+
+    The wheel only wakes up the event loop at ticks holding timers and at the end of each level 0 rotation to cascade
+    the timers of the higher levels.
+
+    Deadlines are rounded up to the next tick, so timers are never fired early but can be up to one ``resolution`` late.
+
+    :param loop: Event loop the wheel runs on.
+    :param float resolution: Duration of a tick in seconds.
+    :param int slot_bits: Number of slots per level as a power of two.
+    :param int levels: Number of levels.
+    """
+    def __init__(self, loop, resolution=0.001, slot_bits=8, levels=4):
+        self.loop = loop  #: Event loop the wheel runs on.
+        self.resolution = resolution  #: Duration of a tick in seconds.
+        self.slot_bits = slot_bits  #: Number of slots per level as a power of two.
+        self.n_slots = 1 << slot_bits  #: Number of slots per level.
+        self.mask = self.n_slots - 1  #: Mask to get the slot index of a tick.
+        self.levels = [[[] for _ in range(self.n_slots)] for _ in range(levels)]  #: Slots of each level.
+
+        self.current_tick = math.floor(loop.time() / resolution)  #: Last tick processed by the wheel.
+        self.count = 0  #: Number of timers in the wheel.
+        self.wakeup_tick = None  #: Tick at which the wheel will wake up next. None if the wheel is empty.
+        self.__handle = None  #: Handle of the event loop timer waking up the wheel.
+
+        # Statistics
+        self.wakeups = 0  #: Number of times the wheel woke up.
+        self.fired = 0  #: Number of timers fired.
+
+    def time_to_tick(self, when):
+        """
+        Returns the first tick at or after a loop time.
+
+        :param float when: Loop time.
+        :rtype: int
+        """
+        # The small offset keeps floating point noise from pushing deadlines lying on a tick to the next tick.
+        return math.ceil(when / self.resolution - 1e-6)
+
+    def call_at(self, when, callback, *args):
+        """
+        Schedules a callback to be called at the given loop time.
+
+        :param float when: Loop time at which to call the callback.
+        :param callback: Function to call.
+        :param args: Arguments passed to the callback.
+        :return: Timer object that can be used to cancel the callback.
+        :rtype: Timer
+        """
+        timer = Timer(when, self.time_to_tick(when), callback, args)
+        self.insert(timer)
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedules a callback to be called after the given delay.
+
+        :param float delay: Delay in seconds.
+        :param callback: Function to call.
+        :param args: Arguments passed to the callback.
+        :rtype: Timer
+        """
+        return self.call_at(self.loop.time() + delay, callback, *args)
+
+    async def sleep_until(self, when):
+        """
+        Sleeps until the given loop time.
+
+        :param float when: Loop time to wake up at.
+        """
+        future = self.loop.create_future()
+        timer = self.call_at(when, set_future_result, future)
+        try:
+            await future
+        finally:
+            timer.cancel()
+
+    def insert(self, timer):
+        """
+        Places a timer in the slot matching its tick.
+
+        :param Timer timer: Timer to insert.
+        """
+        if not self.count:
+            # The wheel is empty, so it may not have turned for a while. Skip ahead to the present.
+            self.current_tick = max(self.current_tick, math.floor(self.loop.time() / self.resolution))
+        delta = timer.tick - self.current_tick
+        if delta <= 0:
+            # The tick has already been processed. Fire the timer as soon as possible.
+            self.loop.call_soon(self.fire, timer)
+            return
+
+        for level, slots in enumerate(self.levels):
+            shift = self.slot_bits * level
+            if delta >> (shift + self.slot_bits) == 0 or level == len(self.levels) - 1:
+                slots[(timer.tick >> shift) & self.mask].append(timer)
+                break
+        self.count += 1
+        self.schedule_wakeup(min(timer.tick, (self.current_tick | self.mask) + 1))
+
+    def schedule_wakeup(self, tick):
+        """
+        Makes sure the wheel wakes up at the given tick or earlier.
+
+        :param int tick: Tick to wake up at.
+        """
+        if self.wakeup_tick is not None and self.wakeup_tick <= tick:
+            return
+        if self.__handle is not None:
+            self.__handle.cancel()
+        self.wakeup_tick = tick
+        self.__handle = self.loop.call_at(tick * self.resolution, self.wakeup)
+
+    def next_tick(self):
+        """
+        Returns the next tick the wheel has to process. This is either the next tick with timers in level 0 or the end
+        of the current level 0 rotation.
+
+        :rtype: int
+        """
+        boundary = (self.current_tick | self.mask) + 1
+        slots = self.levels[0]
+        for tick in range(self.current_tick + 1, boundary):
+            if slots[tick & self.mask]:
+                return tick
+        return boundary
+
+    def wakeup(self):
+        """Called by the event loop. Processes all ticks that are due."""
+        self.wakeups += 1
+        now_tick = max(math.floor(self.loop.time() / self.resolution), self.wakeup_tick)
+        self.wakeup_tick = None
+        self.__handle = None
+
+        while self.count:
+            tick = self.next_tick()
+            if tick > now_tick:
+                break
+            self.current_tick = tick
+
+            # Cascade the timers of the higher levels whose slot starts at this tick. The highest level goes first,
+            # so its timers can cascade further down.
+            for level in range(len(self.levels) - 1, 0, -1):
+                shift = self.slot_bits * level
+                if tick & ((1 << shift) - 1) == 0:
+                    self.cascade(level, (tick >> shift) & self.mask)
+
+            slot = self.levels[0][tick & self.mask]
+            if slot:
+                self.levels[0][tick & self.mask] = []
+                for timer in slot:
+                    self.count -= 1
+                    if timer.tick > tick:
+                        # Placed in the top level more than a full rotation ahead.
+                        self.insert(timer)
+                    else:
+                        self.fire(timer)
+
+        if self.count:
+            self.schedule_wakeup(self.next_tick())
+
+    def cascade(self, level, index):
+        """
+        Moves the timers in a slot of a higher level to the levels below.
+
+        :param int level: Level of the slot.
+        :param int index: Index of the slot.
+        """
+        slot = self.levels[level][index]
+        if slot:
+            self.levels[level][index] = []
+            for timer in slot:
+                self.count -= 1
+                if not timer.cancelled:
+                    self.insert(timer)
+
+    def fire(self, timer):
+        """
+        Calls the callback of a timer, unless it has been cancelled.
+
+        :param Timer timer: Timer to fire.
+        """
+        if timer.cancelled:
+            return
+        self.fired += 1
+        try:
+            timer.callback(*timer.args)
+        except Exception as e:
+            self.loop.call_exception_handler({"message": "Exception in timer wheel callback",
+                                              "exception": e})
+
+
+def set_future_result(future):
+    """Sets the result of a future, unless it's already done."""
+    if not future.done():
+        future.set_result(None)
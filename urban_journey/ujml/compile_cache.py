@@ -0,0 +1,122 @@
+"""
+On-disk cache of the python code compiled while loading ujml documents.
+
+Loading a document compiles every inline ``<script>``, :class:`urban_journey.Exec` and :class:`urban_journey.Eval`
+attribute and ``data`` node expression in it. The code objects are marshalled into a cache file, so the next time the
+same document is loaded they don't have to be compiled again. A cache file is keyed by a fingerprint of the document
+content, its path, the urban journey version and the python bytecode version. Editing the document or upgrading either
+of them starts a new cache file.
+
+The cache is only used if it's enabled with the ``cache`` argument of the loaders, eg.
+:func:`urban_journey.ujml.loaders.from_file`. Outdated cache files are not removed, so keep them in a directory that
+is cleaned up, see :data:`cache_dir`.
+"""
+import os
+import marshal
+import hashlib
+import logging
+from importlib.util import MAGIC_NUMBER
+
+from urban_journey import __version__ as uj_version
+
+
+clog = logging.getLogger("ujml.compile_cache")
+
+cache_dir = os.environ.get("UJ_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "urban_journey", "ujml"))
+"""Directory holding the cache files. Set by the ``UJ_CACHE_DIR`` environment variable."""
+
+cache_file_extension = ".ujmlc"  #: Extension of the cache files.
+chunk_size = 1 << 20  #: Number of bytes read at once when fingerprinting a file object.
+
+
+def fingerprint(source, file_name):
+    """
+    Returns the fingerprint of a ujml document.
+
+    :param source: Document content, string or bytes, or a binary file object it's read from in chunks.
+    :param string file_name: Path of the document. Part of the fingerprint, because it's in the compiled code objects.
+    :rtype: string
+    """
+    h = hashlib.sha256()
+    h.update(MAGIC_NUMBER)
+    h.update(uj_version.encode())
+    h.update(file_name.encode())
+    if hasattr(source, "read"):
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            h.update(chunk)
+    else:
+        h.update(source.encode() if isinstance(source, str) else source)
+    return h.hexdigest()
+
+
+class CompileCache:
+    """
+    Code objects compiled for a single ujml document.
+
+    :param source: Document content, string or bytes, or a binary file object.
+    :param string file_name: Path of the document.
+    :param string directory: Directory holding the cache files. By default :data:`cache_dir`.
+    """
+    def __init__(self, source, file_name, directory=None):
+        self.fingerprint = fingerprint(source, file_name)  #: Fingerprint of the document.
+        self.path = os.path.join(directory or cache_dir, self.fingerprint + cache_file_extension)  #: Cache file path.
+        self.codes = {}  #: Dictionary holding the code objects by ``(mode, source_line, source)``.
+        self.hits = 0  #: Number of snippets whose code was found in the cache.
+        self.misses = 0  #: Number of snippets that had to be compiled.
+        self.dirty = False  #: True if code was compiled since the cache file was loaded or saved.
+        self.load()
+
+    def load(self):
+        """
+        Loads the code objects from the cache file. Missing, corrupt or outdated cache files are ignored.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                content = marshal.load(f)
+            if content["fingerprint"] == self.fingerprint:
+                self.codes = content["codes"]
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            clog.warning("Ignoring invalid compile cache file '{}'.".format(self.path))
+
+    def save(self):
+        """
+        Writes the code objects to the cache file if new code was compiled. Failing to write the cache only logs a
+        warning.
+        """
+        if not self.dirty:
+            return
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                marshal.dump({"fingerprint": self.fingerprint, "codes": self.codes}, f)
+            # Replacing the file is atomic, so concurrent loaders never see half written cache files.
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            clog.warning("Unable to write compile cache file '{}' ({}).".format(self.path, e))
+
+    def compile(self, source, file_name, mode, source_line=1):
+        """
+        Returns the code object of a python snippet, compiling it if it's not in the cache.
+
+        :param string source: Tidied python source code.
+        :param string file_name: Source file name.
+        :param string mode: Compile mode, ``'exec'`` or ``'eval'``.
+        :param int source_line: Line number of the snippet in the source file.
+        :rtype: code
+        """
+        key = (mode, source_line, source)
+        code = self.codes.get(key)
+        if code is not None and code.co_filename == file_name:
+            self.hits += 1
+            return code
+        # New lines are prepended so the line numbers in tracebacks match the source file.
+        code = compile('\n' * (source_line - 1) + source, file_name, mode)
+        self.codes[key] = code
+        self.misses += 1
+        self.dirty = True
+        return code
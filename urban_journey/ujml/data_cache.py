@@ -0,0 +1,205 @@
+"""
+Process wide cache of the data loaded by data nodes.
+
+Data nodes loading the same file with the same settings share a single load, both within a document and across
+documents loaded by the same process. Entries are keyed by the class of the node, the absolute path of the file, its
+modification time and size (or a hash of its content) and the settings of the node, so changing the file invalidates
+them. The least recently used entries are evicted once the cache holds more than its maximum size. Optionally the
+entries are also pickled to a directory, so they are shared across consecutive runs.
+"""
+import os
+import sys
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+dlog = logging.getLogger("ujml.data")
+
+
+def data_size(value):
+    """
+    Returns the approximate size in bytes of a data product. Memory-mapped arrays count as empty, because their pages
+    are managed by the operating system. Other objects can report their size with an ``nbytes`` attribute.
+
+    :rtype: int
+    """
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray) or isinstance(getattr(value, "nbytes", None), int):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(data_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(data_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def freeze(value):
+    """
+    Makes the arrays in a data product read-only, including the ones nested in dictionaries, lists and tuples.
+    """
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, dict):
+        for v in value.values():
+            freeze(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            freeze(v)
+
+
+class DataCache:
+    """
+    LRU cache of data products.
+
+    The cached data products are shared by all nodes loading them, so their arrays are made read-only, see
+    :func:`freeze`. Other mutable objects in them, eg. dictionaries and lists, are shared as they are and must not be
+    modified.
+
+    :param int max_size: Maximum size in bytes of the cached data, see :func:`data_size`.
+    :param string directory: Directory in which the entries are pickled. None to only cache in memory.
+    :param bool hash_contents: True to key the entries by a hash of the file content instead of its modification time
+       and size.
+    """
+    def __init__(self, max_size=512 << 20, directory=None, hash_contents=False):
+        self.max_size = max_size  #: Maximum size in bytes of the cached data.
+        self.directory = directory  #: Directory in which the entries are pickled. None to only cache in memory.
+        self.hash_contents = hash_contents  #: True to key the entries by a hash of the file content.
+
+        self.entries = OrderedDict()  #: Dictionary holding the ``(value, size)`` of each entry, least recent first.
+        self.size = 0  #: Size in bytes of the cached data.
+        self.lock = threading.Lock()  #: Lock protecting the entries. Data is loaded outside of it.
+
+        # Statistics
+        self.hits = 0  #: Number of times a data product was found in memory.
+        self.disk_hits = 0  #: Number of times a data product was found on disk.
+        self.misses = 0  #: Number of times a data product had to be loaded.
+        self.evictions = 0  #: Number of entries evicted.
+
+    def key(self, kind, path, **settings):
+        """
+        Returns the key of a data product.
+
+        :param string kind: Kind of data product, eg. the name of the node class.
+        :param string path: Path of the file it's loaded from.
+        :param settings: Settings used to load it. They must be hashable.
+        :raises OSError: If the file doesn't exist.
+        """
+        path = os.path.abspath(path)
+        if self.hash_contents:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            version = h.hexdigest()
+        else:
+            stat = os.stat(path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        return kind, path, version, tuple(sorted(settings.items()))
+
+    def get(self, key, load):
+        """
+        Returns a data product, loading it if it's not cached.
+
+        :param key: Key of the data product, see :func:`key`.
+        :param load: Function without arguments loading the data product.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self.load_from_disk(key)
+        if value is None:
+            value = load()
+            with self.lock:
+                self.misses += 1
+            self.store_on_disk(key, value)
+        else:
+            with self.lock:
+                self.disk_hits += 1
+        freeze(value)
+
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Adds a data product and evicts the least recently used ones if the cache is too large."""
+        size = data_size(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_size:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key):
+        """
+        Removes a data product from memory and from disk, so it's loaded again the next time it's requested.
+
+        :param key: Key of the data product, see :func:`key`.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+        if self.directory is not None:
+            try:
+                os.remove(self.disk_path(key))
+            except FileNotFoundError:
+                pass
+
+    def disk_path(self, key):
+        """Returns the path of the pickled entry."""
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest() + ".pickle")
+
+    def load_from_disk(self, key):
+        """Returns the pickled data product. None if it's not on disk."""
+        if self.directory is None:
+            return None
+        try:
+            with open(self.disk_path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            dlog.warning("Ignoring invalid data cache file '{}'.".format(self.disk_path(key)))
+            return None
+
+    def store_on_disk(self, key, value):
+        """Pickles a data product. Memory-mapped arrays are skipped, their files already are on disk."""
+        if self.directory is None or isinstance(value, np.memmap):
+            return
+        path = self.disk_path(key)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            dlog.warning("Unable to write data cache file '{}' ({}).".format(path, e))
+
+    def clear(self):
+        """Removes all entries from memory. The pickled entries are kept."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+data_cache = DataCache(directory=os.environ.get("UJ_DATA_CACHE_DIR"))
+"""
+The process wide :class:`DataCache` used by the data nodes. Entries are only pickled to disk if the
+``UJ_DATA_CACHE_DIR`` environment variable is set.
+"""
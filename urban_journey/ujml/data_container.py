@@ -4,10 +4,14 @@ from urban_journey.ujml.exceptions import RequiredAttributeError, UJMLError, UJM
 class DataContainer(object):
     """
     It is used to store the data loaded in by data nodes with id's.
+
+    :param find_node_by_id: Optional function looking up a node by id. It's used to instantiate data nodes that have not
+       been read yet.
     """
 
-    def __init__(self):
+    def __init__(self, find_node_by_id=None):
         self.__data_nodes = {}
+        self.__find_node_by_id = find_node_by_id
 
     def add_data_node(self, node):
         """
@@ -29,6 +33,9 @@ class DataContainer(object):
         self.__data_nodes[node.id] = node
 
     def __getitem__(self, member_name):
+        if member_name not in self.__data_nodes and self.__find_node_by_id is not None:
+            # Instantiating the node adds it to the container.
+            self.__find_node_by_id(member_name)
         return self.__data_nodes[member_name].data
 
     # def __setitem__(self, member_name, v):
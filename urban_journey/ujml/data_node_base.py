@@ -3,6 +3,8 @@ from abc import ABCMeta, abstractmethod
 from lxml import etree
 
 from urban_journey.ujml.node_base import NodeBase
+from urban_journey.ujml.attributes import Bool
+from urban_journey.ujml.data_cache import data_cache
 
 
 class DataNodeBase(NodeBase, metaclass=ABCMeta):
@@ -11,12 +13,21 @@ class DataNodeBase(NodeBase, metaclass=ABCMeta):
 
     Base class for all nodes that load in, generate or process input data.
 
+    Nodes loading files can share their data through :data:`urban_journey.ujml.data_cache.data_cache` with
+    :func:`load_shared`. Set ``shared`` to true to share a single load with all other nodes loading the same file with
+    ``shared`` set, within and across documents. The shared data must not be modified.
+
     :param element: Lxml element in the ujml document
     :type element: etree.ElementBase
     :param root: Root ujml element
     :type root: :class: `urban_journey.UjmlNode`
     """
+    lazy = True  #: Data nodes only do work when their data is requested, so they can be instantiated on first access.
+
+    shared = Bool(optional_value=False)  #: True to share the loaded data with other nodes loading the same file.
+
     def __init__(self, element: etree.ElementBase, root):
+        self.shared_key = None  #: Key of the data loaded through the data cache. None if no data was loaded through it.
         super().__init__(element, root)
         self.root.data.add_data_node(self)
 
@@ -26,7 +37,26 @@ class DataNodeBase(NodeBase, metaclass=ABCMeta):
         """This abstract property should return the data enclosed in this data element."""
         pass
 
+    def load_shared(self, path, load, **settings):
+        """
+        Loads data from a file through the process wide data cache. All nodes of the same class loading the same file
+        with the same settings and ``shared`` set share a single load. The data is loaded directly if ``shared`` is
+        false.
+
+        :param string path: Path of the file the data is loaded from.
+        :param load: Function without arguments loading the data.
+        :param settings: Attributes of the node the data depends on. They must be hashable.
+        :return: The loaded data. Shared arrays are read-only.
+        """
+        if not self.shared:
+            return load()
+        self.shared_key = data_cache.key(type(self).__name__, path, **settings)
+        return data_cache.get(self.shared_key, load)
+
     def reset(self):
         """In cased the data is cached, this function should clear the cache to allow the data to be reloaded or
-        recalculated."""
-        pass
+        recalculated. Overriding methods must call it when the loaded data has to be loaded again, it evicts the data
+        loaded by :func:`load_shared` from the data cache."""
+        if self.shared_key is not None:
+            data_cache.discard(self.shared_key)
+            self.shared_key = None
@@ -42,8 +42,10 @@ def tidy_source(code):
 
 class UJMLPythonInterpreter:
     """Python embedded interpreter. All code executed here runs in it's own separate environment."""
-    def __init__(self, globals=None):
+    def __init__(self, globals=None, compile_cache=None):
         self.globals = globals or {}
+        self.compile_cache = compile_cache
+        """:class:`urban_journey.ujml.compile_cache.CompileCache` used to compile the source code. None to not cache."""
 
     def __getitem__(self, key):
         """Dictionary like access to the interpreter globals"""
@@ -53,19 +55,24 @@ class UJMLPythonInterpreter:
         """Dictionary like access to the interpreter globals"""
         self.globals[key] = value
 
+    def compile(self, source, file_name, mode, source_line=1):
+        """Compiles python source code. The code objects are taken from the compile cache if there is one."""
+        source = tidy_source(source)
+        if self.compile_cache is not None:
+            return self.compile_cache.compile(source, file_name, mode, source_line)
+        return compile('\n' * (source_line - 1) + source, file_name, mode)
+
     def exec(self, source, file_name, source_line=1, is_global=False, **kwargs):
         """Executes python source code. Kwargs will be made available in the local scope."""
-        source = tidy_source(source)
         # Locals
         locs = self.globals if is_global else kwargs
-        exec(compile('\n' * (source_line - 1) + source, file_name, 'exec'),
+        exec(self.compile(source, file_name, 'exec', source_line),
              self.globals, locs)
 
     def eval(self, source, file_name, source_line=1, is_global=False, **kwargs):
         """Evaluates python source code. Kwargs will be made available in the local scope."""
-        source = tidy_source(source)
         locs = self.globals if is_global else kwargs
-        return eval(compile('\n' * (source_line - 1) + source, file_name, 'eval'), self.globals, locs)
+        return eval(self.compile(source, file_name, 'eval', source_line), self.globals, locs)
 
         # TODO: allow multiline evals
         # lines = source.strip().splitlines()
@@ -79,14 +86,10 @@ class UJMLPythonInterpreter:
 class UJMLPythonSource:
     """Compiles and stores a piece of python source code to be executed later. When called the source is evaluated."""
     def __init__(self, interpreter: UJMLPythonInterpreter, source, file_name, mode, source_line=1):
-        source = tidy_source(source)
-        # Perfect example of a buen oplossing right here. It's not possible to pass a line number to compile. So just
-        # add a bunch of new lines at the beginning of the source code. This way exceptions tracebacks will show the
-        # correct line number inside the ujml file.
-        #                              |
-        #                              V
-        #                     |------------------|
-        self.__code = compile('\n'*(source_line-1)+source, file_name, mode)
+        # It's not possible to pass a line number to compile. So the interpreter adds a bunch of new lines at the
+        # beginning of the source code. This way exceptions tracebacks will show the correct line number inside the
+        # ujml file.
+        self.__code = interpreter.compile(source, file_name, mode, source_line)
         self.__mode = mode
         self.__file_name = file_name
         self.__source_line = source_line
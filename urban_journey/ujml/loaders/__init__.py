@@ -1,12 +1,81 @@
 import os
+import threading
 from lxml import etree
 
 from urban_journey.ujml.root_ujml_node import UjmlNode
+from urban_journey.ujml.compile_cache import CompileCache
 from ..ujml__lxml_element import UjmlElement
 
 
+_parsers = threading.local()
+
+
+def get_parser():
+    """
+    Returns the ujml parser of the current thread. Parsers are reused, but lxml parsers can't be shared between
+    threads.
+
+    :rtype: etree.XMLParser
+    """
+    parser = getattr(_parsers, "parser", None)
+    if parser is None:
+        parser = etree.XMLParser()
+        lookup = etree.ElementDefaultClassLookup(element=UjmlElement)
+        parser.set_element_class_lookup(lookup)
+        _parsers.parser = parser
+    return parser
+
+
+def load(source, file_name, globals=None, cache=False, cache_dir=None, lazy=False) -> UjmlNode:
+    """
+    Parses ujml code and builds the nodes.
+
+    :param source: String containing the ujml code.
+    :param string file_name: Source code file name.
+    :param dict globals: Optional dictionary containing global values available in ujml local python interpreter
+    :param bool cache: True to keep the compiled python code in the on-disk compile cache. See
+       :mod:`urban_journey.ujml.compile_cache`.
+    :param string cache_dir: Directory holding the compile cache files.
+    :param bool lazy: True to only instantiate the nodes when they are first accessed. See
+       :class:`urban_journey.UjmlNode`.
+    :return: Ujml root node.
+    :rtype: urban_journey.UjmlNode
+    """
+    compile_cache = CompileCache(source, file_name, cache_dir) if cache else None
+    root_elem = etree.fromstring(source, get_parser())
+    ujml_node = UjmlNode(root_elem, file_name, globals or {}, compile_cache, lazy)
+    if compile_cache is not None:
+        compile_cache.save()
+    return ujml_node
+
+
+def load_file(file_path, globals=None, cache=False, cache_dir=None, lazy=False) -> UjmlNode:
+    """
+    Parses a ujml file and builds the nodes. lxml reads the file itself, so its content is never held in memory as a
+    string next to the tree.
+
+    :param string file_path: Absolute path to ujml file.
+    :param dict globals: Optional dictionary containing global values available in ujml local python interpreter
+    :param bool cache: True to keep the compiled python code in the on-disk compile cache.
+    :param string cache_dir: Directory holding the compile cache files.
+    :param bool lazy: True to only instantiate the nodes when they are first accessed.
+    :return: Ujml root node.
+    :rtype: urban_journey.UjmlNode
+    """
+    compile_cache = None
+    if cache:
+        with open(file_path, "rb") as f:
+            compile_cache = CompileCache(f, file_path, cache_dir)
+    root_elem = etree.parse(file_path, get_parser()).getroot()
+    ujml_node = UjmlNode(root_elem, file_path, globals or {}, compile_cache, lazy)
+    if compile_cache is not None:
+        compile_cache.save()
+    return ujml_node
+
+
 # Public
-def from_string(ujml_string, file_name="<ujml_input>", globals=None) -> UjmlNode:
+def from_string(ujml_string, file_name="<ujml_input>", globals=None, cache=False, cache_dir=None,
+                lazy=False) -> UjmlNode:
     """
     Used lo load in a ujml code from a string.
 
@@ -14,35 +83,29 @@ def from_string(ujml_string, file_name="<ujml_input>", globals=None) -> UjmlNode
     :param string ujml_string: String containing the ujml code.
     :param string file_name: Source code file name.
     :param dict globals: Optional dictionary containing global values available in ujml local python interpreter
+    :param bool cache: True to keep the compiled python code in the on-disk compile cache.
+    :param string cache_dir: Directory holding the compile cache files.
+    :param bool lazy: True to only instantiate the nodes when they are first accessed.
     :return: Ujml root node.
     :rtype: urban_journey.UjmlNode
     """
-
-    parser = etree.XMLParser()
-    lookup = etree.ElementDefaultClassLookup(element=UjmlElement)
-    parser.set_element_class_lookup(lookup)
-    root_elem = etree.fromstring(ujml_string, parser)
-    ujml_node = UjmlNode(root_elem, file_name, globals or {})
-    return ujml_node
+    return load(ujml_string, file_name, globals, cache, cache_dir, lazy)
 
 
-def from_file(file_path, globals=None):
+def from_file(file_path, globals=None, cache=False, cache_dir=None, lazy=False):
     """
     Used lo load in a ujml code from a file.
 
 
     :param string file_path: Path to ujml file
     :param dict globals: Optional dictionary containing global values available in ujml local python interpreter
+    :param bool cache: True to keep the compiled python code in the on-disk compile cache, see
+       :mod:`urban_journey.ujml.compile_cache`.
+    :param string cache_dir: Directory holding the compile cache files.
+    :param bool lazy: True to only instantiate the nodes when they are first accessed.
     :return: Ujml root node.
     :rtype: urban_journey.UjmlNode
     """
 
     file_path = os.path.abspath(file_path)
-    with open(file_path) as f:
-        source = f.read()
-    parser = etree.XMLParser()
-    lookup = etree.ElementDefaultClassLookup(element=UjmlElement)
-    parser.set_element_class_lookup(lookup)
-    root_elem = etree.fromstring(source, parser)
-    ujml_node = UjmlNode(root_elem, file_path, globals or {})
-    return ujml_node
+    return load_file(file_path, globals, cache, cache_dir, lazy)
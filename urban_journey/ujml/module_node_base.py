@@ -1,5 +1,9 @@
 from .node_base import NodeBase
+from .exceptions import InvalidAttributeValueError
 from urban_journey.pubsub.module_base import ModuleBase
+from urban_journey.pubsub.ports.queue import QueuePolicy
+from urban_journey.pubsub.ports.input import InputPortStatic
+from urban_journey import event_loop
 
 
 class ModuleNodeBase(NodeBase, ModuleBase):
@@ -8,6 +12,18 @@ class ModuleNodeBase(NodeBase, ModuleBase):
 
     Base class for all publisher, subscriber module nodes.
 
+    The channel each port subscribes to can be set with an attribute with the same name as the port. Input ports can
+    also be given a bounded queue using the ``<port>_queue_size`` and ``<port>_queue_policy`` attributes. The policy is
+    one of ``block`` (default), ``drop_oldest``, ``drop_newest`` or ``coalesce_latest``. eg.
+
+    ``<foo ip="bar" ip_queue_size="8" ip_queue_policy="drop_oldest"/>``
+
+    The ``shard`` attribute selects the event loop shard the module runs on. It's either the index of the shard or
+    ``auto`` to spread the modules round-robin over :data:`urban_journey.event_loop.shard_count` shards. By default all
+    modules run on the main event loop, shard 0. eg.
+
+    ``<foo shard="auto"/>``
+
     :param element: Lxml element in the ujml document
     :type element: etree.ElementBase
     :param root: Root ujml element
@@ -15,8 +31,20 @@ class ModuleNodeBase(NodeBase, ModuleBase):
     """
     def __init__(self, element, root):
         NodeBase.__init__(self, element, root)
-        ModuleBase.__init__(self, self.root.channel_register)
+        ModuleBase.__init__(self, self.root.channel_register, self.__get_shard())
         self.__get_channel_names()
+        self.__get_queue_settings()
+
+    def __get_shard(self):
+        """Returns the index of the event loop shard this module runs on."""
+        shard = self.element.get("shard")
+        if shard is None:
+            return 0
+        if shard == "auto":
+            return event_loop.auto_shard()
+        if not shard.isdigit():
+            self.raise_exception(InvalidAttributeValueError, self.tag, "shard")
+        return int(shard)
 
     def __get_channel_names(self):
         """Returns a dictionary containing the channel name that each port will connect to when subscribed."""
@@ -25,3 +53,27 @@ class ModuleNodeBase(NodeBase, ModuleBase):
             if channel_name is None:
                 continue
             self.channel_names[port_name] = channel_name
+
+    def __get_queue_settings(self):
+        """Reads the bounded queue size and policy of each input port."""
+        for port_name, port in self.ports.items():
+            if not isinstance(port, InputPortStatic):
+                continue
+            queue_size = self.element.get(port_name + "_queue_size")
+            queue_policy = self.element.get(port_name + "_queue_policy")
+            if queue_size is None:
+                if queue_policy is not None:
+                    self.raise_exception(InvalidAttributeValueError, self.tag, port_name + "_queue_policy")
+                continue
+
+            if not queue_size.isdigit() or int(queue_size) < 1:
+                self.raise_exception(InvalidAttributeValueError, self.tag, port_name + "_queue_size")
+
+            if queue_policy is None:
+                queue_policy = QueuePolicy.block
+            elif queue_policy in QueuePolicy.__members__:
+                queue_policy = QueuePolicy[queue_policy]
+            else:
+                self.raise_exception(InvalidAttributeValueError, self.tag, port_name + "_queue_policy")
+
+            self.queue_settings[port_name] = (int(queue_size), queue_policy)
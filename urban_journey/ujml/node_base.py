@@ -20,6 +20,12 @@ class NodeBase:
     """
     id = String(optional_value=None)
 
+    lazy = False
+    """
+    True if the node may be instantiated on first access when the document is loaded lazily. Nodes doing work in their
+    constructor, like modules subscribing their ports, must leave this False.
+    """
+
     def __init__(self, element: etree.ElementBase, root, register=True):
         element.node = self
         self.element = element  # :class:`etree.ElementBase` object representing this node in the xlm code.
@@ -92,17 +98,17 @@ class NodeBase:
 
     def find_node_by_id(self, node_id):
         """
-        Find a node by id anywhere in the document. Returns ``None`` if not found.
+        Find a node by id anywhere in the document. Returns ``None`` if not found. Nodes that have not been read yet are
+        looked up in the id index of the document and instantiated.
 
         :param id: Target node id
         :rtype: :class:`urban_journey.NodeBase` or ``None``
-
-        .. note::
-           Only looks for elements that have already been read. If target node has not been read yet, it won't be found.
-           This will be fixed in the future.
         """
         if node_id in self.root.node_dict_by_id:
             return self.root.node_dict_by_id[node_id]
+        element = self.root.element_index.get(node_id)
+        if element is not None:
+            return self.root.materialize(element)
 
     @property
     def root(self):
@@ -236,6 +242,21 @@ class NodeBase:
         Finds NodeBase child class for a child element. There is no need to use this function. If this lookup
         behaviour has to be customized, override child_lookup(..) instead.
         """
+        child = self.instantiate_child(element)
+        if child is None:
+            return
+
+        # Add child
+        self.add_child(child)
+
+    def instantiate_child(self, element: etree.ElementBase):
+        """
+        Returns the node of a child element without adding it to the children. The node is only created if the element
+        wasn't read yet.
+
+        :return: The child node. None for comments and processing instructions.
+        :rtype: urban_journey.NodeBase
+        """
         if element.tag is etree.Comment:
             return
 
@@ -248,33 +269,44 @@ class NodeBase:
             child = self.find_node_by_id(node_id)
             if child is None:
                 raise IdNotFoundError(self.file_name, element.sourceline, node_id)
-        else:
-            # Check if this is a data Data element
-            if isinstance(inspect.getattr_static(self, element.tag, None), Data):
-                from urban_journey.ujml.nodes.data import data
-                klass = data
-            else:
-                # Check if parent element knows what type it is.
-                klass = self.child_lookup(element)
-
-            # Update the node_register if it's empty.
-            if len(node_register) == 0:
-                update_plugins()
-
-            # Look for node class in the register.
-            if klass is None:
-                if element.tag in node_register:
-                    klass = node_register[element.tag]
-                else:
-                    # Node type was not found.
-                    raise UnknownElementError(self.file_name, element.sourceline, element.tag)
-            child = klass(element, self.root)
+            return child
+
+        # The node already exists if it was referenced by id before its parent read its children.
+        if element.node is not None:
+            return element.node
+
+        child = self.child_class(element)(element, self.root)
 
         if not hasattr(child, "element"):
             self.raise_exception(MissingSuperInitError, self.tag, element.tag)
+        return child
 
-        # Add child
-        self.add_child(child)
+    def child_class(self, element: etree.ElementBase):
+        """
+        Returns the NodeBase child class of a child element.
+
+        :raises UnknownElementError: If there is no node class for the element.
+        """
+        # Check if this is a data Data element
+        if isinstance(inspect.getattr_static(self, element.tag, None), Data):
+            from urban_journey.ujml.nodes.data import data
+            return data
+
+        # Check if parent element knows what type it is.
+        klass = self.child_lookup(element)
+
+        # Update the node_register if it's empty.
+        if len(node_register) == 0:
+            update_plugins()
+
+        # Look for node class in the register.
+        if klass is None:
+            if element.tag in node_register:
+                klass = node_register[element.tag]
+            else:
+                # Node type was not found.
+                raise UnknownElementError(self.file_name, element.sourceline, element.tag)
+        return klass
 
     def child_lookup(self, element: etree.ElementBase):
         """
@@ -1,3 +1,4 @@
+import io
 import sys
 
 import numpy as np
@@ -9,16 +10,26 @@ from time import strptime
 from urban_journey.common.cached import cached
 from urban_journey.ujml.attributes import String, DateTime, FilePath
 from urban_journey.ujml.data_node_base import DataNodeBase
+from urban_journey.ujml.data_cache import data_cache
 from urban_journey.ujml.exceptions import RequiredAttributeError, DataLoadError
 from sim_common.conversions import knot_to_m
 
 
+pressure_regex = re.compile(r"([\d\.]+)(?:mb)")  #: Pressure in mb at the start of each data line.
+wind_regex = re.compile(r"(\d+)@(\d+)")  #: Heading in degrees and speed in knots of each column of a data line.
+
+
 class windgram(DataNodeBase):
     """
     Bases: :class:`urban_journey.DataNodeBase`
 
     Loads pressure data form a text file.
-    return np.array with [p(Pa), heading(deg), speed(m/s)]
+    return np.array with [p(Pa), speed(m/s), heading(deg)]
+
+    With ``shared`` set, the parsed file and its interpolators are shared by all windgram nodes loading it, see
+    :class:`WindgramTable`.
+    Use :func:`profiles` to get the wind profiles at many hours at once. :func:`reset` only evaluates the hour again,
+    the file is only parsed again if it changed.
     """
 
     file = FilePath()
@@ -26,51 +37,55 @@ class windgram(DataNodeBase):
     int_type = String(optional_value='linear')
     encoding = String(optional_value='utf-8')
 
+    def __init__(self, element, root):
+        super().__init__(element, root)
+        self.table_key = None  #: Data cache key of the file when :attr:`table` was loaded. None if it's not loaded.
+
     @cached
     def data(self):
-        heading = []  # for storing heading data
-        speed = []  # for storing speed data
-        p = []  # for storing pressure
+        try:
+            return self.table.evaluate(self.hour)
+        except RequiredAttributeError as e:
+            raise e
+        except:
+            self.raise_exception(DataLoadError, "Windgram", extra_traceback=sys.exc_info()[2])
 
+    @cached
+    def table(self):
+        """
+        :class:`WindgramTable` holding the parsed file.
+        """
         try:
-            with open(self.file, 'r', encoding=self.encoding) as data_f:
-                raw_windgram_data = data_f.readlines()
-
-            # Legend of Windgram.txt
-            # Line 0: name of file
-            # Line 1: Latitude, Longitude
-            # Line 2: Initial Time
-            # Line 3: Initial Time of Calculations : dd mmm yyyy hh
-            # Line 4: Duration of Calculations
-            # Line 6: Information of data format and units
-            # Line 7: Time of the Measurements
-            # Line 9-EOF: Data
-
-            t = re.findall(r'\d+\w+\d+', raw_windgram_data[3].replace(' ', ''))[0]
-            time_calc = datetime(int(t[5:9]), strptime(t[2:5], '%b').tm_mon, int(t[0:2]), int(t[9:]))
-            time_diff = (self.hour - time_calc).total_seconds()/3600
-
-
-            num_h = raw_windgram_data[7].count('.')  # amount of time increments
-            col_time = re.match(r"FHR:" + r"([+-]\d*[.])" * num_h, raw_windgram_data[7].replace(' ', ''))  # time value for each col measurement
-
-            x = [float(i) for i in col_time.groups()]  # max_time = x[-1] ; min time = x[0]
-            if time_diff > x[-1] or time_diff < x[0]:
-                self.raise_exception(DataLoadError, "Windgram time over limit", extra_traceback=sys.exc_info()[2])
-                #break?
-
-            for i in range(9, len(raw_windgram_data)):
-                data_col = re.match(r"\s*([\d\.]+)(?:mb)" + r"\s*(\d+)@(\d+)" * num_h, raw_windgram_data[i])
-                heading.append([int(data_col.group(2 + 2 * j)) for j in range(num_h)])  # !
-                speed.append([knot_to_m(int(data_col.group(3 + 2 * j))) for j in range(num_h)])  # convert from knot->m/s
-                p.append(float(data_col.group(1))*100)  # convert from mb->Pa
-
-            head_int = interp1d(x, heading, kind=self.int_type)
-            speed_int = interp1d(x, speed, kind=self.int_type)
-            head_res = head_int(time_diff)
-            speed_res = speed_int(time_diff)
-
-            return np.stack((p, speed_res, head_res), axis=-1)
+            self.table_key = self.file_key()
+            return self.load_shared(self.file, self.load, int_type=self.int_type, encoding=self.encoding)
+        except RequiredAttributeError as e:
+            raise e
+        except:
+            self.raise_exception(DataLoadError, "Windgram", extra_traceback=sys.exc_info()[2])
+
+    def file_key(self):
+        """
+        Returns the data cache key of the file, see :func:`urban_journey.ujml.data_cache.DataCache.key`. It changes
+        when the file is modified.
+        """
+        return data_cache.key(type(self).__name__, self.file, int_type=self.int_type, encoding=self.encoding)
+
+    def load(self):
+        """Parses the windgram file."""
+        with open(self.file, 'r', encoding=self.encoding) as data_f:
+            return WindgramTable(data_f.read(), self.int_type)
+
+    def profiles(self, hours):
+        """
+        Returns the wind profiles at multiple hours, without reading the file again.
+
+        :param hours: Sequence of :class:`datetime.datetime` objects.
+        :return: Array with shape ``(len(hours), number of pressure levels, 3)``, holding [p(Pa), speed(m/s),
+           heading(deg)] for each hour.
+        :rtype: numpy.ndarray
+        """
+        try:
+            return self.table.evaluate(hours)
         except RequiredAttributeError as e:
             raise e
         except:
@@ -78,3 +93,83 @@ class windgram(DataNodeBase):
 
     def reset(self):
         del self.data
+        if self.table_key is not None:
+            try:
+                changed = self.file_key() != self.table_key
+            except OSError:
+                changed = True
+            if changed:
+                super().reset()
+                del self.table
+                self.table_key = None
+
+
+class WindgramTable:
+    """
+    Parsed windgram file with the interpolators of the heading and speed over time.
+
+    :param string text: Content of the windgram file.
+    :param string int_type: Kind of interpolation, see :class:`scipy.interpolate.interp1d`.
+    """
+    def __init__(self, text, int_type='linear'):
+        raw_windgram_data = text.splitlines()
+
+        # Legend of Windgram.txt
+        # Line 0: name of file
+        # Line 1: Latitude, Longitude
+        # Line 2: Initial Time
+        # Line 3: Initial Time of Calculations : dd mmm yyyy hh
+        # Line 4: Duration of Calculations
+        # Line 6: Information of data format and units
+        # Line 7: Time of the Measurements
+        # Line 9-EOF: Data
+
+        t = re.findall(r'\d+\w+\d+', raw_windgram_data[3].replace(' ', ''))[0]
+        self.time_calc = datetime(int(t[5:9]), strptime(t[2:5], '%b').tm_mon, int(t[0:2]), int(t[9:]))
+        """Time of the calculations. The hours of the columns are relative to it."""
+
+        num_h = raw_windgram_data[7].count('.')  # amount of time increments
+        col_time = re.match(r"FHR:" + r"([+-]\d*[.])" * num_h, raw_windgram_data[7].replace(' ', ''))
+        self.x = np.array([float(i) for i in col_time.groups()])  #: Hour of each column.
+
+        # The whole data block is parsed at once.
+        data_block = io.StringIO("\n".join(raw_windgram_data[9:]))
+        self.p = np.fromregex(data_block, pressure_regex, [("p", np.float64)])["p"] * 100  #: Pressure (Pa).
+        data_block.seek(0)
+        wind = np.fromregex(data_block, wind_regex, [("heading", np.int64), ("speed", np.int64)])
+        if wind.size != self.p.size * num_h:
+            raise ValueError("Expected {} wind columns per pressure level, found {} for {} levels.".format(
+                num_h, wind.size, self.p.size))
+        wind = wind.reshape(self.p.size, num_h)
+        self.heading = wind["heading"]  #: Heading (deg) at each pressure level and hour.
+        self.speed = knot_to_m(wind["speed"].astype(np.float64))  #: Speed (m/s) at each pressure level and hour.
+
+        self.head_int = interp1d(self.x, self.heading, kind=int_type)  #: Heading interpolator.
+        self.speed_int = interp1d(self.x, self.speed, kind=int_type)  #: Speed interpolator.
+
+    @property
+    def nbytes(self):
+        """Size in bytes of the parsed data."""
+        return self.p.nbytes + self.heading.nbytes + self.speed.nbytes
+
+    def evaluate(self, hours):
+        """
+        Interpolates the wind profile at one or more hours.
+
+        :param hours: :class:`datetime.datetime` object or a sequence of them.
+        :return: Array with shape ``(number of pressure levels, 3)`` for a single hour, or ``(len(hours), number of
+           pressure levels, 3)``, holding [p(Pa), speed(m/s), heading(deg)].
+        :rtype: numpy.ndarray
+        :raises ValueError: If an hour is outside of the time range of the windgram.
+        """
+        single = isinstance(hours, datetime)
+        if single:
+            hours = [hours]
+        time_diff = np.array([(hour - self.time_calc).total_seconds() / 3600 for hour in hours])
+        if np.any(time_diff > self.x[-1]) or np.any(time_diff < self.x[0]):
+            raise ValueError("Windgram time over limit")
+
+        # The interpolators return (pressure levels, hours) arrays.
+        p = np.broadcast_to(self.p, (len(time_diff), self.p.size))
+        profiles = np.stack((p, self.speed_int(time_diff).T, self.head_int(time_diff).T), axis=-1)
+        return profiles[0] if single else profiles
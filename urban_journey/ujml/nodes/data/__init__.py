@@ -2,5 +2,6 @@ from .csv import csv
 from .Windgram import windgram
 from .data import data
 from .pickle_loader import pickle
+from .npy import npy, npz
 
 #TODO: Create loaders for: messagePack, yaml, json.
@@ -1,31 +1,173 @@
+import io
+import os
 import sys
+import hashlib
+import logging
+import warnings
 
 import numpy as np
 
 from urban_journey.common.cached import cached
-from urban_journey.ujml.attributes import String
+from urban_journey.ujml.attributes import String, Int, Bool, List
 from urban_journey.ujml.data_node_base import DataNodeBase
 from urban_journey.ujml.exceptions import RequiredAttributeError, DataLoadError
 
 
+dlog = logging.getLogger("ujml.data")
+
+
 class csv(DataNodeBase):
     """
     Bases: :class:`urban_journey.DataNodeBase`
 
     Loads data form a csv file.
+
+    The parsed table is stored in a sidecar ``.npy`` file next to the csv file. The next time the csv file is loaded,
+    the sidecar file is memory-mapped instead, so the table is paged in lazily and shared between processes. The data is
+    then a read-only array. The sidecar file is rebuilt when the csv file is newer. Set ``cache`` to false to always
+    parse the csv file. eg.
+
+    ``<csv file="aero_table.csv" dtype="float32" usecols="0, 2, 3" skiprows="1"/>``
     """
 
     file = String()
     delimiter = String(optional_value=",")
+    dtype = String(optional_value="float64")  #: Data type of the table.
+    usecols = List(optional_value=None)  #: Indices of the columns to load. By default all columns.
+    skiprows = Int(optional_value=0)  #: Number of lines to skip at the beginning of the file, eg. a header.
+    cache = Bool(optional_value=True)  #: True to cache the parsed table in a memory-mapped sidecar .npy file.
 
     @cached
     def data(self):
         try:
-            return np.genfromtxt(self.abs_path(self.file), delimiter=self.delimiter)
+            path = self.abs_path(self.file)
+            usecols = None if self.usecols is None else tuple(self.usecols)
+            return self.load_shared(path, lambda: self.load(path), delimiter=self.delimiter,
+                                    dtype=np.dtype(self.dtype).str, usecols=usecols, skiprows=self.skiprows,
+                                    cache=self.cache)
         except RequiredAttributeError as e:
             raise e
         except:
             self.raise_exception(DataLoadError, "csv", extra_traceback=sys.exc_info()[2])
 
+    def load(self, path):
+        """
+        Loads the table from the sidecar file if it's up to date, otherwise from the csv file.
+
+        :param string path: Absolute path of the csv file.
+        :rtype: numpy.ndarray
+        """
+        sidecar_path = self.sidecar_path(path) if self.cache else None
+        if sidecar_path is not None and is_fresh(sidecar_path, path):
+            return np.load(sidecar_path, mmap_mode='r')
+
+        with open(path) as f:
+            data = parse_csv(f.read(), self.delimiter, np.dtype(self.dtype), self.usecols, self.skiprows)
+
+        if sidecar_path is not None and write_sidecar(sidecar_path, data):
+            return np.load(sidecar_path, mmap_mode='r')
+        return data
+
+    def sidecar_path(self, path):
+        """
+        Returns the path of the sidecar .npy file of a csv file. The parse settings are part of the name, so nodes
+        loading the same file differently don't share it.
+
+        :param string path: Absolute path of the csv file.
+        :rtype: string
+        """
+        settings = repr((self.delimiter, np.dtype(self.dtype).str, self.usecols, self.skiprows)).encode()
+        return "{}.{}.npy".format(path, hashlib.sha1(settings).hexdigest()[:8])
+
     def reset(self):
+        super().reset()
         del self.data
+
+
+def parse_csv(text, delimiter=",", dtype=np.float64, usecols=None, skiprows=0):
+    """
+    Parses a numeric csv table. All values are parsed in a single :func:`numpy.fromstring` call. Tables with comments,
+    missing values or ragged rows fall back to :func:`numpy.genfromtxt`. As with :func:`numpy.genfromtxt`, tables with
+    a single row or column are returned as 1d arrays.
+
+    :param string text: Content of the csv file.
+    :param string delimiter: String separating the values. Whitespace delimiters match any whitespace.
+    :param dtype: Data type of the table.
+    :param usecols: Indices of the columns to load. None for all columns.
+    :param int skiprows: Number of lines to skip at the beginning.
+    :rtype: numpy.ndarray
+    """
+    start = 0
+    for _ in range(skiprows):
+        start = text.find("\n", start) + 1
+        if not start:
+            start = len(text)
+            break
+    body = text[start:].strip()
+    if "\r" in body:
+        body = body.replace("\r", "")
+
+    n_columns = count_columns(body, delimiter) if body and "#" not in body else None
+    if n_columns is not None:
+        n_rows = body.count("\n") + 1
+        if not delimiter.isspace():
+            body = body.replace("\n", delimiter)
+        try:
+            with warnings.catch_warnings():
+                # Unparsable values stop fromstring early. This is detected below by the number of values.
+                warnings.simplefilter("ignore", DeprecationWarning)
+                values = np.fromstring(body, dtype, sep=delimiter)
+        except ValueError:
+            values = None
+        if values is not None and values.size == n_rows * n_columns:
+            table = values.reshape(n_rows, n_columns)
+            if usecols is not None:
+                table = table[:, usecols]
+            return table.squeeze()
+
+    return np.genfromtxt(io.StringIO(text), delimiter=None if delimiter.isspace() else delimiter, dtype=dtype,
+                         usecols=usecols, skip_header=skiprows)
+
+
+def count_columns(body, delimiter):
+    """
+    Returns the number of values on each line of a table. Only checking the total number of values would accept ragged
+    rows that happen to add up to a full table.
+
+    :param string body: Lines of the table, without carriage returns.
+    :param string delimiter: String separating the values. Whitespace delimiters match any whitespace.
+    :return: Number of values on each line. None if the lines don't all hold the same number of values.
+    :rtype: int
+    """
+    lines = body.split("\n")
+    if delimiter.isspace():
+        counts = {len(line.split()) for line in lines}
+    else:
+        counts = {line.count(delimiter) + 1 for line in lines}
+    return counts.pop() if len(counts) == 1 else None
+
+
+def is_fresh(sidecar_path, path):
+    """Returns True if the sidecar file exists and is newer than the file it was generated from."""
+    try:
+        return os.stat(sidecar_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def write_sidecar(sidecar_path, data):
+    """
+    Writes a sidecar .npy file. Failing to write it, eg. in a read-only directory, only logs a warning.
+
+    :return: True if the file was written.
+    """
+    tmp_path = "{}.{}.tmp".format(sidecar_path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, data)
+        # Replacing the file is atomic, so concurrent runs never map half written files.
+        os.replace(tmp_path, sidecar_path)
+        return True
+    except OSError as e:
+        dlog.warning("Unable to write sidecar file '{}' ({}).".format(sidecar_path, e))
+        return False
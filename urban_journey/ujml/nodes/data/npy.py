@@ -0,0 +1,108 @@
+import sys
+import struct
+import zipfile
+
+import numpy as np
+
+from urban_journey.common.cached import cached
+from urban_journey.ujml.attributes import FilePath, String, Bool
+from urban_journey.ujml.data_node_base import DataNodeBase
+from urban_journey.ujml.exceptions import RequiredAttributeError, DataLoadError
+
+
+# Fixed part of a zip local file header, up to and including the lengths of the file name and extra field.
+zip_local_header_struct = struct.Struct("<4s22xHH")
+
+
+class npy(DataNodeBase):
+    """
+    Bases: :class:`urban_journey.DataNodeBase`
+
+    Loads an array from a numpy ``.npy`` file. By default the file is memory-mapped, so large tables are paged in lazily
+    and shared between processes. The data is then a read-only array.
+
+    ``<npy file="aero_table.npy"/>``
+    """
+
+    file = FilePath()
+    mmap = Bool(optional_value=True)  #: True to memory-map the file.
+
+    @cached
+    def data(self):
+        try:
+            return np.load(self.file, mmap_mode='r' if self.mmap else None)
+        except RequiredAttributeError as e:
+            raise e
+        except:
+            self.raise_exception(DataLoadError, "npy", extra_traceback=sys.exc_info()[2])
+
+    def reset(self):
+        super().reset()
+        del self.data
+
+
+class npz(DataNodeBase):
+    """
+    Bases: :class:`urban_journey.DataNodeBase`
+
+    Loads arrays from a numpy ``.npz`` archive. The data is a dictionary with all arrays in the archive by name, or a
+    single array if ``key`` is given. Arrays stored uncompressed (:func:`numpy.savez`) are memory-mapped by default.
+    Compressed arrays (:func:`numpy.savez_compressed`) are always read into memory.
+
+    ``<npz file="tables.npz" key="lift"/>``
+    """
+
+    file = FilePath()
+    key = String(optional_value=None)  #: Name of the array to load. By default all arrays are loaded.
+    mmap = Bool(optional_value=True)  #: True to memory-map the uncompressed arrays.
+
+    @cached
+    def data(self):
+        try:
+            with zipfile.ZipFile(self.file) as archive:
+                if self.key is not None:
+                    return load_npz_member(self.file, archive, self.key + ".npy", self.mmap)
+                return {info.filename[:-4]: load_npz_member(self.file, archive, info.filename, self.mmap)
+                        for info in archive.infolist() if info.filename.endswith(".npy")}
+        except RequiredAttributeError as e:
+            raise e
+        except:
+            self.raise_exception(DataLoadError, "npz", extra_traceback=sys.exc_info()[2])
+
+    def reset(self):
+        super().reset()
+        del self.data
+
+
+def load_npz_member(path, archive, name, mmap=True):
+    """
+    Loads an array from a .npz archive. Uncompressed arrays are memory-mapped straight from the archive.
+
+    :param string path: Path of the archive.
+    :param zipfile.ZipFile archive: The opened archive.
+    :param string name: Name of the .npy file in the archive.
+    :param bool mmap: True to memory-map the array if it's uncompressed.
+    :rtype: numpy.ndarray
+    """
+    info = archive.getinfo(name)
+    if mmap and info.compress_type == zipfile.ZIP_STORED:
+        with open(path, "rb") as f:
+            f.seek(info.header_offset)
+            signature, name_length, extra_length = zip_local_header_struct.unpack(
+                f.read(zip_local_header_struct.size))
+            if signature != b"PK\x03\x04":
+                raise ValueError("Invalid zip local file header for '{}'.".format(name))
+            f.seek(info.header_offset + zip_local_header_struct.size + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                shape = None
+            offset = f.tell()
+        if shape is not None and not dtype.hasobject:
+            return np.memmap(path, dtype, 'r', offset, shape, 'F' if fortran_order else 'C')
+
+    with archive.open(info) as f:
+        return np.lib.format.read_array(f)
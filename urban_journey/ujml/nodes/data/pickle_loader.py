@@ -17,12 +17,19 @@ class pickle(DataNodeBase):
     @cached
     def data(self):
         try:
-            with open(self.abs_path(self.file), "rb") as f:
-                return pck.load(f)
+            path = self.abs_path(self.file)
+            return self.load_shared(path, lambda: self.load(path))
         except RequiredAttributeError as e:
             raise e
         except Exception as e:
             self.raise_exception(DataLoadError, "pickle", extra_traceback=sys.exc_info()[2])
 
+    @staticmethod
+    def load(path):
+        """Unpickles the file."""
+        with open(path, "rb") as f:
+            return pck.load(f)
+
     def reset(self):
+        super().reset()
         del self.data
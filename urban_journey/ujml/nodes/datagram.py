@@ -0,0 +1,59 @@
+from asyncio import run_coroutine_threadsafe
+
+from urban_journey import NodeBase
+from urban_journey import String, Int, Bool, get_event_loop
+from urban_journey.pubsub.networking.datagram import DatagramConnection
+
+
+class datagram(NodeBase):
+    """
+    Bases: urban_journey.NodeBase
+
+    Opens a datagram (UDP) endpoint to bridge lossy, high rate channels to a remote. The channels listed in ``send``
+    are sent to ``remote_host:remote_port``. The channel data received from remotes is flushed on the local channels.
+    ``receive`` limits the channels accepted. The endpoint is opened asynchronously on the event loop, wait on
+    ``opened`` before using it from another thread. eg.
+
+    ``<datagram port="9000" remote_host="10.0.0.2" remote_port="9000" send="imu, gps" receive="commands"/>``
+
+    See :class:`urban_journey.pubsub.networking.datagram.DatagramConnection`.
+    """
+    host = String(optional_value="0.0.0.0")  #: Host to bind to.
+    port = Int(optional_value=0)  #: Port to bind to. By default a free port is picked.
+    remote_host = String(optional_value=None)  #: Host of the remote to send to.
+    remote_port = Int(optional_value=None)  #: Port of the remote to send to.
+    send = String(optional_value="")  #: Comma separated names of the channels sent to the remote.
+    receive = String(optional_value=None)  #: Comma separated names of the channels accepted. By default all channels.
+    max_datagram_size = Int(optional_value=1400)  #: Maximum size in bytes of the datagrams.
+    fragment = Bool(optional_value=True)  #: True to split large packages into multiple datagrams.
+
+    def __init__(self, element, root):
+        super().__init__(element, root)
+
+        remote_addr = None
+        if self.remote_host is not None and self.remote_port is not None:
+            remote_addr = (self.remote_host, self.remote_port)
+
+        loop = get_event_loop()
+        self.connection = DatagramConnection(remote_addr=remote_addr,
+                                             loop=loop,
+                                             channel_register=self.root.channel_register,
+                                             max_datagram_size=self.max_datagram_size,
+                                             fragment=self.fragment,
+                                             receive=None if self.receive is None else split_names(self.receive))
+        """:class:`urban_journey.pubsub.networking.datagram.DatagramConnection` of the endpoint."""
+
+        # The node might be created on the event loop thread, so don't block on it.
+        self.opened = run_coroutine_threadsafe(self.open(), loop)
+        """:class:`concurrent.futures.Future` done once the endpoint is open and the channels are forwarded."""
+
+    async def open(self):
+        """Co-routine opening the endpoint and forwarding the channels listed in ``send``."""
+        await self.connection.bind((self.host, self.port))
+        for channel_name in split_names(self.send):
+            self.connection.forward_channel(channel_name)
+
+
+def split_names(names):
+    """Splits a comma separated list of channel names."""
+    return [name.strip() for name in names.split(",") if name.strip()]
@@ -18,7 +18,7 @@ from .exceptions import IncompatibleUJVersion, IdMustBeUniqueError, PyQt4NotEnab
 from urban_journey.pubsub.module_base import ModuleBase
 from urban_journey.pubsub.channels.channel_register import ChannelRegister
 from urban_journey.pubsub.ports.output import Output
-from urban_journey.event_loop import get as get_event_loop
+from urban_journey.event_loop import get as get_event_loop, stop_shards
 
 from sim_common.synchronization import CheckInSemaphore
 
@@ -28,6 +28,16 @@ class UjmlNode(NodeBase):
     Bases: :class:`urban_journey.NodeBase`
 
     Root node for ujml documents.
+
+    In lazy mode only the nodes that have to do work when the document is loaded, like modules subscribing their
+    ports, are instantiated right away. The other nodes are instantiated when they are referenced by id or when the
+    children of their parent are accessed. See :attr:`urban_journey.NodeBase.lazy`.
+
+    :param element: Lxml element of the document root.
+    :param string file_name: Document file name.
+    :param dict globals: Optional dictionary containing global values available in ujml local python interpreter.
+    :param compile_cache: :class:`urban_journey.ujml.compile_cache.CompileCache` used to compile the python code.
+    :param bool lazy: True to instantiate the nodes on first access.
     """
     req_version = String(name="version")
 
@@ -37,10 +47,10 @@ class UjmlNode(NodeBase):
     stop_on_exception = Bool(optional_value=True)  #: Release the start function in case of an exception.
     stop_on_assertion_error = Bool(optional_value=True)  #: Release the tart function in case of an assertion error.
 
-    def __init__(self, element: etree.ElementBase, file_name, globals=None):
-        self.__data_container = DataContainer()
+    def __init__(self, element: etree.ElementBase, file_name, globals=None, compile_cache=None, lazy=False):
+        self.__data_container = DataContainer(self.find_node_by_id)
 
-        self.interpreter = UJMLPythonInterpreter(globals or {})
+        self.interpreter = UJMLPythonInterpreter(globals or {}, compile_cache)
         """
         Instance of :class:`urban_journey.UJMLPythonInterpreter` used as the embedded python interpreter to run the
         python code in the ujml file.
@@ -56,6 +66,10 @@ class UjmlNode(NodeBase):
         self.node_dict_by_id = {}
         """A dictionary containing all already read nodes by id."""
 
+        self.element_index = {}
+        """A dictionary containing the elements of all nodes in the document by id, including the ones not read yet."""
+        self.index_elements(element)
+
         super().__init__(element, None)
 
         self.pyqt_app = None
@@ -69,7 +83,10 @@ class UjmlNode(NodeBase):
 
         self.__check_version()
 
-        self.update_children()
+        if lazy:
+            self.update_eager_children()
+        else:
+            self.update_children()
 
         self.__exc_info = None
 
@@ -148,15 +165,19 @@ class UjmlNode(NodeBase):
         blocking.
         """
         self.ujml_module.uj_stop.flush_threadsafe(None)
+        # Store the code compiled while running as well.
+        if self.interpreter.compile_cache is not None:
+            self.interpreter.compile_cache.save()
         if self.pyqt:
             self.pyqt_stop()
         self.__semaphore.release()
 
     def kill(self):
         """
-        Same as :func:`urban_journey.UjmlNode.stop` but it also stop the asyncio event loop.
+        Same as :func:`urban_journey.UjmlNode.stop` but it also stop the asyncio event loops.
         """
         self.stop()
+        stop_shards()
         loop = get_event_loop()
         loop.stop()
 
@@ -197,6 +218,39 @@ class UjmlNode(NodeBase):
                 rv[2] <= dv[2]):
             self.raise_exception(IncompatibleUJVersion, self.req_version, uj_version)
 
+    def index_elements(self, element):
+        """
+        Adds the elements with an id in a (sub)tree to :attr:`urban_journey.UjmlNode.element_index`.
+
+        :param element: Root element of the tree.
+        """
+        for child in element.iter():
+            if not isinstance(child.tag, str) or child.tag == "ref":
+                continue
+            node_id = child.get("id")
+            if node_id is not None and node_id not in self.element_index:
+                self.element_index[node_id] = child
+
+    def materialize(self, element):
+        """
+        Returns the node of an element, instantiating it and its parents if they have not been read yet.
+
+        :param element: Lxml element in the document.
+        :rtype: urban_journey.NodeBase
+        """
+        if element.node is None:
+            self.materialize(element.getparent()).instantiate_child(element)
+        return element.node
+
+    def update_eager_children(self):
+        """
+        Instantiates the child nodes that can't be instantiated lazily. The list of children is only built once it's
+        accessed.
+        """
+        for element in self.element:
+            if isinstance(element.tag, str) and element.tag != "ref" and not self.child_class(element).lazy:
+                self.instantiate_child(element)
+
     def register_node(self, node: NodeBase):
         """
         Registers a node, by adding it to the :attr:`urban_journey.UjmlNode.node_dict_by_id list` if it has an id.